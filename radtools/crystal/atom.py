@@ -64,6 +64,9 @@ class Atom:
         charge=None,
         index=None,
     ) -> None:
+        # Weak references to the crystals, which index the atom by (name, index)
+        self._crystals = []
+
         # Set name
         self._name = "X"
         self.name = name
@@ -103,6 +106,20 @@ class Atom:
     def __str__(self):
         return self.name
 
+    def __getstate__(self):
+        # Weak references can not be pickled
+        state = self.__dict__.copy()
+        state["_crystals"] = []
+        return state
+
+    def _identity_changed(self):
+        # Name or index is changed, index of the crystals is outdated
+        for owner in self.__dict__.get("_crystals", []):
+            crystal = owner()
+            if crystal is not None:
+                crystal._atom_lookup = None
+        self._crystals = []
+
     def __format__(self, format_spec):
         return format(str(self), format_spec)
 
@@ -167,6 +184,7 @@ class Atom:
                 f"Name of the atom ({new_name}) is not valid. It cannot start/end with '__'."
             )
         self._name = new_name
+        self._identity_changed()
         # Reset type
         self._type = None
 
@@ -212,6 +230,7 @@ class Atom:
     @index.setter
     def index(self, new_index):
         self._index = new_index
+        self._identity_changed()
 
     @property
     def spin(self):
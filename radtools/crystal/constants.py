@@ -28,6 +28,7 @@ __all__ = [
     "PEARSON_SYMBOLS",
     "BRAVAIS_LATTICE_NAMES",
     "BRAVAIS_LATTICE_VARIATIONS",
+    "HOLOHEDRY_ORDERS",
     "TRANSFORM_TO_CONVENTIONAL",
     "DEFAULT_K_PATHS",
     "HS_PLOT_NAMES",
@@ -208,6 +209,24 @@ BRAVAIS_LATTICE_NAMES = {
     "TRI": "Triclinic",
 }
 
+# Order of the point group of the lattice (holohedry)
+HOLOHEDRY_ORDERS = {
+    "CUB": 48,
+    "FCC": 48,
+    "BCC": 48,
+    "TET": 16,
+    "BCT": 16,
+    "ORC": 8,
+    "ORCF": 8,
+    "ORCI": 8,
+    "ORCC": 8,
+    "HEX": 24,
+    "RHL": 12,
+    "MCL": 4,
+    "MCLC": 4,
+    "TRI": 2,
+}
+
 BRAVAIS_LATTICE_VARIATIONS = [
     "CUB",
     "FCC",
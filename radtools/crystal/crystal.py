@@ -18,6 +18,7 @@
 
 from math import floor, log10
 from typing import Union
+from weakref import ref
 
 import numpy as np
 
@@ -100,7 +101,7 @@ class Crystal(Lattice):
                 return True
             except ValueError:
                 return False
-        return atom in self.atoms
+        return self._find_atom(atom) is not None
 
     def __len__(self):
         return self.atoms.__len__()
@@ -110,7 +111,7 @@ class Crystal(Lattice):
 
     def __getattr__(self, name):
         # Fix copy/deepcopy RecursionError
-        if name in ["__setstate__"]:
+        if name in ["__setstate__", "_atoms", "_atom_lookup"]:
             raise AttributeError(name)
         try:
             atom = self.get_atom(name=name)
@@ -118,6 +119,88 @@ class Crystal(Lattice):
         except ValueError:
             raise AttributeError(f"'Crystal' object has no attribute '{name}'")
 
+    def __getstate__(self):
+        # Index refers to the crystal by weak reference, it is rebuilt on demand
+        state = self.__dict__.copy()
+        state["_atom_lookup"] = None
+        return state
+
+    @property
+    def atoms(self):
+        r"""
+        List of atoms of the crystal.
+
+        Use :py:meth:`.add_atom` and :py:meth:`.remove_atom` to modify it.
+
+        Returns
+        -------
+        atoms : list of :py:class:`.Atom`
+        """
+
+        return self._atoms
+
+    @atoms.setter
+    def atoms(self, new_atoms):
+        self._atoms = new_atoms
+        self._atom_lookup = None
+
+    def _lookup(self):
+        r"""
+        Index of the atoms for the constant time search.
+
+        Atoms are indexed by identity, by (name, index) pair and by name.
+        Index is rebuilt if the list of atoms was replaced or changed directly
+        or if the name or index of any indexed atom was changed.
+
+        Returns
+        -------
+        lookup : dict
+            "list" - indexed list, "length" - its length,
+            "id" - atom for each ``id(atom)``,
+            "key" - {id(atom): atom} for each (name, index),
+            "name" - {id(atom): atom} for each name,
+            "owner" - weak reference to the crystal.
+            Inner dictionaries keep the order of the list.
+        """
+
+        lookup = self._atom_lookup
+        if (
+            lookup is None
+            or lookup["list"] is not self._atoms
+            or lookup["length"] != len(self._atoms)
+        ):
+            lookup = {
+                "list": self._atoms,
+                "length": 0,
+                "id": {},
+                "key": {},
+                "name": {},
+                "owner": ref(self),
+            }
+            for atom in self._atoms:
+                _index_atom(lookup, atom)
+            self._atom_lookup = lookup
+        return lookup
+
+    def _find_atom(self, atom: Atom):
+        r"""
+        Atom of the crystal, which is equal to the given one.
+
+        Returns
+        -------
+        atom : :py:class:`.Atom` or None
+            Identical atom, if it is present, otherwise the first equal one.
+        """
+
+        lookup = self._lookup()
+        if lookup["id"].get(id(atom)) is atom:
+            return atom
+        for candidate in lookup["key"].get((atom.name, atom._index), {}).values():
+            # Name or index could be changed after the atom was added
+            if candidate.name == atom.name and candidate._index == atom._index:
+                return candidate
+        return None
+
     @property
     def lattice(self):
         r"""
@@ -185,8 +268,10 @@ class Crystal(Lattice):
         if not relative:
             new_atom.position = absolute_to_relative(self.cell, new_atom.position)
 
-        if new_atom not in self.atoms:
-            self.atoms.append(new_atom)
+        if self._find_atom(new_atom) is None:
+            lookup = self._lookup()
+            self._atoms.append(new_atom)
+            _index_atom(lookup, new_atom)
         else:
             raise ValueError("Atom is already in the crystal.")
 
@@ -216,9 +301,14 @@ class Crystal(Lattice):
         if isinstance(atom, str):
             atoms = self.get_atom(atom, index=index, return_all=True)
         else:
-            atoms = [atom]
+            found = self._find_atom(atom)
+            if found is None:
+                raise ValueError(f"There is no {atom} in the crystal.")
+            atoms = [found]
         for atom in atoms:
-            self.atoms.remove(atom)
+            lookup = self._lookup()
+            self._atoms.remove(atom)
+            _unindex_atom(lookup, atom)
 
     # Modification of position has to be avoided here.
     def get_atom(self, name, index=None, return_all=False):
@@ -254,15 +344,18 @@ class Crystal(Lattice):
             If no match is found or the match is not unique and ``return_all`` is ``False``.
         """
 
-        atoms = []
         if "__" in name and index is None:
             name, index = name.split("__")
             index = int(index)
 
-        for atom in self.atoms:
-            if atom.name == name:
-                if index is None or atom.index == index:
-                    atoms.append(atom)
+        atoms = self._match_atoms(name, index)
+        # Names or indices could be changed after the atoms were added
+        if len(atoms) == 0 or any(
+            atom.name != name or (index is not None and atom.index != index)
+            for atom in atoms
+        ):
+            self._atom_lookup = None
+            atoms = self._match_atoms(name, index)
 
         if len(atoms) == 0:
             raise ValueError(f"No match found for name = {name}, index = {index}")
@@ -276,6 +369,13 @@ class Crystal(Lattice):
             )
         return atoms
 
+    def _match_atoms(self, name, index=None):
+        # Atoms with the name (and index) from the index, in the order of the list
+        lookup = self._lookup()
+        if index is None:
+            return list(lookup["name"].get(name, {}).values())
+        return list(lookup["key"].get((name, index), {}).values())
+
     def get_atom_coordinates(
         self, atom: Union[Atom, str], R=(0, 0, 0), index=None, relative=True
     ):
@@ -302,7 +402,7 @@ class Crystal(Lattice):
 
         if isinstance(atom, str):
             atom = self.get_atom(atom, index=index)
-        elif atom not in self.atoms:
+        elif self._find_atom(atom) is None:
             raise ValueError(f"There is no {atom} in the crystal.")
 
         rel_coordinates = np.array(R + atom.position)
@@ -593,6 +693,29 @@ class Crystal(Lattice):
         return energies
 
 
+def _index_atom(lookup, atom: Atom):
+    # Add the atom to the index of the crystal, see Crystal._lookup()
+    lookup["id"][id(atom)] = atom
+    lookup["key"].setdefault((atom.name, atom._index), {})[id(atom)] = atom
+    lookup["name"].setdefault(atom.name, {})[id(atom)] = atom
+    lookup["length"] += 1
+    # Atom resets the index, when its name or index is changed
+    crystals = atom.__dict__.setdefault("_crystals", [])
+    if all(owner is not lookup["owner"] for owner in crystals):
+        crystals[:] = [owner for owner in crystals if owner() is not None]
+        crystals.append(lookup["owner"])
+
+
+def _unindex_atom(lookup, atom: Atom):
+    # Remove the atom from the index of the crystal, see Crystal._lookup()
+    lookup["id"].pop(id(atom), None)
+    for group, key in [("key", (atom.name, atom._index)), ("name", atom.name)]:
+        lookup[group].get(key, {}).pop(id(atom), None)
+        if len(lookup[group].get(key, {None: None})) == 0:
+            del lookup[group][key]
+    lookup["length"] -= 1
+
+
 class CrystalIterator:
     def __init__(self, crystal: Crystal) -> None:
         self._list = crystal.atoms
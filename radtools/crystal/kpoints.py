@@ -26,7 +26,7 @@ import numpy as np
 
 from radtools.geometry import absolute_to_relative
 
-__all__ = ["Kpoints"]
+__all__ = ["Kpoints", "monkhorst_pack"]
 
 
 class Kpoints:
@@ -385,3 +385,180 @@ class Kpoints:
                     delta += flatten_points[-1]
                     flatten_points = np.concatenate((flatten_points, delta))
         return flatten_points
+
+    def adaptive_points(
+        self,
+        function,
+        tolerance=1e-3,
+        gap_tolerance=1e-2,
+        max_depth=6,
+        relative=False,
+    ):
+        r"""
+        Adaptive sampling of the path for the plots of the spectra.
+
+        Each segment of the path starts with :py:attr:`.n` points between the
+        high symmetry points. Then the intervals are bisected, where the spectra
+        deviate from the linear interpolation by more than ``tolerance``
+        or where two neighbouring bands cross or come closer than ``gap_tolerance``.
+        At each step ``function`` is called once for all new points.
+
+        Parameters
+        ----------
+        function : callable
+            Function, which takes the (M, 3) :numpy:`ndarray` of k points
+            in absolute coordinates and returns the (n_bands, M) spectra
+            (i.e. :py:meth:`.MagnonDispersion.omegas`).
+        tolerance : float, default 1e-3
+            Allowed deviation from the linear interpolation.
+            Relative to the energy range of the spectra.
+        gap_tolerance : float, default 1e-2
+            Gap between the neighbouring bands, below which the intervals are bisected,
+            if the gap changes along the interval by more than ``tolerance``.
+            Relative to the energy range of the spectra.
+        max_depth : int, default 6
+            Maximum amount of bisections of the initial intervals.
+        relative : bool, optional
+            Whether to use relative coordinates instead of the absolute ones.
+            Affects returned points and flatten points.
+
+        Returns
+        -------
+        points : (M, 3) :numpy:`ndarray`
+            Coordinates of all points.
+        flatten_points : (M,) :numpy:`ndarray`
+            Flatten coordinates of all points.
+        spectra : (n_bands, M) :numpy:`ndarray`
+            Values of the ``function`` for all points.
+        """
+
+        cell = np.array([self.b1, self.b2, self.b3])
+        if relative:
+            flatten_cell = np.eye(3)
+        else:
+            flatten_cell = cell
+
+        # Ends of the segments in relative coordinates
+        segments = []
+        for subpath in self.path:
+            for i in range(len(subpath) - 1):
+                segments.append(
+                    (
+                        self.hs_coordinates[subpath[i]],
+                        self.hs_coordinates[subpath[i + 1]],
+                    )
+                )
+
+        def coordinates(segment_t):
+            return np.concatenate(
+                [
+                    start + t[:, None] * (end - start)
+                    for (start, end), t in zip(segments, segment_t)
+                ]
+            )
+
+        def evaluate(segment_t):
+            values = np.array(function(coordinates(segment_t) @ cell), dtype=float)
+            splits = np.cumsum([len(t) for t in segment_t])[:-1]
+            return np.split(values, splits, axis=1)
+
+        ts = [np.linspace(0, 1, self._n + 2) for _ in segments]
+        values = evaluate(ts)
+
+        for _ in range(max_depth):
+            spectra = np.concatenate(values, axis=1)
+            scale = np.nanmax(spectra) - np.nanmin(spectra)
+            if not scale > 0:
+                break
+
+            new_ts = []
+            for t, value in zip(ts, values):
+                refine = np.zeros(len(t) - 1, dtype=bool)
+
+                # Deviation of the inner points from the linear interpolation
+                weight = (t[1:-1] - t[:-2]) / (t[2:] - t[:-2])
+                linear = value[:, :-2] + (value[:, 2:] - value[:, :-2]) * weight
+                curved = np.max(np.abs(value[:, 1:-1] - linear), axis=0) > (
+                    tolerance * scale
+                )
+                refine[:-1] |= curved
+                refine[1:] |= curved
+
+                # Small gaps between the neighbouring bands, which change
+                # along the interval (crossings, but not parallel bands)
+                if len(value) > 1:
+                    gaps = np.diff(np.sort(value, axis=0), axis=0)
+                    close = gaps < gap_tolerance * scale
+                    changing = np.abs(np.diff(gaps, axis=1)) > tolerance * scale
+                    refine |= np.any((close[:, :-1] | close[:, 1:]) & changing, axis=0)
+
+                new_ts.append((t[:-1][refine] + t[1:][refine]) / 2)
+
+            if sum(len(t) for t in new_ts) == 0:
+                break
+
+            new_values = evaluate(new_ts)
+            for i in range(len(ts)):
+                t = np.concatenate((ts[i], new_ts[i]))
+                order = np.argsort(t, kind="stable")
+                ts[i] = t[order]
+                values[i] = np.concatenate((values[i], new_values[i]), axis=1)[:, order]
+
+        points = coordinates(ts)
+        flatten_points = []
+        offset = 0
+        for (start, end), t in zip(segments, ts):
+            length = np.linalg.norm((end - start) @ flatten_cell)
+            flatten_points.append(offset + t * length)
+            offset += length
+
+        if not relative:
+            points = points @ cell
+        return points, np.concatenate(flatten_points), np.concatenate(values, axis=1)
+
+
+def monkhorst_pack(grid, gamma_centered=False):
+    r"""
+    Regular grid of k points.
+
+    By default the points are defined as in [1]_:
+
+    .. math::
+
+        u_r = \dfrac{2r - q - 1}{2q}, \quad r = 1, \dots, q
+
+    for each of the three reciprocal vectors.
+
+    Parameters
+    ----------
+    grid : (3,) tuple of int
+        Amount of points (:math:`q`) along each reciprocal lattice vector.
+    gamma_centered : bool, default False
+        Whether to shift the grid to include the :math:`\Gamma` point:
+        :math:`u_r = \dfrac{r - 1}{q}`.
+
+    Returns
+    -------
+    kpoints : (n1 * n2 * n3, 3) :numpy:`ndarray`
+        K points in relative coordinates.
+        The first index of the grid changes the slowest,
+        so the array can be reshaped into (n1, n2, n3, 3).
+
+    References
+    ----------
+    .. [1] Monkhorst, H.J. and Pack, J.D., 1976.
+        Special points for Brillouin-zone integrations.
+        Physical review B, 13(12), p.5188.
+    """
+
+    axes = []
+    for q in grid:
+        q = int(q)
+        if q < 1:
+            raise ValueError(f"Grid has to be positive, got {grid}.")
+        r = np.arange(1, q + 1)
+        if gamma_centered:
+            axes.append((r - 1) / q)
+        else:
+            axes.append((2 * r - q - 1) / (2 * q))
+    return np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape((-1, 3))
@@ -51,13 +51,14 @@ from radtools.crystal.bravais_lattice.variations import (
 from radtools.crystal.constants import (
     BRAVAIS_LATTICE_NAMES,
     DEFAULT_K_PATHS,
+    HOLOHEDRY_ORDERS,
     HS_PLOT_NAMES,
     PEARSON_SYMBOLS,
     REL_TOL,
     TRANSFORM_TO_CONVENTIONAL,
 )
 from radtools.crystal.identify import lepage
-from radtools.crystal.kpoints import Kpoints
+from radtools.crystal.kpoints import Kpoints, monkhorst_pack
 from radtools.geometry import angle, volume
 
 __all__ = ["Lattice"]
@@ -1076,3 +1077,142 @@ class Lattice:
                 + f"Got {type(new_kpoints)} instead."
             )
         self._kpoints = new_kpoints
+
+    # Symmetry of the reciprocal space
+    def point_group(self):
+        r"""
+        Point group of the lattice (holohedry) in the reciprocal space.
+
+        Operations are integer matrices :math:`W`, which act on the relative
+        coordinates of the k points as row vectors:
+
+        .. math::
+
+            \boldsymbol{k}^{\prime} = \boldsymbol{k} W
+
+        and preserve the metric of the reciprocal cell :math:`G = B B^T`:
+        :math:`W G W^T = G`.
+
+        Returns
+        -------
+        operations : (n, 3, 3) :numpy:`ndarray`
+            Operations of the point group, identity is the first one.
+
+        Raises
+        ------
+        RuntimeError
+            If the order of the group does not match the Bravais lattice type
+            (see :py:meth:`.Lattice.type`).
+        """
+
+        metric = self.reciprocal_cell @ self.reciprocal_cell.T
+        tolerance = 2 * self.eps_rel * np.max(np.diag(metric))
+
+        # Candidates for the images of b1, b2, b3: lattice vectors of the same length
+        vectors = np.stack(
+            np.meshgrid(*([np.arange(-2, 3)] * 3), indexing="ij"), axis=-1
+        ).reshape((-1, 3))
+        lengths = np.einsum("ni,ij,nj->n", vectors, metric, vectors)
+        candidates = [
+            vectors[np.abs(lengths - metric[i][i]) < tolerance] for i in range(3)
+        ]
+        operations = np.stack(
+            [
+                np.repeat(
+                    candidates[0], len(candidates[1]) * len(candidates[2]), axis=0
+                ),
+                np.tile(
+                    np.repeat(candidates[1], len(candidates[2]), axis=0),
+                    (len(candidates[0]), 1),
+                ),
+                np.tile(candidates[2], (len(candidates[0]) * len(candidates[1]), 1)),
+            ],
+            axis=1,
+        )
+        preserved = np.abs(operations @ metric @ operations.transpose(0, 2, 1) - metric)
+        operations = operations[np.all(preserved < tolerance, axis=(1, 2))]
+
+        if len(operations) != HOLOHEDRY_ORDERS[self.type()]:
+            raise RuntimeError(
+                f"Found {len(operations)} symmetry operations, "
+                + f"while {self.type()} lattice has {HOLOHEDRY_ORDERS[self.type()]}. "
+                + "Try to standardize the cell or to change eps_rel."
+            )
+
+        # Identity first
+        identity = np.all(operations == np.eye(3, dtype=int), axis=(1, 2))
+        return np.concatenate((operations[identity], operations[~identity]))
+
+    def irreducible_kpoints(
+        self, grid, gamma_centered=False, relative=False, return_mapping=False
+    ):
+        r"""
+        Irreducible k points of the :py:func:`.monkhorst_pack` grid.
+
+        Points of the grid are folded with the operations of the
+        :py:meth:`.point_group`, which map the grid onto itself.
+
+        Notes
+        -----
+        The quantity, which is integrated with these points has to have the full
+        symmetry of the lattice. Magnetic order, Dzyaloshinskii-Moriya interaction
+        or anisotropic exchange may lower it.
+
+        Parameters
+        ----------
+        grid : (3,) tuple of int
+            Amount of k points along each reciprocal lattice vector.
+        gamma_centered : bool, default False
+            Whether to shift the grid to include the :math:`\Gamma` point.
+        relative : bool, default False
+            Whether to return relative or absolute coordinates.
+        return_mapping : bool, default False
+            Whether to return the index of the irreducible point for each point of
+            the full grid.
+
+        Returns
+        -------
+        kpoints : (M, 3) :numpy:`ndarray`
+            Irreducible k points.
+        weights : (M,) :numpy:`ndarray`
+            Weights of the irreducible k points. Sum of the weights is equal to 1.
+        mapping : (n1 * n2 * n3,) :numpy:`ndarray`
+            Index of the irreducible point for each point of the full grid
+            (in the order of :py:func:`.monkhorst_pack`).
+            Only if ``return_mapping`` is True.
+        """
+
+        grid = np.array(grid, dtype=int)
+        full = monkhorst_pack(grid, gamma_centered=gamma_centered)
+        if gamma_centered:
+            offset = np.zeros(3, dtype=float)
+        else:
+            offset = (grid - 1) / 2
+
+        # Unique index of each point in the grid is its position in the full grid
+        def index(points):
+            positions = points * grid + offset
+            rounded = np.round(positions)
+            on_grid = np.all(np.abs(positions - rounded) < 1e-6, axis=1)
+            rounded = rounded.astype(int) % grid
+            return (rounded[:, 0] * grid[1] + rounded[:, 1]) * grid[2] + rounded[
+                :, 2
+            ], on_grid
+
+        representatives = np.arange(len(full))
+        for operation in self.point_group():
+            images, on_grid = index(full @ operation)
+            if np.all(on_grid):
+                representatives = np.minimum(representatives, images)
+
+        irreducible, mapping, counts = np.unique(
+            representatives, return_inverse=True, return_counts=True
+        )
+        kpoints = full[irreducible]
+        if not relative:
+            kpoints = kpoints @ self.reciprocal_cell
+        weights = counts / len(full)
+
+        if return_mapping:
+            return kpoints, weights, mapping
+        return kpoints, weights
@@ -20,8 +20,39 @@ r"""
 Magnon dispersion via linearized spin-wave theory
 """
 
-
-from radtools.magnons.diagonalization import solve_via_colpa
+from radtools.magnons.diagonalization import (
+    solve_via_colpa,
+    solve_via_colpa_batched,
+    solve_via_colpa_sparse,
+)
+from radtools.magnons.checkpoint import resumable_omegas
 from radtools.magnons.dispersion import MagnonDispersion
+from radtools.magnons.fitting import fit_exchange
+from radtools.magnons.integration import (
+    broaden,
+    gaussian_dos,
+    slab_tetrahedra,
+    tetrahedron_dos,
+)
+from radtools.magnons.powder import PowderAverage, fibonacci_sphere
+from radtools.magnons.sweep import sweep_parameters
+from radtools.magnons.thermodynamics import MagnonThermodynamics
+from radtools.magnons.topology import MagnonTopology
 
-__all__ = ["solve_via_colpa", "MagnonDispersion"]
+__all__ = [
+    "solve_via_colpa",
+    "solve_via_colpa_batched",
+    "solve_via_colpa_sparse",
+    "MagnonDispersion",
+    "resumable_omegas",
+    "fit_exchange",
+    "gaussian_dos",
+    "tetrahedron_dos",
+    "slab_tetrahedra",
+    "broaden",
+    "PowderAverage",
+    "fibonacci_sphere",
+    "sweep_parameters",
+    "MagnonThermodynamics",
+    "MagnonTopology",
+]
@@ -0,0 +1,194 @@
+# RAD-tools - program for spin Hamiltonian and magnons.
+# Copyright (C) 2022-2023  Andrey Rybakov
+#
+# e-mail: anry@uv.es, web: adrybakov.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+r"""
+Resumable calculations of the magnon energies.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from radtools.crystal.kpoints import Kpoints
+from radtools.magnons.dispersion import MagnonDispersion
+
+__all__ = ["resumable_omegas"]
+
+MANIFEST = "manifest.json"
+
+
+def resumable_omegas(
+    dispersion: MagnonDispersion,
+    kpoints,
+    directory,
+    chunk_size=1000,
+    zeros_to_none=False,
+    dtype=float,
+):
+    r"""
+    Magnon energies, which survive the interruption of the calculation.
+
+    K points are split into the numbered chunks. Energies of each finished chunk
+    are written to the file "chunk_<number>.npy" in the ``directory``.
+    Each file is written to a temporary file first and then renamed, therefore
+    an interrupted write never leaves a broken chunk. The manifest file
+    "manifest.json" records the hash of the dispersion and of the k points and
+    the parameters of the calculation.
+
+    If the calculation is started again with the same ``directory``, then the
+    finished chunks are loaded instead of being computed.
+
+    Parameters
+    ----------
+    dispersion : :py:class:`.MagnonDispersion`
+        Magnon dispersion.
+    kpoints : (M, 3) |array_like|_ or :py:class:`.Kpoints`
+        K points in absolute coordinates.
+    directory : str
+        Directory for the results. Created if it does not exist.
+    chunk_size : int, default 1000
+        Amount of k points in one chunk.
+    zeros_to_none : bool, default=False
+        If True, then return ``nan`` instead of 0 if Colpa fails.
+    dtype : data-type, default float
+        Data type of the stored energies.
+
+    Returns
+    -------
+    omegas : (N, M) :numpy:`ndarray`
+        Magnon energies for each k point.
+
+    Raises
+    ------
+    ValueError
+        If the ``directory`` contains the results of a different calculation
+        (other dispersion, k points or parameters).
+    """
+
+    if isinstance(kpoints, Kpoints):
+        kpoints = kpoints.points()
+    kpoints = np.array(kpoints, dtype=float).reshape((-1, 3))
+    n_chunks = -(-len(kpoints) // chunk_size)
+
+    manifest = {
+        "model_hash": _dispersion_hash(dispersion),
+        "kpoints_hash": _hash([kpoints]),
+        "parameters": {
+            "N": int(dispersion.N),
+            "n_kpoints": len(kpoints),
+            "chunk_size": int(chunk_size),
+            "n_chunks": n_chunks,
+            "zeros_to_none": bool(zeros_to_none),
+            "dtype": np.dtype(dtype).str,
+            "families": {
+                family: [float(scale) for scale in scales]
+                for family, scales in dispersion.parameters.items()
+            },
+        },
+    }
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, MANIFEST)
+    if os.path.isfile(path):
+        with open(path, "r", encoding="utf-8") as file:
+            existing = json.load(file)
+        if existing != manifest:
+            raise ValueError(
+                f"Directory {directory} contains the results of another calculation, "
+                + f"see {path}. Use another directory or remove it."
+            )
+    else:
+        _atomic_write(
+            path, lambda file: file.write(json.dumps(manifest, indent=4).encode())
+        )
+
+    width = len(str(max(n_chunks - 1, 0)))
+    omegas = np.zeros((len(kpoints), dispersion.N), dtype=dtype)
+    for index in range(n_chunks):
+        chunk = slice(index * chunk_size, (index + 1) * chunk_size)
+        filename = os.path.join(directory, f"chunk_{index:0{width}d}.npy")
+        if os.path.isfile(filename):
+            omegas[chunk] = np.load(filename)
+        else:
+            omegas[chunk] = dispersion.omegas(
+                kpoints[chunk], zeros_to_none=zeros_to_none, chunk_size=chunk_size
+            ).T
+            _atomic_write(filename, lambda file: np.save(file, omegas[chunk]))
+    return omegas.T
+
+
+def _atomic_write(filename, write):
+    r"""
+    Write the file via a temporary file in the same directory.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the final file.
+    write : callable
+        Function, which writes the content to the opened binary file.
+    """
+
+    descriptor, temporary = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(filename)), suffix=".tmp"
+    )
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            write(file)
+            file.flush()
+            os.fsync(file.fileno())
+        # Rename is atomic on the same file system
+        os.replace(temporary, filename)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def _hash(arrays):
+    r"""
+    SHA-256 hash of the content of the arrays.
+    """
+
+    sha = hashlib.sha256()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        sha.update(str((array.dtype.str, array.shape)).encode())
+        sha.update(array.tobytes())
+    return sha.hexdigest()
+
+
+def _dispersion_hash(dispersion: MagnonDispersion):
+    r"""
+    Hash of the arrays, which define h(k) of the dispersion.
+    """
+
+    return _hash(
+        [
+            dispersion.J_matrices,
+            dispersion.indices_i,
+            dispersion.indices_j,
+            dispersion.dis_vectors,
+            dispersion.S,
+            np.array(dispersion.Q, dtype=float),
+            np.array(dispersion.n, dtype=float),
+        ]
+    )
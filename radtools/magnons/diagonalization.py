@@ -18,10 +18,17 @@
 
 import numpy as np
 from numpy.linalg import LinAlgError
+from scipy.sparse import csc_matrix, diags
+from scipy.sparse.linalg import ArpackNoConvergence, LinearOperator, eigs, splu
 
 from radtools.exceptions import ColpaFailed
 
-__all__ = ["solve_via_colpa"]
+__all__ = [
+    "solve_via_colpa",
+    "solve_via_colpa_batched",
+    "solve_via_colpa_sparse",
+    "paraunitary_inverse",
+]
 
 
 def solve_via_colpa(D):
@@ -147,3 +154,251 @@ def solve_via_colpa(D):
     G[N:, :N] *= -1
 
     return E, G
+
+
+def solve_via_colpa_batched(D, return_G=False):
+    r"""
+    Diagonalize a stack of grand-dynamical matrices following the method of Colpa [1]_.
+
+    Stacked version of :py:func:`.solve_via_colpa`. Cholesky decomposition and
+    diagonalization are done by the stacked LAPACK calls of numpy. The Hermitian
+    eigensolver is used for the matrix :math:`\boldsymbol{K}\boldsymbol{g}\boldsymbol{K}^{\dagger}`.
+
+    Parameters
+    ----------
+    D : (M, 2N, 2N) |array_like|_
+        Stack of M grand dynamical matrices. Each of them is expected to be Hermitian
+        and positive-defined. See :py:func:`.solve_via_colpa` for details.
+    return_G : bool, default False
+        Whether to return the transformation matrices.
+
+    Returns
+    -------
+    E : (M, 2N) :numpy:`ndarray`
+        The eigenvalues for each matrix of the stack.
+        Ordered in the same way as in :py:func:`.solve_via_colpa`.
+        Filled with ``nan`` for the matrices, for which diagonalization failed.
+    G : (M, 2N, 2N) :numpy:`ndarray`
+        Transformation matrices. Returned only if ``return_G`` is ``True``.
+        Filled with ``nan`` for the matrices, for which diagonalization failed.
+        See :py:func:`.solve_via_colpa` for details.
+    failed : (M,) :numpy:`ndarray` of bool
+        ``True`` for the matrices, which are not positive-defined.
+        Failure of the diagonalization is not raised as an exception,
+        all other matrices of the stack are diagonalized normally.
+
+    References
+    ----------
+    .. [1] Colpa, J.H.P., 1978.
+        Diagonalization of the quadratic boson hamiltonian.
+        Physica A: Statistical Mechanics and its Applications,
+        93(3-4), pp.327-353.
+    """
+
+    D = np.array(D, dtype=complex)
+    M = D.shape[0]
+    N = D.shape[-1] // 2
+    g = np.concatenate((np.ones(N), -np.ones(N)))
+
+    # Cholesky decomposition, on failure the positive-defined matrices
+    # are selected by their eigenvalues
+    failed = np.zeros(M, dtype=bool)
+    K = np.zeros(D.shape, dtype=complex)
+    try:
+        K = np.linalg.cholesky(D)
+    except LinAlgError:
+        failed = ~(np.linalg.eigvalsh(D)[:, 0] > 0)
+        K[~failed], failed[~failed] = _cholesky_bisection(D[~failed])
+    # In Colpa article decomposition is K^{\dag}K, while numpy gives KK^{\dag}
+    K = np.conjugate(np.transpose(K, (0, 2, 1)))
+
+    E = np.full((M, 2 * N), np.nan, dtype=float)
+    if return_G:
+        G = np.full((M, 2 * N, 2 * N), np.nan, dtype=complex)
+
+    success = ~failed
+    if success.any():
+        K = K[success]
+        KgK = (K * g[None, None, :]) @ np.conjugate(np.transpose(K, (0, 2, 1)))
+        # Eigenvectors are computed only if they are needed
+        if return_G:
+            L, U = np.linalg.eigh(KgK)
+            U = U[:, :, ::-1]
+        else:
+            L = np.linalg.eigvalsh(KgK)
+        # Eigenvalues are sorted in descending order
+        L = L[:, ::-1]
+
+        E[success] = L * g
+
+        if return_G:
+            G_minus_one = np.linalg.solve(K, U * np.sqrt(E[success])[:, None, :])
+
+            # Compute G from G^-1 following Colpa, see equation (3.7) for details
+            G_success = np.conjugate(np.transpose(G_minus_one, (0, 2, 1)))
+            G_success[:, :N, N:] *= -1
+            G_success[:, N:, :N] *= -1
+            G[success] = G_success
+
+    if return_G:
+        return E, G, failed
+    return E, failed
+
+
+def paraunitary_inverse(G):
+    r"""
+    Inverse of the transformation matrices of :py:func:`.solve_via_colpa`.
+
+    Transformation matrix is paraunitary, therefore its inverse is
+
+    .. math::
+
+        \boldsymbol{T} = \boldsymbol{G}^{-1} =
+        \boldsymbol{g}\boldsymbol{G}^{\dagger}\boldsymbol{g}
+
+    where :math:`\boldsymbol{g}` is the diagonal matrix with N ones
+    followed by N minus ones. Columns of :math:`\boldsymbol{T}` are the
+    eigenvectors of :math:`\boldsymbol{g}\boldsymbol{D}`.
+
+    Parameters
+    ----------
+    G : (..., 2N, 2N) |array_like|_
+        Transformation matrix or a stack of them.
+
+    Returns
+    -------
+    T : (..., 2N, 2N) :numpy:`ndarray`
+        Inverse of each matrix.
+    """
+
+    G = np.asarray(G)
+    N = G.shape[-1] // 2
+    g = np.concatenate((np.ones(N), -np.ones(N)))
+    return g[:, None] * np.conjugate(np.swapaxes(G, -1, -2)) * g[None, :]
+
+
+def _cholesky_bisection(D):
+    r"""
+    Stacked Cholesky decomposition, which tolerates the failures.
+
+    Stack is split in halves until the failed matrices are isolated.
+
+    Returns
+    -------
+    K : (M, n, n) :numpy:`ndarray`
+        Lower-triangular factors, zeros for the failed matrices.
+    failed : (M,) :numpy:`ndarray` of bool
+    """
+
+    K = np.zeros(D.shape, dtype=complex)
+    failed = np.zeros(len(D), dtype=bool)
+    if len(D) == 0:
+        return K, failed
+    try:
+        K = np.linalg.cholesky(D)
+    except LinAlgError:
+        if len(D) == 1:
+            failed[0] = True
+        else:
+            half = len(D) // 2
+            K[:half], failed[:half] = _cholesky_bisection(D[:half])
+            K[half:], failed[half:] = _cholesky_bisection(D[half:])
+    return K, failed
+
+
+def solve_via_colpa_sparse(D, n_modes=6, sigma=0.0, return_G=False, tol=0):
+    r"""
+    Lowest eigenvalues of a sparse grand-dynamical matrix.
+
+    Sparse counterpart of :py:func:`.solve_via_colpa` for the large matrices,
+    for which only a few modes are needed. The eigenvalues of the dynamical matrix
+    :math:`\boldsymbol{g}\boldsymbol{D}` closest to ``sigma`` from above are
+    computed by the shift-invert Arnoldi iterations of ARPACK with the operator
+
+    .. math::
+
+        (\boldsymbol{g}\boldsymbol{D} - \sigma)^{-1} =
+        (\boldsymbol{D} - \sigma\boldsymbol{g})^{-1}\boldsymbol{g}
+
+    Only one sparse LU decomposition of :math:`\boldsymbol{D} - \sigma\boldsymbol{g}`
+    is computed, the dense matrices of the size :math:`2N \times 2N` are never formed.
+    Only the eigenvalues of the first half (see :py:func:`.solve_via_colpa`),
+    i.e. with the positive norm :math:`\boldsymbol{T}_n^{\dagger}\boldsymbol{g}\boldsymbol{T}_n`,
+    are returned.
+
+    Iterations converge fast, if ``sigma`` is close to the lowest computed eigenvalue.
+
+    Parameters
+    ----------
+    D : (2N, 2N) :py:class:`scipy.sparse.spmatrix` or |array_like|_
+        Grand dynamical matrix. It is expected to be Hermitian and positive-defined.
+        See :py:func:`.solve_via_colpa` for details.
+    n_modes : int, default 6
+        Amount of the computed eigenvalues. Has to be smaller than :math:`2N - 1`.
+    sigma : float, default 0
+        Shift of the spectrum. Eigenvalues above it are computed.
+        Small negative value is required for the positive semidefinite matrices
+        (i.e. with the Goldstone modes), since :math:`\boldsymbol{D}` is singular.
+    return_G : bool, default False
+        Whether to return the eigenvectors.
+    tol : float, default 0
+        Relative accuracy of the eigenvalues. By default the machine precision is used.
+
+    Returns
+    -------
+    E : (n_modes,) :numpy:`ndarray`
+        Eigenvalues in ascending order. Less than ``n_modes`` only for the smallest
+        matrices.
+    T : (2N, n_modes) :numpy:`ndarray`
+        Columns of :math:`\boldsymbol{G}^{-1}`, which correspond to the eigenvalues ``E``,
+        normalized as :math:`\boldsymbol{T}_n^{\dagger}\boldsymbol{g}\boldsymbol{T}_n = 1`.
+        Returned only if ``return_G`` is ``True``.
+
+    Raises
+    ------
+    ColpaFailed
+        If the shifted matrix is singular, if the iterations do not converge or if
+        some of the computed eigenvalues are complex (matrix is not positive-defined).
+    """
+
+    D = csc_matrix(D, dtype=complex)
+    N = D.shape[0] // 2
+    g = np.concatenate((np.ones(N), -np.ones(N)))
+
+    try:
+        lu = splu(csc_matrix(D - sigma * diags(g)))
+    except RuntimeError:
+        raise ColpaFailed
+
+    operator = LinearOperator(
+        D.shape, matvec=lambda x: lu.solve(g * x.flatten()), dtype=complex
+    )
+    # Eigenvalues of the second half, which are above sigma (i.e. the partners
+    # of the zero modes), are dropped, therefore more modes may be requested
+    n_computed = n_modes
+    while True:
+        # Eigenvalues 1 / (E - sigma) with the largest real part are the closest to sigma
+        try:
+            mu, T = eigs(operator, k=n_computed, which="LR", tol=tol)
+        except ArpackNoConvergence:
+            raise ColpaFailed
+
+        E = sigma + 1 / mu
+        if (np.abs(E.imag) > 1e-6 * np.maximum(1, np.abs(E.real))).any():
+            raise ColpaFailed
+        E = E.real
+        # For the positive-defined D the sign of the norm is the sign of the eigenvalue
+        norms = np.einsum("in,i,in->n", np.conjugate(T), g, T).real
+        if ((norms * E < 0) & (np.abs(E) > 1e-8)).any():
+            raise ColpaFailed
+        first_half = norms > 0
+        if first_half.sum() >= n_modes or n_computed >= 2 * N - 2:
+            break
+        n_computed = min(n_computed + n_modes - first_half.sum(), 2 * N - 2)
+
+    order = np.argsort(E[first_half])[:n_modes]
+    E = E[first_half][order]
+    if return_G:
+        T = T[:, first_half][:, order] / np.sqrt(norms[first_half][order])[None, :]
+        return E, T
+    return E
@@ -16,15 +16,29 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from copy import deepcopy
-from math import sqrt
+import os
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse import coo_matrix
 from scipy.spatial.transform import Rotation
 
-from radtools.crystal.kpoints import Kpoints
+from radtools.crystal.kpoints import Kpoints, monkhorst_pack
 from radtools.geometry import span_orthonormal_set
-from radtools.magnons.diagonalization import ColpaFailed, solve_via_colpa
+from radtools.numerical import bond_sum, group_bonds
+from radtools.exceptions import ColpaFailed
+from radtools.magnons.diagonalization import (
+    paraunitary_inverse,
+    solve_via_colpa_batched,
+    solve_via_colpa_sparse,
+)
+from radtools.magnons.integration import (
+    broaden,
+    gaussian_dos,
+    slab_tetrahedra,
+    tetrahedron_dos,
+)
 from radtools.spinham.hamiltonian import SpinHamiltonian
 
 __all__ = ["MagnonDispersion"]
@@ -52,6 +66,11 @@ class MagnonDispersion:
     custom_mask : func
         Custom mask for the exchange parameter. Function which take (3,3) :numpy:`ndarray`
         as an input and returns (3,3) :numpy:`ndarray` as an output.
+    template : :py:class:`.ExchangeTemplate`, optional
+        Template, which groups the bonds into the families (i.e. J1, J2, ...).
+        Parameters of the families can be changed
+        via :py:meth:`.update_parameters`. Bonds, which are not in the template,
+        are kept fixed.
 
     Attributes
     ----------
@@ -61,20 +80,26 @@ class MagnonDispersion:
         Global rotational axis.
     N : int
         Number of magnetic atoms.
-    J_matrices : (M,) :numpy:`ndarray`
+    J_matrices : (M, 3, 3) :numpy:`ndarray`
         Exchange parameters.
-    i : (M,) :numpy:`ndarray`
+    indices_i : (M,) :numpy:`ndarray`
         Indices of the first atom in the exchange pair.
-    j : (M,) :numpy:`ndarray`
+    indices_j : (M,) :numpy:`ndarray`
         Indices of the second atom in the exchange pair.
-    d : (M, 3) :numpy:`ndarray`
+    dis_vectors : (M, 3) :numpy:`ndarray`
         Vectors from the first atom to the second atom in the exchange pair.
     S : (N, 3) :numpy:`ndarray`
         Spin vectors.
+    reciprocal_cell : (3, 3) :numpy:`ndarray` or None
+        Reciprocal cell of the model, rows are vectors.
+    positions : (N, 3) :numpy:`ndarray`
+        Positions of the magnetic atoms in the unit cell. In absolute coordinates.
     u : (N, 3) :numpy:`ndarray`
         Defined from local spin directions.
     v : (N, 3) :numpy:`ndarray`
         Defined from local spin directions.
+    families : list of str
+        Names of the families of the bonds.
     """
 
     def __init__(
@@ -85,18 +110,153 @@ class MagnonDispersion:
         nodmi=False,
         noaniso=False,
         custom_mask=None,
+        template=None,
     ):
-        self._C = None
-        # Store the exchange model, but privately
-        self._model = deepcopy(model)
-        self._model.notation = "SpinW"
+        # Get spin vectors of the magnetic atoms
+        magnetic_atoms = model.magnetic_atoms
+        spins = np.zeros((len(magnetic_atoms), 3), dtype=float)
+        positions = np.zeros((len(magnetic_atoms), 3), dtype=float)
+        for a_i, atom in enumerate(magnetic_atoms):
+            try:
+                spins[a_i] = atom.spin_vector
+            except ValueError:
+                raise ValueError(
+                    f"Spin vector is not defined for {atom.fullname} atom."
+                )
+            positions[a_i] = model.get_atom_coordinates(atom, relative=False)
+
+        # Get the exchange parameters, indices and vectors form the SpinHamiltonian.
+        # The model is not copied, the parameters are converted to the SpinW notation
+        J_matrices, indices_i, indices_j, dis_vectors = model.input_for_magnons(
+            nodmi=nodmi, noaniso=noaniso, custom_mask=custom_mask, notation="SpinW"
+        )
 
         # Convert Q to absolute coordinates
         if Q is None:
             Q = [0, 0, 0]
-        self.Q = np.array(Q, dtype=float) @ self._model.reciprocal_cell
+        Q = np.array(Q, dtype=float) @ model.reciprocal_cell
+
+        families = None
+        if template is not None:
+            families = _families_from_template(
+                model, template, indices_i, indices_j, dis_vectors
+            )
+
+        self._setup(
+            J_matrices,
+            indices_i,
+            indices_j,
+            dis_vectors,
+            spins,
+            Q,
+            n,
+            reciprocal_cell=model.reciprocal_cell,
+            positions=positions,
+            families=families,
+        )
+
+    @classmethod
+    def from_arrays(
+        cls,
+        J_matrices,
+        indices_i,
+        indices_j,
+        dis_vectors,
+        spins,
+        Q=None,
+        n=None,
+        reciprocal_cell=None,
+        positions=None,
+        families=None,
+    ):
+        r"""
+        Create magnon dispersion directly from the arrays of the bonds.
+
+        No :py:class:`.SpinHamiltonian` is involved. It is the fastest way
+        to construct the dispersion, for example in the scans over parameters.
+
+        Parameters
+        ----------
+        J_matrices : (M, 3, 3) |array_like|_
+            Exchange matrices in the "SpinW" notation
+            (see :py:attr:`.SpinHamiltonian.notation`).
+        indices_i : (M,) |array_like|_
+            Indices of the first atom of each bond in ``spins``.
+        indices_j : (M,) |array_like|_
+            Indices of the second atom of each bond in ``spins``.
+        dis_vectors : (M, 3) |array_like|_
+            Vectors of the unit cell of the second atom of each bond.
+            In absolute coordinates.
+        spins : (N, 3) |array_like|_
+            Spin vectors of the magnetic atoms.
+        Q : (3,) |array_like|_, optional
+            Ordering wave vector of the spin-spiral.
+            In absolute coordinates in reciprocal space.
+        n : (3,) |array_like|_, optional
+            Global rotational axis. If None provided, then it is set to the direction of ``Q``.
+        reciprocal_cell : (3, 3) |array_like|_, optional
+            Reciprocal cell, rows are vectors. Required for the integration
+            over the Brillouin zone (i.e. :py:meth:`.dos`).
+        positions : (N, 3) |array_like|_, optional
+            Positions of the magnetic atoms in the unit cell. In absolute coordinates.
+            Used only for the :py:meth:`.structure_factor`. By default all atoms
+            are placed at the origin of the unit cell.
+        families : (M,) list of str, optional
+            Name of the family of each bond (see :py:meth:`.update_parameters`).
+            ``None`` for the bonds, which do not belong to any family.
+
+        Returns
+        -------
+        dispersion : :py:class:`.MagnonDispersion`
+
+        See Also
+        --------
+        SpinHamiltonian.input_for_magnons
+        """
+
+        dispersion = cls.__new__(cls)
+        if Q is None:
+            Q = [0, 0, 0]
+        dispersion._setup(
+            J_matrices,
+            indices_i,
+            indices_j,
+            dis_vectors,
+            spins,
+            np.array(Q, dtype=float),
+            n,
+            reciprocal_cell=reciprocal_cell,
+            positions=positions,
+            families=families,
+        )
+        return dispersion
+
+    def _setup(
+        self,
+        J_matrices,
+        indices_i,
+        indices_j,
+        dis_vectors,
+        spins,
+        Q,
+        n,
+        reciprocal_cell=None,
+        positions=None,
+        families=None,
+    ):
+        r"""
+        Initialize the dispersion from the arrays.
+
+        See :py:meth:`.from_arrays` for the description of parameters,
+        ``Q`` is expected in absolute coordinates.
+        """
 
-        # Convert n to absolute coordinates, use Q if n is not provided
+        self.Q = Q
+        if reciprocal_cell is not None:
+            reciprocal_cell = np.array(reciprocal_cell, dtype=float)
+        self.reciprocal_cell = reciprocal_cell
+
+        # Use Q if n is not provided
         if n is None:
             if np.allclose([0, 0, 0], Q):
                 self.n = np.array([0, 0, 1])
@@ -105,41 +265,329 @@ class MagnonDispersion:
         else:
             self.n = np.array(n, dtype=float) / np.linalg.norm(n)
 
+        self.J_matrices = np.array(J_matrices, dtype=float).reshape((-1, 3, 3))
+        self.indices_i = np.array(indices_i, dtype=int)
+        self.indices_j = np.array(indices_j, dtype=int)
+        self.dis_vectors = np.array(dis_vectors, dtype=float).reshape((-1, 3))
+
         # Get the number of magnetic atoms
-        self.N = len(self._model.magnetic_atoms)
-
-        # Get the exchange parameters, indices and vectors form the SpinHamiltonian
-        (
-            self.J_matrices,
-            self.indices_i,
-            self.indices_j,
-            self.dis_vectors,
-        ) = self._model.input_for_magnons(
-            nodmi=nodmi, noaniso=noaniso, custom_mask=custom_mask
-        )
+        self.N = len(spins)
 
         # Initialize spin vector, u vector and v vector arrays
-        self.S = np.zeros((self.N, 3), dtype=float)
+        self.S = np.array(spins, dtype=float).reshape((self.N, 3))
+        if positions is None:
+            positions = np.zeros((self.N, 3), dtype=float)
+        self.positions = np.array(positions, dtype=float).reshape((self.N, 3))
         self.u = np.zeros((self.N, 3), dtype=complex)
         self.v = np.zeros((self.N, 3), dtype=complex)
 
-        # Get spin vectors and compute u and v vectors from local spin directions
-        for a_i, atom in enumerate(self._model.magnetic_atoms):
-            try:
-                self.S[a_i] = atom.spin_vector
-                e1, e2, e3 = span_orthonormal_set(self.S[a_i])
-                self.v[a_i] = e3
-                self.u[a_i] = e1 + 1j * e2
-            except ValueError:
+        # Compute u and v vectors from local spin directions
+        for a_i in range(self.N):
+            e1, e2, e3 = span_orthonormal_set(self.S[a_i])
+            self.v[a_i] = e3
+            self.u[a_i] = e1 + 1j * e2
+
+        # Rotation of the exchange matrices by the spiral,
+        # it is applied in _prepare_batched()
+        self._rotations = np.zeros((len(self.J_matrices), 3, 3), dtype=float)
+        if len(self.J_matrices) != 0:
+            rotvecs = self.n[None, :] * (self.dis_vectors @ self.Q)[:, None]
+            self._rotations = Rotation.from_rotvec(rotvecs).as_matrix()
+
+        # Family of each bond, -1 for the fixed bonds
+        if families is None:
+            families = [None] * len(self.J_matrices)
+        self.families = []
+        self._bond_family = np.zeros(len(self.J_matrices), dtype=int)
+        for index, family in enumerate(families):
+            if family is None:
+                self._bond_family[index] = -1
+            else:
+                if family not in self.families:
+                    self.families.append(family)
+                self._bond_family[index] = self.families.index(family)
+        # Scales of the symmetric and antisymmetric parts of each family
+        self._scales = np.ones((len(self.families), 2), dtype=float)
+        self._grid = None
+        self._grid_h = None
+
+        self._prepare_batched()
+
+    def _prepare_batched(self):
+        r"""
+        Precompute bond-resolved quantities for the batched evaluation.
+
+        Bonds are sorted by the (i, j) pair, so that the Fourier sums over
+        the bonds reduce to one :numpy:`add.reduceat` call per stack of k points.
+        """
+
+        self._groups = group_bonds(self.indices_i, self.indices_j, self.N)
+
+        # Symmetric and antisymmetric parts are kept separately,
+        # since the prefactors are linear in the exchange matrices.
+        # Parts are separated before the rotation by the spiral,
+        # since the rotation mixes them
+        self._J_parts = np.array(
+            [
+                (self.J_matrices + np.transpose(self.J_matrices, (0, 2, 1))) / 2,
+                (self.J_matrices - np.transpose(self.J_matrices, (0, 2, 1))) / 2,
+            ]
+        )
+        self._J_parts = self._J_parts @ self._rotations[None]
+        self._parts = [self._prefactors(J_matrices) for J_matrices in self._J_parts]
+        self._combine()
+
+    def _prefactors(self, J_matrices):
+        r"""
+        Bond-resolved prefactors of A(k), B(k) and C.
+
+        Parameters
+        ----------
+        J_matrices : (n_bonds, 3, 3) :numpy:`ndarray`
+            Exchange matrices of the bonds.
+
+        Returns
+        -------
+        A_bonds : (n_bonds,) :numpy:`ndarray`
+        B_bonds : (n_bonds,) :numpy:`ndarray`
+        C_bonds : (n_bonds,) :numpy:`ndarray`
+            Contributions of the bonds to the :math:`C^{i,i}`.
+        """
+
+        spins = np.linalg.norm(self.S, axis=1)
+        factor = np.sqrt(spins[self.indices_i] * spins[self.indices_j]) / 2
+        u_i = self.u[self.indices_i]
+        u_j = self.u[self.indices_j]
+        v_i = self.v[self.indices_i]
+        v_j = self.v[self.indices_j]
+
+        A_bonds = factor * np.einsum("bx,bxy,by->b", u_i, J_matrices, np.conjugate(u_j))
+        B_bonds = factor * np.einsum("bx,bxy,by->b", u_i, J_matrices, u_j)
+        C_bonds = spins[self.indices_j] * np.einsum(
+            "bx,bxy,by->b", v_i, J_matrices, v_j
+        )
+        return A_bonds, B_bonds, C_bonds.astype(complex)
+
+    def _combine(self):
+        r"""
+        Recombine the bond-resolved prefactors with the current scales of the families.
+        """
+
+        # Fixed bonds (family -1) take the last row
+        scales = np.concatenate((self._scales, np.ones((1, 2))))[self._bond_family].T
+        self.J_matrices = np.einsum("pb,pbxy->bxy", scales, self._J_parts)
+        self._A_bonds, self._B_bonds, C_bonds = [
+            scales[0] * symmetric + scales[1] * antisymmetric
+            for symmetric, antisymmetric in zip(*self._parts)
+        ]
+        # C is diagonal, only the diagonal is stored (see sparse_h)
+        self._C_diagonal = np.zeros(self.N, dtype=complex)
+        np.add.at(self._C_diagonal, self.indices_i, C_bonds)
+
+    @property
+    def parameters(self):
+        r"""
+        Current scales of the families.
+
+        Returns
+        -------
+        parameters : dict
+            Scales of the symmetric and antisymmetric (DMI) parts of
+            the exchange matrices for each family::
+
+                {family: (symmetric, antisymmetric), ...}
+        """
+
+        return {
+            family: tuple(float(scale) for scale in self._scales[index])
+            for index, family in enumerate(self.families)
+        }
+
+    def has_dmi(self, family):
+        r"""
+        Whether the exchange matrices of the family have antisymmetric (DMI) part.
+
+        Parameters
+        ----------
+        family : str
+            Name of the family.
+
+        Returns
+        -------
+        has_dmi : bool
+            ``True`` if at least one bond of the family has non-zero
+            antisymmetric part, independently of the current scales.
+
+        See Also
+        --------
+        parameters
+        """
+
+        if family not in self.families:
+            raise ValueError(
+                f"Family {family} is not defined for the dispersion, "
+                + f"available: {self.families}."
+            )
+        bonds = self._bond_family == self.families.index(family)
+        return bool(np.any(self._J_parts[1][bonds] != 0))
+
+    def update_parameters(self, parameters):
+        r"""
+        Scale the exchange parameters of the families.
+
+        Hamiltonian is linear in the exchange parameters:
+
+        .. math::
+
+            h(\boldsymbol{k}) = h_0(\boldsymbol{k}) + \sum_p s_p H_p(\boldsymbol{k})
+
+        where :math:`h_0` comes from the bonds outside of any family and
+        :math:`H_p` from the symmetric or antisymmetric part of the family :math:`p`.
+        Only the scales :math:`s_p` are changed, the spin Hamiltonian is not involved.
+        On the k points of :py:meth:`.precompute` the bonds are not summed again,
+        only the diagonalization is repeated.
+
+        Scales are given with respect to the parameters, with which the
+        dispersion was created, and are not accumulated between the calls.
+
+        Parameters
+        ----------
+        parameters : dict
+            Scales of the families::
+
+                {family: scale, ...}
+                {family: (symmetric_scale, antisymmetric_scale), ...}
+
+            A single scale is applied to the whole exchange matrix. Families,
+            which are not mentioned, keep their scales.
+
+        See Also
+        --------
+        parameters
+        precompute
+        """
+
+        for family, scale in parameters.items():
+            if family not in self.families:
                 raise ValueError(
-                    f"Spin vector is not defined for {atom.fullname} atom."
+                    f"Family {family} is not defined for the dispersion, "
+                    + f"available: {self.families}."
                 )
+            self._scales[self.families.index(family)] = np.broadcast_to(
+                np.array(scale, dtype=float), (2,)
+            )
+        self._combine()
+
+    def precompute(self, kpoints):
+        r"""
+        Compute and cache the Fourier components of h(k) for each family.
+
+        :py:meth:`.omegas` on the same k points (in the same order) recombines the
+        cached components with the scales of :py:meth:`.update_parameters`
+        instead of summing over the bonds.
+
+        Parameters
+        ----------
+        kpoints : (M, 3) |array_like|_ or :py:class:`.Kpoints`
+            K points in absolute coordinates.
+            If ``None``, then the cache is cleared.
+
+        Notes
+        -----
+        Cache takes :math:`M(2N)^2(2P + 1)` complex numbers, where :math:`P` is the
+        amount of families.
+        """
+
+        if kpoints is None:
+            self._grid = None
+            self._grid_h = None
+            return
+        if isinstance(kpoints, Kpoints):
+            kpoints = kpoints.points()
+        self._grid = np.array(kpoints, dtype=float).reshape((-1, 3))
+        self._grid_h = self._components(self._grid)
+
+    def _components(self, kpoints):
+        r"""
+        Fourier components of h(k) for the fixed bonds and each part of each family.
+
+        Parameters
+        ----------
+        kpoints : (M, 3) :numpy:`ndarray`
+            K points in absolute coordinates.
+
+        Returns
+        -------
+        components : (M, 2P + 1, 2N, 2N) :numpy:`ndarray`
+            Component 0 comes from the fixed bonds,
+            component :math:`2p + 1 + part` from the part (0 - symmetric,
+            1 - antisymmetric) of the family :math:`p`.
+        """
 
-        # Rotate exchange matrices
-        for i in range(len(self.J_matrices)):
-            rotvec = self.n * (self.Q @ self.dis_vectors[i])
-            R_nm = Rotation.from_rotvec(rotvec).as_matrix()
-            self.J_matrices[i] = self.J_matrices[i] @ R_nm
+        n_bonds = len(self._bond_family)
+        n_components = 2 * len(self.families) + 1
+        values = np.zeros((3, n_bonds, n_components), dtype=complex)
+        bonds = np.arange(n_bonds)
+        fixed = self._bond_family == -1
+        for part in range(2):
+            component = np.where(fixed, 0, 2 * self._bond_family + 1 + part)
+            values[:, bonds, component] += np.array(self._parts[part])
+        A_values, B_values, C_values = values
+
+        C = np.zeros((self.N, self.N, n_components), dtype=complex)
+        np.add.at(C, (self.indices_i, self.indices_i), C_values)
+        phases = self._phases(-kpoints)
+        blocks = [
+            np.moveaxis(self._bond_sum(phases, bonds), -1, 1)
+            for bonds in [A_values, B_values, np.conjugate(A_values)]
+        ]
+        return self._assemble_h(*blocks, C=np.moveaxis(C, -1, 0))
+
+    def _component_weights(self):
+        r"""
+        Weights of the components of :py:meth:`._components`.
+
+        Returns
+        -------
+        weights : (2P + 1,) :numpy:`ndarray`
+        """
+
+        return np.concatenate(([1], self._scales.flatten()))
+
+    def _phases(self, k):
+        r"""
+        Phase factors :math:`e^{-i\boldsymbol{k}\boldsymbol{d}}` for all bonds.
+
+        Parameters
+        ----------
+        k : (M, 3) :numpy:`ndarray`
+            Reciprocal vectors. In absolute coordinates.
+
+        Returns
+        -------
+        phases : (M, n_bonds) :numpy:`ndarray`
+        """
+
+        return np.exp(-1j * (k @ self.dis_vectors.T))
+
+    def _bond_sum(self, phases, values):
+        r"""
+        Sum bond-resolved values into the (i, j) blocks.
+
+        Parameters
+        ----------
+        phases : (M, n_bonds) :numpy:`ndarray`
+            Phase factors, as returned by :py:meth:`._phases`.
+        values : (n_bonds, ...) :numpy:`ndarray`
+            Bond-resolved values.
+
+        Returns
+        -------
+        result : (M, N, N, ...) :numpy:`ndarray`
+            :math:`\sum_{\boldsymbol{d}} values_{i,j}(\boldsymbol{d}) phases(\boldsymbol{d})`
+        """
+
+        return bond_sum(phases, values, self._groups, self.N)
 
     def J(self, k):
         r"""
@@ -153,21 +601,19 @@ class MagnonDispersion:
 
         Parameters
         ----------
-        k : (3,) |array_like|_
-            Reciprocal vector.
+        k : (3,) or (M, 3) |array_like|_
+            Reciprocal vector or a stack of M reciprocal vectors.
             In absolute coordinates.
+
+        Returns
+        -------
+        J : (N, N, 3, 3) or (M, N, N, 3, 3) :numpy:`ndarray`
         """
-        # Initialize matrix
-        result = np.zeros((self.N, self.N, 3, 3), dtype=complex)
-        k = np.array(k)
-        # Compute J(k)
-        for index in range(len(self.J_matrices)):
-            i = self.indices_i[index]
-            j = self.indices_j[index]
 
-            result[i][j] += self.J_matrices[index] * np.exp(
-                -1j * (k @ self.dis_vectors[index])
-            )
+        k = np.array(k, dtype=float)
+        result = self._bond_sum(self._phases(k.reshape((-1, 3))), self.J_matrices)
+        if k.ndim == 1:
+            return result[0]
         return result
 
     def A(self, k):
@@ -182,23 +628,19 @@ class MagnonDispersion:
 
         Parameters
         ----------
-        k : (3,) |array_like|_
-            Reciprocal vector.
+        k : (3,) or (M, 3) |array_like|_
+            Reciprocal vector or a stack of M reciprocal vectors.
             In absolute coordinates.
+
+        Returns
+        -------
+        A : (N, N) or (M, N, N) :numpy:`ndarray`
         """
-        # Initialize matrix
-        result = np.zeros((self.N, self.N), dtype=complex)
-        k = np.array(k)
-
-        # Compute A(k)
-        J = self.J(-k)
-        for i in range(len(J)):
-            for j in range(len(J[i])):
-                result[i][j] += (
-                    sqrt(np.linalg.norm(self.S[i]) * np.linalg.norm(self.S[j]))
-                    / 2
-                    * (self.u[i] @ J[i][j] @ np.conjugate(self.u[j]))
-                )
+
+        k = np.array(k, dtype=float)
+        result = self._bond_sum(self._phases(-k.reshape((-1, 3))), self._A_bonds)
+        if k.ndim == 1:
+            return result[0]
         return result
 
     def B(self, k):
@@ -213,23 +655,19 @@ class MagnonDispersion:
 
         Parameters
         ----------
-        k : (3,) |array_like|_
-            Reciprocal vector.
+        k : (3,) or (M, 3) |array_like|_
+            Reciprocal vector or a stack of M reciprocal vectors.
             In absolute coordinates.
+
+        Returns
+        -------
+        B : (N, N) or (M, N, N) :numpy:`ndarray`
         """
-        # Initialize matrix
-        result = np.zeros((self.N, self.N), dtype=complex)
-        k = np.array(k)
-
-        # Compute B(k)
-        J = self.J(-k)
-        for i in range(len(J)):
-            for j in range(len(J[i])):
-                result[i][j] += (
-                    sqrt(np.linalg.norm(self.S[i]) * np.linalg.norm(self.S[j]))
-                    / 2
-                    * (self.u[i] @ J[i][j] @ self.u[j])
-                )
+
+        k = np.array(k, dtype=float)
+        result = self._bond_sum(self._phases(-k.reshape((-1, 3))), self._B_bonds)
+        if k.ndim == 1:
+            return result[0]
         return result
 
     def C(self):
@@ -241,32 +679,205 @@ class MagnonDispersion:
             C^{i,j} = \delta_{i,j}\sum_{l}S_l \boldsymbol{v}^T_i\boldsymbol{J}_{i, l}(\boldsymbol{0})\boldsymbol{v}_l
 
         where indices :math:`i` and :math:`j` correspond to the atoms in the exchange pair.
-        """
 
-        if self._C is None:
-            self._C = np.zeros((self.N, self.N), dtype=complex)
+        Returns
+        -------
+        C : (N, N) :numpy:`ndarray`
+        """
 
-            # Compute C matrix, note: sum over l is hidden here
-            J = self.J(np.zeros(3))
-            for i in range(len(J)):
-                for j in range(len(J[i])):
-                    self._C[i][i] += (
-                        np.linalg.norm(self.S[j]) * self.v[i] @ J[i][j] @ self.v[j]
-                    )
-        return self._C
+        return np.diag(self._C_diagonal)
 
     def h(self, k):
-        k = np.array(k)
-        # Compute h matrix
-        left = np.concatenate(
-            (2 * self.A(k) - 2 * self.C(), 2 * np.conjugate(self.B(k)).T), axis=0
+        r"""
+        Computes h(k) matrix.
+
+        .. math::
+
+            h(\boldsymbol{k}) = 2\begin{pmatrix}
+                A(\boldsymbol{k}) - C & B(\boldsymbol{k}) \\
+                B^{\dagger}(\boldsymbol{k}) & \overline{A(-\boldsymbol{k})} - C
+            \end{pmatrix}
+
+        All blocks are computed from one matrix of phase factors.
+
+        Parameters
+        ----------
+        k : (3,) or (M, 3) |array_like|_
+            Reciprocal vector or a stack of M reciprocal vectors.
+            In absolute coordinates.
+
+        Returns
+        -------
+        h : (2N, 2N) or (M, 2N, 2N) :numpy:`ndarray`
+        """
+
+        k = np.array(k, dtype=float)
+        # A(k), B(k) and conj(A(-k)) share the same phase factors exp(ikd)
+        phases = self._phases(-k.reshape((-1, 3)))
+        h = self._assemble_h(
+            self._bond_sum(phases, self._A_bonds),
+            self._bond_sum(phases, self._B_bonds),
+            self._bond_sum(phases, np.conjugate(self._A_bonds)),
+            self.C(),
         )
-        right = np.concatenate(
-            (2 * self.B(k), 2 * np.conjugate(self.A(-k)) - 2 * self.C()), axis=0
+        if k.ndim == 1:
+            return h[0]
+        return h
+
+    def sparse_h(self, k):
+        r"""
+        Computes h(k) matrix as a sparse matrix.
+
+        Same matrix as :py:meth:`.h`, but built directly from the bonds
+        without the dense :math:`N \times N` blocks. Memory scales with the amount
+        of bonds, therefore it is suitable for the large supercells.
+
+        Parameters
+        ----------
+        k : (3,) |array_like|_
+            Reciprocal vector. In absolute coordinates.
+
+        Returns
+        -------
+        h : (2N, 2N) :py:class:`scipy.sparse.csr_matrix`
+        """
+
+        N = self.N
+        i, j = self.indices_i, self.indices_j
+        phases = self._phases(-np.array(k, dtype=float).reshape((1, 3)))[0]
+        A = 2 * self._A_bonds * phases
+        B = 2 * self._B_bonds * phases
+        A_minus = 2 * np.conjugate(self._A_bonds) * phases
+        diagonal = np.arange(N)
+        rows = np.concatenate((i, i, N + j, N + i, diagonal, N + diagonal))
+        columns = np.concatenate((j, N + j, i, N + j, diagonal, N + diagonal))
+        values = np.concatenate(
+            (
+                A,
+                B,
+                np.conjugate(B),
+                A_minus,
+                -2 * self._C_diagonal,
+                -2 * self._C_diagonal,
+            )
         )
-        h = np.concatenate((left, right), axis=1)
+        # Duplicated entries are summed
+        return coo_matrix((values, (rows, columns)), shape=(2 * N, 2 * N)).tocsr()
+
+    def _gradient_h(self, phases):
+        r"""
+        Derivatives of h(k) with respect to the components of k.
+
+        The derivative of the phase factor :math:`e^{i\boldsymbol{k}\boldsymbol{d}}`
+        is :math:`i\boldsymbol{d}e^{i\boldsymbol{k}\boldsymbol{d}}`, therefore
+        the phase factors of h(k) are reused.
+
+        Parameters
+        ----------
+        phases : (M, n_bonds) :numpy:`ndarray`
+            Phase factors of h(k), as returned by ``_phases(-k)``.
+
+        Returns
+        -------
+        dh : (M, 3, 2N, 2N) :numpy:`ndarray`
+            :math:`\partial h(\boldsymbol{k}) / \partial k_{\alpha}`.
+        """
+
+        derivative = 1j * self.dis_vectors
+        blocks = [
+            np.moveaxis(self._bond_sum(phases, bonds[:, None] * derivative), -1, 1)
+            for bonds in [self._A_bonds, self._B_bonds, np.conjugate(self._A_bonds)]
+        ]
+        return self._assemble_h(*blocks, C=0)
+
+    def _assemble_h(self, A, B, A_minus, C):
+        r"""
+        Assemble the stack of h matrices from the blocks.
+
+        Parameters
+        ----------
+        A : (..., N, N) :numpy:`ndarray`
+        B : (..., N, N) :numpy:`ndarray`
+        A_minus : (..., N, N) :numpy:`ndarray`
+            :math:`\overline{A(-\boldsymbol{k})}`.
+        C : (N, N) :numpy:`ndarray` or 0
+
+        Returns
+        -------
+        h : (..., 2N, 2N) :numpy:`ndarray`
+        """
+
+        N = self.N
+        h = np.zeros(A.shape[:-2] + (2 * N, 2 * N), dtype=complex)
+        h[..., :N, :N] = 2 * A - 2 * C
+        h[..., :N, N:] = 2 * B
+        h[..., N:, :N] = 2 * np.conjugate(np.swapaxes(B, -1, -2))
+        h[..., N:, N:] = 2 * A_minus - 2 * C
         return h
 
+    def diagonalize(self, h, zeros_to_none=False, return_G=False):
+        r"""
+        Diagonalize a stack of h matrices via Colpa.
+
+        Matrices, for which Colpa fails, are tried again as positive semidefinite,
+        negative defined and negative semidefinite ones. Only the failed
+        matrices are passed to each next step.
+
+        Parameters
+        ----------
+        h : (M, 2N, 2N) |array_like|_
+            Stack of h matrices, for example from :py:meth:`.h`.
+        zeros_to_none : bool, default=False
+            If True, then return ``nan`` instead of 0 if Colpa fails.
+        return_G : bool, default False
+            Whether to return the transformation matrices.
+
+        Returns
+        -------
+        omegas : (M, 2N) :numpy:`ndarray`
+            All 2N eigenvalues of each matrix, see :py:func:`.solve_via_colpa`
+            for the order.
+        G : (M, 2N, 2N) :numpy:`ndarray`
+            Transformation matrices, see :py:func:`.solve_via_colpa`.
+            Returned only if ``return_G`` is ``True``.
+        failed : (M,) :numpy:`ndarray` of bool
+            ``True`` for the matrices, where all attempts failed.
+
+        See Also
+        --------
+        omegas : Only the energies of the magnons for the k points.
+        """
+
+        h = np.asarray(h, dtype=complex).reshape((-1, 2 * self.N, 2 * self.N))
+
+        M = len(h)
+        shift = np.diag(1e-8 * np.ones(2 * self.N))
+        omegas = np.zeros((M, 2 * self.N), dtype=float)
+        G = np.zeros((M, 2 * self.N, 2 * self.N), dtype=complex)
+        failed = np.ones(M, dtype=bool)
+        # Positive defined, positive semidefinite,
+        # negative defined and negative semidefinite matrix
+        for sign, correction in [(1, 0), (1, shift), (-1, 0), (-1, -shift)]:
+            if not failed.any():
+                break
+            result = solve_via_colpa_batched(
+                sign * h[failed] + correction, return_G=return_G
+            )
+            solved = np.flatnonzero(failed)[~result[-1]]
+            omegas[solved] = sign * result[0][~result[-1]]
+            if return_G:
+                G[solved] = sign * result[1][~result[-1]]
+            failed[solved] = False
+
+        # If all fails, return None or 0
+        if zeros_to_none:
+            omegas[failed] = np.nan
+            G[failed] = np.nan
+        omegas[np.abs(omegas) <= 1e-8] = 0
+        if return_G:
+            return omegas, G, failed
+        return omegas, failed
+
     def omega(self, k, zeros_to_none=False, return_G=False, return_imaginary=False):
         r"""
         Computes magnon energies.
@@ -286,6 +897,7 @@ class MagnonDispersion:
             Whether to return imaginary part of the energies.
             If ``True``, then real and imaginary part can be accessed via
             ``omegas.real`` and ``omegas.imag``.
+            Since the Hermitian eigensolver is used, the imaginary part is zero.
             .. versionadded:: 0.8.10
 
         Returns
@@ -299,68 +911,902 @@ class MagnonDispersion:
             See :py:func:`.solve_via_colpa` for details.
         """
         # Diagonalize h matrix via Colpa
-        k = np.array(k)
-        h = self.h(k)
-        try:
-            omegas, G = solve_via_colpa(h)
-        except ColpaFailed:
-            # Try to solve for positive semidefinite matrix
-            try:
-                omegas, G = solve_via_colpa(h + np.diag(1e-8 * np.ones(2 * self.N)))
-            except ColpaFailed:
-                # Try to solve for negative defined matrix
-                try:
-                    omegas, G = solve_via_colpa(-h)
-                    omegas *= -1
-                    G *= -1
-                except ColpaFailed:
-                    # Try to solve for negative semidefinite matrix
-                    try:
-                        omegas, G = solve_via_colpa(
-                            -h - np.diag(1e-8 * np.ones(h.shape[0]))
-                        )
-                        omegas *= -1
-                        G *= -1
-                    except ColpaFailed:
-                        # If all fails, return None or 0
-                        if zeros_to_none:
-                            omegas = np.array([None] * 2 * self.N, dtype=float)
-                            if return_G:
-                                G = np.empty((2 * self.N, 2 * self.N), dtype=float)
-
-                        else:
-                            omegas = np.zeros(self.N, dtype=float)
-                            if return_G:
-                                G = np.zeros((2 * self.N, 2 * self.N), dtype=float)
-        omegas[np.abs(omegas) <= 1e-8] = 0
-        if not return_imaginary:
-            omegas = omegas.real
+        omegas, G, failed = self.diagonalize(
+            self.h(np.array(k, dtype=float).reshape((1, 3))),
+            zeros_to_none=zeros_to_none,
+            return_G=True,
+        )
+        omegas, G = omegas[0], G[0]
+        if return_imaginary:
+            omegas = omegas.astype(complex)
         if return_G:
             return omegas, G
         else:
             return omegas[: self.N]
 
-    def omegas(self, kpoints, zeros_to_none=False):
+    def omegas(
+        self, kpoints, zeros_to_none=False, chunk_size=1000, workers=None, dtype=float
+    ):
         r"""
         Dispersion spectra.
 
+        The h(k) matrices are computed and diagonalized for the stacks of k points at once.
+
         Parameters
         ----------
-        kpoints : (M, 3) |array_like|_
+        kpoints : (M, 3) |array_like|_ or :py:class:`.Kpoints`
             K points in absolute coordinates.
         zeros_to_none : bool, default=False
             If True, then return ``None`` instead of 0 if Colpa fails.
+        chunk_size : int, default 1000
+            Amount of k points, which are processed at once.
+            Limits the memory used for the phase factors and h(k) matrices.
+        workers : int, optional
+            Number of processes. If ``None`` or 1, then k points are processed
+            in the current process. Otherwise the chunks of k points are distributed
+            between ``workers`` processes of a :py:class:`concurrent.futures.ProcessPoolExecutor`.
+            Each process receives a copy of the precomputed arrays of the
+            dispersion only once, the spin Hamiltonian is not sent.
+            Not used for the k points of :py:meth:`.precompute`.
+        dtype : data-type, default float
+            Data type of the returned energies (i.e. ``numpy.float32`` halves the memory).
+            Diagonalization is always done in double precision, each chunk is converted
+            right after it.
+
+        Returns
+        -------
+        omegas : (N, M) :numpy:`ndarray`
+            Magnon energies for each k point.
+
+        Notes
+        -----
+        With ``workers`` the call has to be protected by ``if __name__ == "__main__":``
+        in the scripts, which are run on the platforms with the "spawn" start method
+        (Windows, macOS). It is advised to limit the number of threads of the linear
+        algebra library (i.e. ``OMP_NUM_THREADS=1``) when many processes are used.
+        """
+
+        if isinstance(kpoints, Kpoints):
+            kpoints = kpoints.points()
+        kpoints = np.array(kpoints, dtype=float).reshape((-1, 3))
+        chunks = [
+            kpoints[start : start + chunk_size]
+            for start in range(0, len(kpoints), chunk_size)
+        ]
+
+        if self._grid is not None and np.array_equal(kpoints, self._grid):
+            weights = self._component_weights()
+            data = [
+                self.diagonalize(
+                    np.einsum(
+                        "c,mcij->mij",
+                        weights,
+                        self._grid_h[start : start + chunk_size],
+                    ),
+                    zeros_to_none=zeros_to_none,
+                )[0][:, : self.N].astype(dtype)
+                for start in range(0, len(kpoints), chunk_size)
+            ]
+        elif workers is None or workers == 1:
+            data = [
+                self._omegas_chunk(chunk, zeros_to_none).astype(dtype)
+                for chunk in chunks
+            ]
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_initialize_worker,
+                initargs=(self._lightweight_state(),),
+            ) as executor:
+                # map returns the results in the order of the chunks
+                data = [
+                    chunk_omegas.astype(dtype)
+                    for chunk_omegas in executor.map(
+                        _omegas_in_worker, chunks, [zeros_to_none] * len(chunks)
+                    )
+                ]
+
+        if len(data) == 0:
+            return np.zeros((self.N, 0), dtype=dtype)
+        return np.concatenate(data, axis=0).T
+
+    def grid_omegas(
+        self,
+        grid,
+        gamma_centered=False,
+        filename=None,
+        dtype=np.float32,
+        return_G=False,
+        zeros_to_none=False,
+        chunk_size=1000,
+    ):
+        r"""
+        Magnon energies on the :py:func:`.monkhorst_pack` grid with the constant memory.
+
+        K points are generated chunk by chunk, each chunk is diagonalized in double
+        precision and stored with the data type ``dtype``. If ``filename`` is given,
+        then the results are streamed into the ``.npy`` file via
+        :py:func:`numpy.lib.format.open_memmap`, therefore the memory does not
+        depend on the size of the grid.
+
+        Parameters
+        ----------
+        grid : (3,) tuple of int
+            Amount of k points along each reciprocal lattice vector.
+        gamma_centered : bool, default False
+            Whether the grid includes :math:`\Gamma` point. See :py:func:`.monkhorst_pack`.
+        filename : str, optional
+            Name of the ``.npy`` file for the energies. If ``return_G`` is ``True``,
+            then the transformation matrices are written to the file with the
+            suffix "_G" added to the name (i.e. "omegas_G.npy").
+            Existing files are overwritten.
+        dtype : data-type, default numpy.float32
+            Data type of the stored energies. Transformation matrices are stored
+            with the complex type of the same precision.
+        return_G : bool, default False
+            Whether to return the transformation matrices. Only energies are
+            computed and stored by default.
+        zeros_to_none : bool, default=False
+            If True, then return ``nan`` instead of 0 if Colpa fails.
+        chunk_size : int, default 1000
+            Amount of k points, which are processed at once.
+
+        Returns
+        -------
+        omegas : (n_1, n_2, n_3, N) :numpy:`ndarray` or :py:class:`numpy.memmap`
+            Magnon energies. Memory-mapped array, if ``filename`` is given.
+        G : (n_1, n_2, n_3, 2N, 2N) :numpy:`ndarray` or :py:class:`numpy.memmap`
+            Transformation matrices. Returned only if ``return_G`` is ``True``.
+        """
+
+        if self.reciprocal_cell is None:
+            raise ValueError(
+                "Reciprocal cell is not defined for the dispersion, "
+                + "pass it to the MagnonDispersion.from_arrays()."
+            )
+        grid = tuple(int(q) for q in grid)
+        N = self.N
+        complex_dtype = np.result_type(dtype, np.complex64)
+
+        def allocate(name, shape, dtype):
+            if filename is None:
+                return np.zeros(shape, dtype=dtype)
+            return np.lib.format.open_memmap(name, mode="w+", dtype=dtype, shape=shape)
+
+        omegas = allocate(filename, grid + (N,), dtype)
+        flat_omegas = omegas.reshape((-1, N))
+        if return_G:
+            if filename is not None:
+                root, extension = os.path.splitext(filename)
+                G_filename = f"{root}_G{extension or '.npy'}"
+            else:
+                G_filename = None
+            G = allocate(G_filename, grid + (2 * N, 2 * N), complex_dtype)
+            flat_G = G.reshape((-1, 2 * N, 2 * N))
+
+        # Points are generated for each chunk, the whole grid is never formed
+        axes = [monkhorst_pack((q, 1, 1), gamma_centered)[:, 0] for q in grid]
+        total = int(np.prod(grid))
+        for start in range(0, total, chunk_size):
+            indices = np.unravel_index(
+                np.arange(start, min(start + chunk_size, total)), grid
+            )
+            relative = np.stack([axes[i][indices[i]] for i in range(3)], axis=-1)
+            chunk = slice(start, start + chunk_size)
+            if return_G:
+                chunk_omegas, chunk_G, failed = self.diagonalize(
+                    self.h(relative @ self.reciprocal_cell),
+                    zeros_to_none=zeros_to_none,
+                    return_G=True,
+                )
+                flat_G[chunk] = chunk_G
+            else:
+                chunk_omegas, failed = self.diagonalize(
+                    self.h(relative @ self.reciprocal_cell),
+                    zeros_to_none=zeros_to_none,
+                )
+            flat_omegas[chunk] = chunk_omegas[:, :N]
+
+        if filename is not None:
+            omegas.flush()
+            if return_G:
+                G.flush()
+        if return_G:
+            return omegas, G
+        return omegas
+
+    def adaptive_omegas(
+        self,
+        kpoints,
+        tolerance=1e-3,
+        gap_tolerance=1e-2,
+        max_depth=6,
+        zeros_to_none=False,
+        chunk_size=1000,
+        relative=False,
+    ):
+        r"""
+        Dispersion spectra along the path with the adaptive sampling.
+
+        Intervals of the path, where the dispersion is curved or
+        the bands are close to each other, are recursively bisected.
+        See :py:meth:`.Kpoints.adaptive_points` for details.
+
+        Parameters
+        ----------
+        kpoints : :py:class:`.Kpoints`
+            K points path. :py:attr:`.Kpoints.n` defines the initial sampling.
+        tolerance : float, default 1e-3
+            Allowed deviation from the linear interpolation.
+            Relative to the energy range of the dispersion.
+        gap_tolerance : float, default 1e-2
+            Gap between the neighbouring bands, below which the intervals are bisected.
+            Relative to the energy range of the dispersion.
+        max_depth : int, default 6
+            Maximum amount of bisections of the initial intervals.
+        zeros_to_none : bool, default=False
+            If True, then return ``nan`` instead of 0 if Colpa fails.
+        chunk_size : int, default 1000
+            Amount of k points, which are processed at once.
+        relative : bool, optional
+            Whether to return relative coordinates instead of the absolute ones.
+
+        Returns
+        -------
+        points : (M, 3) :numpy:`ndarray`
+            Coordinates of all k points.
+        flatten_points : (M,) :numpy:`ndarray`
+            Flatten coordinates of all k points, ready to be plotted.
+        omegas : (N, M) :numpy:`ndarray`
+            Magnon energies for each k point.
+        """
+
+        return kpoints.adaptive_points(
+            lambda points: self.omegas(
+                points, zeros_to_none=zeros_to_none, chunk_size=chunk_size
+            ),
+            tolerance=tolerance,
+            gap_tolerance=gap_tolerance,
+            max_depth=max_depth,
+            relative=relative,
+        )
+
+    def connected_omegas(
+        self, kpoints, zeros_to_none=False, chunk_size=1000, return_G=False
+    ):
+        r"""
+        Dispersion spectra with the bands connected along the path.
+
+        Modes at each k point are ordered by the energy, therefore the branches
+        are swapped at the crossings. Here the modes of the neighbouring k points
+        are matched by the overlaps of the eigenvectors
+
+        .. math::
+
+            O_{n,m} = \vert\boldsymbol{T}_n^{\dagger}(\boldsymbol{k}_i)\boldsymbol{g}
+            \boldsymbol{T}_m(\boldsymbol{k}_{i+1})\vert^2
+
+        with the Hungarian algorithm (:py:func:`scipy.optimize.linear_sum_assignment`),
+        where :math:`\boldsymbol{T} = \boldsymbol{G}^{-1}`. Both halves of the modes
+        (see :py:func:`.solve_via_colpa`) are matched separately.
+        Overlaps are computed for the whole path at once.
+
+        Parameters
+        ----------
+        kpoints : (M, 3) |array_like|_ or :py:class:`.Kpoints`
+            K points in absolute coordinates, ordered along the path.
+        zeros_to_none : bool, default=False
+            If True, then return ``nan`` instead of 0 if Colpa fails.
+        chunk_size : int, default 1000
+            Amount of k points, which are diagonalized at once.
+        return_G : bool, default False
+            Whether to return the transformation matrices.
+
+        Returns
+        -------
+        omegas : (N, M) :numpy:`ndarray`
+            Magnon energies for each k point, row :math:`n` is the connected band :math:`n`.
+        permutations : (M, 2N) :numpy:`ndarray` of int
+            Indices of the modes of :py:meth:`.omega` for each band at each k point, i.e.
+            ``omega(k_i, return_G=True)[0][permutations[i]]`` are the connected
+            energies of all 2N modes.
+            Apply them to any mode-resolved quantity, which is ordered by energy.
+        G : (M, 2N, 2N) :numpy:`ndarray`
+            Transformation matrices with the rows in the connected order.
+            Returned only if ``return_G`` is ``True``.
         """
 
-        data = []
+        if isinstance(kpoints, Kpoints):
+            kpoints = kpoints.points()
+        kpoints = np.array(kpoints, dtype=float).reshape((-1, 3))
+
+        N = self.N
+        g = np.concatenate((np.ones(N), -np.ones(N)))
+        M = len(kpoints)
+        omegas = np.zeros((M, 2 * N), dtype=float)
+        overlaps = np.zeros((max(M - 1, 0), 2, N, N), dtype=float)
+        if return_G:
+            G = np.zeros((M, 2 * N, 2 * N), dtype=complex)
+        previous = None
+        for start in range(0, M, chunk_size):
+            chunk = slice(start, start + chunk_size)
+            chunk_omegas, chunk_G, failed = self.diagonalize(
+                self.h(kpoints[chunk]), zeros_to_none=zeros_to_none, return_G=True
+            )
+            omegas[chunk] = chunk_omegas
+            if return_G:
+                G[chunk] = chunk_G
+            T = paraunitary_inverse(chunk_G)
+            if previous is not None:
+                T = np.concatenate((previous[None], T))
+            # Overlaps of the neighbouring k points, failed points do not overlap
+            product = np.nan_to_num(
+                np.abs(np.einsum("mia,i,mib->mab", np.conjugate(T[:-1]), g, T[1:])) ** 2
+            )
+            steps = slice(max(start - 1, 0), max(start - 1, 0) + len(product))
+            overlaps[steps, 0] = product[:, :N, :N]
+            overlaps[steps, 1] = product[:, N:, N:]
+            previous = T[-1]
+
+        permutations = np.zeros((M, 2 * N), dtype=int)
+        if M > 0:
+            permutations[0] = np.arange(2 * N)
+        for i in range(M - 1):
+            for half in range(2):
+                # Mode n at k_i goes to the mode assignment[n] at k_{i+1}
+                _, assignment = linear_sum_assignment(overlaps[i, half], maximize=True)
+                bands = permutations[i, half * N : (half + 1) * N] - half * N
+                permutations[i + 1, half * N : (half + 1) * N] = (
+                    assignment[bands] + half * N
+                )
+
+        omegas = np.take_along_axis(omegas, permutations, axis=1)
+        if return_G:
+            G = np.take_along_axis(G, permutations[:, :, None], axis=1)
+            return omegas[:, :N].T, permutations, G
+        return omegas[:, :N].T, permutations
+
+    def lowest_omegas(self, kpoints, n_modes=6, sigma=-1e-6, zeros_to_none=False):
+        r"""
+        Lowest magnon energies of the large magnetic cells.
+
+        h(k) is built as a sparse matrix (see :py:meth:`.sparse_h`) and only
+        ``n_modes`` lowest modes are computed by the shift-invert iterations
+        (see :py:func:`.solve_via_colpa_sparse`). Memory and time scale with the
+        amount of bonds, which makes the supercells with
+        :math:`N \sim 10^4` spins feasible.
+
+        Parameters
+        ----------
+        kpoints : (M, 3) or (3,) |array_like|_ or :py:class:`.Kpoints`
+            K points in absolute coordinates.
+        n_modes : int, default 6
+            Amount of computed modes at each k point. Has to be smaller than
+            :math:`2N - 1`.
+        sigma : float, default -1e-6
+            Shift of the spectrum, the modes above it are computed.
+            Negative value keeps the shifted matrix regular, if Goldstone modes
+            are present. For the gapped spectra the iterations converge much faster,
+            if ``sigma`` is set just below the expected gap.
+        zeros_to_none : bool, default=False
+            If True, then return ``nan`` instead of 0 if diagonalization fails.
+
+        Returns
+        -------
+        omegas : (M, n_modes) :numpy:`ndarray`
+            Magnon energies in ascending order for each k point.
+        """
 
         if isinstance(kpoints, Kpoints):
             kpoints = kpoints.points()
+        kpoints = np.array(kpoints, dtype=float).reshape((-1, 3))
+
+        omegas = np.zeros((len(kpoints), n_modes), dtype=float)
+        for index, k in enumerate(kpoints):
+            try:
+                omegas[index] = solve_via_colpa_sparse(
+                    self.sparse_h(k), n_modes=n_modes, sigma=sigma
+                )
+            except ColpaFailed:
+                omegas[index] = np.nan if zeros_to_none else 0
+        omegas[np.abs(omegas) <= 1e-8] = 0
+        return omegas
+
+    def _omegas_chunk(self, kpoints, zeros_to_none=False):
+        r"""
+        Magnon energies for one chunk of k points.
+
+        Parameters
+        ----------
+        kpoints : (M, 3) :numpy:`ndarray`
+            K points in absolute coordinates.
+        zeros_to_none : bool, default=False
+            If True, then return ``nan`` instead of 0 if Colpa fails.
+
+        Returns
+        -------
+        omegas : (M, N) :numpy:`ndarray`
+        """
+
+        omegas, failed = self.diagonalize(self.h(kpoints), zeros_to_none=zeros_to_none)
+        return omegas[:, : self.N]
+
+    def velocities(self, kpoints, zeros_to_none=False, chunk_size=1000):
+        r"""
+        Magnon energies and group velocities.
 
-        for point in kpoints:
-            data.append(self.omega(point, zeros_to_none=zeros_to_none))
+        Velocities are computed analytically via the Hellmann-Feynman theorem
+        for the paraunitary transformation :math:`T = G^{-1}`:
 
-        return np.array(data).T
+        .. math::
+
+            \dfrac{\partial\omega_n(\boldsymbol{k})}{\partial\boldsymbol{k}} =
+            \left(T^{\dagger}(\boldsymbol{k})
+            \dfrac{\partial h(\boldsymbol{k})}{\partial\boldsymbol{k}}
+            T(\boldsymbol{k})\right)_{nn}
+
+        where :math:`\partial h / \partial\boldsymbol{k}` is computed from the
+        same phase factors as :math:`h(\boldsymbol{k})`.
+
+        Parameters
+        ----------
+        kpoints : (M, 3) |array_like|_ or :py:class:`.Kpoints`
+            K points in absolute coordinates.
+        zeros_to_none : bool, default=False
+            If True, then return ``nan`` instead of 0 if Colpa fails.
+        chunk_size : int, default 1000
+            Amount of k points, which are processed at once.
+
+        Returns
+        -------
+        omegas : (N, M) :numpy:`ndarray`
+            Magnon energies for each k point.
+        velocities : (N, M, 3) :numpy:`ndarray`
+            Gradients of the magnon energies for each k point.
+            In the units of energy times the units of length.
+
+        Notes
+        -----
+        For the degenerate modes velocities correspond to the eigenvectors,
+        which are returned by the eigensolver.
+        """
+
+        if isinstance(kpoints, Kpoints):
+            kpoints = kpoints.points()
+        kpoints = np.array(kpoints, dtype=float).reshape((-1, 3))
+
+        N = self.N
+        omegas = np.zeros((len(kpoints), N), dtype=float)
+        velocities = np.zeros((len(kpoints), N, 3), dtype=float)
+        for start in range(0, len(kpoints), chunk_size):
+            chunk = slice(start, start + chunk_size)
+            phases = self._phases(-kpoints[chunk])
+            h = self._assemble_h(
+                self._bond_sum(phases, self._A_bonds),
+                self._bond_sum(phases, self._B_bonds),
+                self._bond_sum(phases, np.conjugate(self._A_bonds)),
+                self.C(),
+            )
+            chunk_omegas, G, failed = self.diagonalize(
+                h, zeros_to_none=zeros_to_none, return_G=True
+            )
+            T = paraunitary_inverse(G)
+            T = T[:, :, :N]
+            omegas[chunk] = chunk_omegas[:, :N]
+            velocities[chunk] = np.einsum(
+                "min,mxij,mjn->mnx", np.conjugate(T), self._gradient_h(phases), T
+            ).real
+
+        return omegas.T, np.transpose(velocities, (1, 0, 2))
+
+    def parameter_gradients(self, kpoints, zeros_to_none=False, chunk_size=1000):
+        r"""
+        Magnon energies and their derivatives with respect to the scales of the families.
+
+        Derivatives are computed analytically via the Hellmann-Feynman theorem
+        (see :py:meth:`.velocities`):
+
+        .. math::
+
+            \dfrac{\partial\omega_n(\boldsymbol{k})}{\partial s_p} =
+            \left(T^{\dagger}(\boldsymbol{k})H_p(\boldsymbol{k})T(\boldsymbol{k})\right)_{nn}
+
+        where :math:`H_p` is the Fourier component of the family :math:`p`
+        (see :py:meth:`.update_parameters`). On the k points of :py:meth:`.precompute`
+        the cached components are used.
+
+        Parameters
+        ----------
+        kpoints : (M, 3) |array_like|_ or :py:class:`.Kpoints`
+            K points in absolute coordinates.
+        zeros_to_none : bool, default=False
+            If True, then return ``nan`` instead of 0 if Colpa fails.
+        chunk_size : int, default 1000
+            Amount of k points, which are processed at once.
+
+        Returns
+        -------
+        omegas : (N, M) :numpy:`ndarray`
+            Magnon energies for each k point.
+        gradients : (N, M, P, 2) :numpy:`ndarray`
+            Derivatives of the magnon energies with respect to the scales of the
+            symmetric and antisymmetric parts of P families (see :py:attr:`.families`).
+        """
+
+        if isinstance(kpoints, Kpoints):
+            kpoints = kpoints.points()
+        kpoints = np.array(kpoints, dtype=float).reshape((-1, 3))
+        cached = self._grid is not None and np.array_equal(kpoints, self._grid)
+
+        N = self.N
+        weights = self._component_weights()
+        omegas = np.zeros((len(kpoints), N), dtype=float)
+        gradients = np.zeros((len(kpoints), N, len(weights) - 1), dtype=float)
+        for start in range(0, len(kpoints), chunk_size):
+            chunk = slice(start, start + chunk_size)
+            if cached:
+                components = self._grid_h[chunk]
+            else:
+                components = self._components(kpoints[chunk])
+            chunk_omegas, G, failed = self.diagonalize(
+                np.einsum("c,mcij->mij", weights, components),
+                zeros_to_none=zeros_to_none,
+                return_G=True,
+            )
+            T = paraunitary_inverse(G)
+            T = T[:, :, :N]
+            omegas[chunk] = chunk_omegas[:, :N]
+            gradients[chunk] = np.einsum(
+                "min,mcij,mjn->mnc", np.conjugate(T), components[:, 1:], T
+            ).real
+
+        return omegas.T, np.transpose(gradients, (1, 0, 2)).reshape(
+            (N, len(kpoints), -1, 2)
+        )
+
+    def one_magnon(self, qpoints, polarization=True):
+        r"""
+        Energies and intensities of the one-magnon excitations.
+
+        Poles and weights of the dynamical structure factor
+        (see :py:meth:`.structure_factor`) before the broadening.
+
+        Parameters
+        ----------
+        qpoints : (M, 3) |array_like|_ or :py:class:`.Kpoints`
+            Momentum transfer. In absolute coordinates.
+        polarization : bool, default True
+            Whether to apply the polarization factor of the neutron scattering.
+
+        Returns
+        -------
+        energies : (M, K) :numpy:`ndarray`
+            Energies of the excitations. K is N for the collinear and 3N for the
+            spiral ground state. ``nan`` if the diagonalization failed.
+        intensities : (M, K) :numpy:`ndarray`
+            Intensities of the excitations, per unit cell.
+
+        See Also
+        --------
+        structure_factor
+        """
+
+        if isinstance(qpoints, Kpoints):
+            qpoints = qpoints.points()
+        qpoints = np.array(qpoints, dtype=float).reshape((-1, 3))
+
+        N = self.N
+        spins = np.linalg.norm(self.S, axis=1)
+
+        # Rotating frame: S(q) = R_2 S'(q) + R_1 S'(q + Q) + R_1^* S'(q - Q)
+        if np.allclose(self.Q, 0):
+            terms = [(np.zeros(3), np.eye(3))]
+        else:
+            cross = np.array(
+                [
+                    [0, -self.n[2], self.n[1]],
+                    [self.n[2], 0, -self.n[0]],
+                    [-self.n[1], self.n[0], 0],
+                ]
+            )
+            R_2 = np.outer(self.n, self.n)
+            R_1 = (np.eye(3) - R_2 - 1j * cross) / 2
+            terms = [(np.zeros(3), R_2), (self.Q, R_1), (-self.Q, np.conjugate(R_1))]
+
+        # Site phases are defined by the momentum transfer
+        phases = np.sqrt(spins / 2) * np.exp(1j * (qpoints @ self.positions.T))
+        # Creation part of S'(k) is in the lower half of X(-k) = (b_{-k}, b^{\dagger}_k)
+        weights_b = phases[:, :, None] * np.conjugate(self.u)[None, :, :]
+        weights_bdag = phases[:, :, None] * self.u[None, :, :]
+
+        energies = []
+        intensities = []
+        for shift, rotation in terms:
+            omegas, G, failed = self.diagonalize(
+                self.h(-(qpoints + shift)), return_G=True
+            )
+            # Creation columns of T = G^{-1}
+            T = paraunitary_inverse(G)
+            T = T[:, :, N:]
+            amplitudes = np.einsum("mia,min->mna", weights_b, T[:, :N]) + np.einsum(
+                "mia,min->mna", weights_bdag, T[:, N:]
+            )
+            amplitudes = amplitudes @ rotation.T
+            intensity = np.sum(np.abs(amplitudes) ** 2, axis=2)
+            if polarization:
+                norms = np.linalg.norm(qpoints, axis=1)
+                directions = np.divide(
+                    qpoints,
+                    norms[:, None],
+                    out=np.zeros_like(qpoints),
+                    where=norms[:, None] > 1e-8,
+                )
+                intensity -= (
+                    np.abs(np.einsum("mna,ma->mn", amplitudes, directions)) ** 2
+                )
+            energies.append(omegas[:, N:])
+            intensities.append(intensity)
+
+        return np.concatenate(energies, axis=1), np.concatenate(intensities, axis=1)
+
+    def structure_factor(
+        self,
+        qpoints,
+        energies,
+        broadening=0.1,
+        kernel="lorentzian",
+        polarization=True,
+        chunk_size=100,
+    ):
+        r"""
+        Dynamical structure factor of the one-magnon excitations.
+
+        .. math::
+
+            S(\boldsymbol{q}, \omega) = \sum_n\sum_{\alpha\beta}
+            \left(\delta_{\alpha\beta} - \hat{q}_{\alpha}\hat{q}_{\beta}\right)
+            \langle 0\vert S^{\alpha}_{-\boldsymbol{q}}\vert n\rangle
+            \langle n\vert S^{\beta}_{\boldsymbol{q}}\vert 0\rangle
+            f(\omega - \omega_n)
+
+        where :math:`S_{\boldsymbol{q}} = \sum_{\boldsymbol{R}, i}
+        e^{i\boldsymbol{q}(\boldsymbol{R} + \boldsymbol{r}_i)}\boldsymbol{S}_{\boldsymbol{R}, i}`
+        and :math:`f` is the broadening kernel (see :py:func:`.broaden`).
+        Matrix elements are computed from the transformation matrices of the
+        Colpa diagonalization and the local frames of the spins (:py:attr:`.u`).
+        For the spin spiral the excitations at :math:`\boldsymbol{q}\pm\boldsymbol{Q}`
+        contribute as well. The commensurate spirals with :math:`2\boldsymbol{Q}`
+        equal to a reciprocal lattice vector have to be described in the magnetic
+        supercell. Magnetic form factor is not included.
+
+        Parameters
+        ----------
+        qpoints : (M, 3) |array_like|_ or :py:class:`.Kpoints`
+            Momentum transfer. In absolute coordinates.
+        energies : (E,) |array_like|_
+            Energy transfer.
+        broadening : float, default 0.1
+            Width of the kernel (see :py:func:`.broaden`).
+        kernel : str, default "lorentzian"
+            Either "lorentzian" or "gaussian".
+        polarization : bool, default True
+            Whether to apply the polarization factor of the neutron scattering.
+            If ``False``, then the trace of the correlation tensor is returned.
+        chunk_size : int, default 100
+            Amount of q points, which are processed at once.
+
+        Returns
+        -------
+        structure_factor : (M, E) :numpy:`ndarray`
+            Intensity per unit cell.
+            For the failed diagonalizations intensities are zero.
+        """
+
+        if isinstance(qpoints, Kpoints):
+            qpoints = qpoints.points()
+        qpoints = np.array(qpoints, dtype=float).reshape((-1, 3))
+        energies = np.array(energies, dtype=float)
+
+        result = np.zeros((len(qpoints), len(energies)), dtype=float)
+        for start in range(0, len(qpoints), chunk_size):
+            chunk = slice(start, start + chunk_size)
+            centers, weights = self.one_magnon(
+                qpoints[chunk], polarization=polarization
+            )
+            result[chunk] = broaden(
+                centers, weights, energies, broadening, kernel=kernel
+            )
+        return result
+
+    def dos(
+        self,
+        grid,
+        energies=1000,
+        method="tetrahedron",
+        sigma=None,
+        chunk_size=1000,
+        lattice=None,
+    ):
+        r"""
+        Magnon density of states.
+
+        Energies are computed on the :py:func:`.monkhorst_pack` grid of k points,
+        one plane of the grid at a time. Only two planes are kept in memory,
+        so the memory does not depend on the first dimension of the grid.
+
+        The density of states is normalized per unit cell:
+
+        .. math::
+
+            \int g(\omega)d\omega = N
+
+        Parameters
+        ----------
+        grid : (3,) tuple of int
+            Amount of k points along each reciprocal lattice vector.
+        energies : int or (E,) |array_like|_, default 1000
+            Energies, at which the density of states is computed. Sorted.
+            If ``int``, then the given amount of points is spread over the energy range
+            of the dispersion, estimated on the twice coarser grid.
+        method : str, default "tetrahedron"
+            Integration method. Either "tetrahedron" (linear tetrahedron method)
+            or "gaussian" (Gaussian smearing).
+        sigma : float, optional
+            Width of the Gaussian for the "gaussian" method.
+            By default it is equal to the two steps of ``energies``.
+        chunk_size : int, default 1000
+            Amount of k points, which are diagonalized at once.
+        lattice : :py:class:`.Lattice`, optional
+            Lattice, which symmetry is used to reduce the grid
+            (see :py:meth:`.Lattice.irreducible_kpoints`). Only irreducible
+            k points are diagonalized. The dispersion has to have the full
+            symmetry of the lattice.
+
+        Returns
+        -------
+        energies : (E,) :numpy:`ndarray`
+            Energies.
+        dos : (E,) :numpy:`ndarray`
+            Density of states.
+
+        See Also
+        --------
+        gaussian_dos
+        tetrahedron_dos
+        """
+
+        if self.reciprocal_cell is None:
+            raise ValueError(
+                "Reciprocal cell is not defined for the dispersion, "
+                + "pass it to the MagnonDispersion.from_arrays()."
+            )
+        method = method.lower()
+        if method not in ["tetrahedron", "gaussian"]:
+            raise ValueError(
+                f'Method has to be "tetrahedron" or "gaussian", got "{method}".'
+            )
+        grid = tuple(int(n) for n in grid)
+
+        if isinstance(energies, (int, np.integer)):
+            coarse = monkhorst_pack([max(1, n // 2) for n in grid])
+            omegas = self.omegas(coarse @ self.reciprocal_cell, chunk_size=chunk_size)
+            e_min, e_max = min(0, np.nanmin(omegas)), np.nanmax(omegas)
+            margin = 0.1 * (e_max - e_min)
+            energies = np.linspace(e_min - margin, e_max + margin, energies)
+        energies = np.array(energies, dtype=float)
+
+        if sigma is None and method == "gaussian":
+            sigma = 2 * (energies[-1] - energies[0]) / max(1, len(energies) - 1)
+
+        if lattice is not None:
+            kpoints, weights, mapping = lattice.irreducible_kpoints(
+                grid, relative=True, return_mapping=True
+            )
+            irreducible = self.omegas(
+                kpoints @ self.reciprocal_cell, chunk_size=chunk_size
+            ).T
+            mapping = mapping.reshape((grid[0], -1))
+
+            def plane(i):
+                return irreducible[mapping[i]].reshape((grid[1], grid[2], self.N))
+
+        else:
+            kpoints = monkhorst_pack(grid).reshape((grid[0], -1, 3))
+
+            def plane(i):
+                return self.omegas(
+                    kpoints[i] @ self.reciprocal_cell, chunk_size=chunk_size
+                ).T.reshape((grid[1], grid[2], self.N))
+
+        dos = np.zeros(len(energies), dtype=float)
+        if method == "gaussian" and lattice is not None:
+            dos = gaussian_dos(irreducible, energies, sigma, weights=weights)
+        elif method == "gaussian":
+            for i in range(grid[0]):
+                dos += gaussian_dos(plane(i).reshape((-1, self.N)), energies, sigma)
+            dos /= grid[0] * grid[1] * grid[2]
+        else:
+            # Last slab is closed by the first plane (periodic grid)
+            first = lower = plane(0)
+            for i in range(grid[0]):
+                upper = first if i + 1 == grid[0] else plane(i + 1)
+                dos += tetrahedron_dos(slab_tetrahedra(lower, upper), energies)
+                lower = upper
+            dos /= 6 * grid[0] * grid[1] * grid[2]
+
+        return energies, dos
+
+    def _lightweight_state(self, precomputed=False):
+        r"""
+        State of the dispersion.
+
+        Contains only the arrays, which are needed for the computation
+        of h(k), the spin Hamiltonian is not stored. It is cheap to pickle.
+
+        Parameters
+        ----------
+        precomputed : bool, default False
+            Whether to keep the components of :py:meth:`.precompute`.
+
+        Returns
+        -------
+        state : dict
+        """
+
+        state = dict(self.__dict__)
+        # Cached components are not needed by the workers of omegas
+        if not precomputed:
+            state["_grid"] = None
+            state["_grid_h"] = None
+        return state
 
     def __call__(self, *args, **kwargs):
         return self.omegas(*args, **kwargs)
+
+
+def _families_from_template(model, template, indices_i, indices_j, dis_vectors):
+    r"""
+    Family of each bond of :py:meth:`.SpinHamiltonian.input_for_magnons`.
+
+    Bonds are matched in both directions, since the change of notation
+    may add or flip the bonds.
+
+    Returns
+    -------
+    families : (M,) list of str
+        ``None`` for the bonds, which are not in the template.
+    """
+
+    atom_index = dict([(atom, i) for i, atom in enumerate(model.magnetic_atoms)])
+    lookup = {}
+    for name in template.names:
+        for atom1, atom2, R in template.names[name]:
+            atom1, atom2 = model.get_atom(atom1), model.get_atom(atom2)
+            if atom1 not in atom_index or atom2 not in atom_index:
+                continue
+            i, j = atom_index[atom1], atom_index[atom2]
+            R = tuple(int(x) for x in R)
+            lookup[(i, j, R)] = name
+            lookup.setdefault((j, i, tuple(-x for x in R)), name)
+
+    R_vectors = np.rint(
+        np.array(dis_vectors, dtype=float).reshape((-1, 3)) @ np.linalg.inv(model.cell)
+    ).astype(int)
+    return [
+        lookup.get((int(i), int(j), tuple(int(x) for x in R)))
+        for i, j, R in zip(indices_i, indices_j, R_vectors)
+    ]
+
+
+# Dispersion of the worker process, see MagnonDispersion.omegas
+_worker_dispersion = None
+
+
+def _initialize_worker(state):
+    global _worker_dispersion
+    _worker_dispersion = MagnonDispersion.__new__(MagnonDispersion)
+    _worker_dispersion.__dict__.update(state)
+
+
+def _omegas_in_worker(kpoints, zeros_to_none):
+    return _worker_dispersion._omegas_chunk(kpoints, zeros_to_none=zeros_to_none)
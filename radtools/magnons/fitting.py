@@ -0,0 +1,176 @@
+# RAD-tools - program for spin Hamiltonian and magnons.
+# Copyright (C) 2022-2023  Andrey Rybakov
+#
+# e-mail: anry@uv.es, web: adrybakov.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+r"""
+Fitting of the exchange parameters to the magnon energies.
+"""
+
+import numpy as np
+from scipy.optimize import least_squares
+
+from radtools.magnons.dispersion import MagnonDispersion
+from radtools.spinham.hamiltonian import SpinHamiltonian
+from radtools.spinham.template import ExchangeTemplate
+
+__all__ = ["fit_exchange"]
+
+
+def fit_exchange(
+    model: SpinHamiltonian,
+    template: ExchangeTemplate,
+    kpoints,
+    energies,
+    bands=None,
+    sigma=None,
+    Q=None,
+    n=None,
+    dmi=True,
+    relative=False,
+    **kwargs,
+):
+    r"""
+    Fit the exchange parameters of the template families to the magnon energies.
+
+    Parameters are averaged over each family of the template first
+    (see :py:meth:`.SpinHamiltonian.form_model`). Then the scales of the symmetric
+    part and of the DMI of each family are fitted by the least squares:
+
+    .. math::
+
+        \min_{s}\sum_i \dfrac{(\omega_{n_i}(\boldsymbol{k}_i, s) - \omega_i)^2}{\sigma_i^2}
+
+    Fourier components of the families are computed once
+    (see :py:meth:`.MagnonDispersion.precompute`), each iteration only diagonalizes
+    h(k). Jacobian is computed analytically from the eigenvectors
+    (see :py:meth:`.MagnonDispersion.parameter_gradients`).
+
+    Parameters
+    ----------
+    model : :py:class:`.SpinHamiltonian`
+        Spin Hamiltonian with the initial parameters. It is not modified.
+    template : :py:class:`.ExchangeTemplate`
+        Template, which defines the families of the bonds.
+    kpoints : (M, 3) |array_like|_
+        K points of the measured energies. In absolute coordinates.
+    energies : (M,) |array_like|_
+        Measured magnon energies.
+    bands : (M,) |array_like|_, optional
+        Index of the magnon branch for each energy (branches are sorted as in
+        :py:meth:`.MagnonDispersion.omegas`). By default each energy is compared
+        with the closest branch at each iteration.
+    sigma : (M,) |array_like|_, optional
+        Uncertainties of the measured energies. By default all are equal to 1.
+    Q : (3,) |array_like|_, optional
+        Ordering wave vector of the spin-spiral.
+        In relative coordinates with respect to the model`s reciprocal cell.
+    n : (3,) |array_like|_, optional
+        Global rotational axis. See :py:class:`.MagnonDispersion`.
+    dmi : bool, default True
+        Whether to fit the DMI of the families separately. Only the families
+        with non-zero DMI are fitted. If ``False``, then the DMI is scaled
+        together with the symmetric part.
+    relative : bool, default False
+        Whether ``kpoints`` are given in relative coordinates.
+    **kwargs
+        Passed to the :py:func:`scipy.optimize.least_squares`.
+
+    Returns
+    -------
+    fitted_model : :py:class:`.SpinHamiltonian`
+        New spin Hamiltonian with the fitted parameters of the families.
+        Only the bonds of the template are present.
+    result : :py:class:`scipy.optimize.OptimizeResult`
+        Result of the :py:func:`scipy.optimize.least_squares`. Additional attribute
+        ``parameters`` holds the fitted scales with respect to the
+        family-averaged parameters (see :py:attr:`.MagnonDispersion.parameters`).
+    """
+
+    formed_model = model.formed_model(template)
+
+    kpoints = np.array(kpoints, dtype=float).reshape((-1, 3))
+    if relative:
+        kpoints = kpoints @ formed_model.reciprocal_cell
+    energies = np.array(energies, dtype=float).flatten()
+    if sigma is None:
+        sigma = np.ones(len(energies), dtype=float)
+    sigma = np.array(sigma, dtype=float).flatten()
+
+    # Energies at the same k point share one diagonalization
+    unique, points = np.unique(kpoints, axis=0, return_inverse=True)
+    points = points.flatten()
+
+    dispersion = MagnonDispersion(formed_model, Q=Q, n=n, template=template)
+    dispersion.precompute(unique)
+
+    # Fitted scales: symmetric parts of all families and antisymmetric parts
+    # of the families with DMI, if requested
+    active = np.zeros((len(dispersion.families), 2), dtype=bool)
+    active[:, 0] = True
+    for index, family in enumerate(dispersion.families):
+        active[index, 1] = dmi and dispersion.has_dmi(family)
+
+    def set_scales(x):
+        scales = np.ones((len(dispersion.families), 2), dtype=float)
+        scales[active] = x
+        if not dmi:
+            scales[:, 1] = scales[:, 0]
+        dispersion.update_parameters(
+            {
+                family: tuple(scales[index])
+                for index, family in enumerate(dispersion.families)
+            }
+        )
+
+    cache = {}
+
+    def evaluate(x):
+        if "x" not in cache or not np.array_equal(cache["x"], x):
+            set_scales(x)
+            omegas, gradients = dispersion.parameter_gradients(unique)
+            if not dmi:
+                gradients[..., 0] += gradients[..., 1]
+            omegas = omegas[:, points]
+            gradients = gradients[:, points][..., active]
+            if bands is None:
+                selected = np.argmin(np.abs(omegas - energies[None, :]), axis=0)
+            else:
+                selected = np.array(bands, dtype=int).flatten()
+            data = np.arange(len(energies))
+            cache["x"] = np.array(x)
+            cache["residuals"] = (omegas[selected, data] - energies) / sigma
+            cache["jacobian"] = gradients[selected, data] / sigma[:, None]
+        return cache
+
+    result = least_squares(
+        lambda x: evaluate(x)["residuals"],
+        np.ones(int(active.sum()), dtype=float),
+        jac=lambda x: evaluate(x)["jacobian"],
+        **kwargs,
+    )
+    set_scales(result.x)
+    result.parameters = dispersion.parameters
+
+    # Scale the parameters of the family-averaged model
+    for name, (symmetric, antisymmetric) in result.parameters.items():
+        for atom1, atom2, R in template.names[name]:
+            J = formed_model[
+                formed_model.get_atom(atom1), formed_model.get_atom(atom2), R
+            ]
+            J.matrix = symmetric * J.symm_matrix + antisymmetric * J.asymm_matrix
+
+    return formed_model, result
@@ -0,0 +1,282 @@
+# RAD-tools - program for spin Hamiltonian and magnons.
+# Copyright (C) 2022-2023  Andrey Rybakov
+#
+# e-mail: anry@uv.es, web: adrybakov.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+r"""
+Brillouin zone integration kernels.
+
+All kernels accumulate the contributions only for the pairs
+(state, energy), where the contribution is not zero. Therefore, the memory and
+time depend on the amount of states and not on the amount of energy points
+times the amount of states.
+"""
+
+import numpy as np
+
+__all__ = ["gaussian_dos", "tetrahedron_dos", "slab_tetrahedra", "broaden"]
+
+# Six tetrahedra of the cube, which share its main diagonal (0-7).
+# Corners of the cube are numbered as 4 * dx + 2 * dy + dz.
+CUBE_TETRAHEDRA = np.array(
+    [
+        [0, 1, 3, 7],
+        [0, 1, 5, 7],
+        [0, 2, 3, 7],
+        [0, 2, 6, 7],
+        [0, 4, 5, 7],
+        [0, 4, 6, 7],
+    ]
+)
+
+
+def _expand(lower, upper):
+    r"""
+    Expand the ranges [lower, upper) into the flat list of pairs.
+
+    Parameters
+    ----------
+    lower : (M,) :numpy:`ndarray`
+    upper : (M,) :numpy:`ndarray`
+
+    Returns
+    -------
+    owners : (K,) :numpy:`ndarray`
+        Index of the range for each pair.
+    values : (K,) :numpy:`ndarray`
+        Value within the range for each pair.
+    """
+
+    counts = np.maximum(upper - lower, 0)
+    owners = np.repeat(np.arange(len(lower)), counts)
+    offsets = np.cumsum(counts) - counts
+    values = lower[owners] + np.arange(owners.size) - offsets[owners]
+    return owners, values
+
+
+def gaussian_dos(omegas, energies, sigma, weights=None, cutoff=5):
+    r"""
+    Density of states with the Gaussian smearing.
+
+    .. math::
+
+        g(\varepsilon) = \sum_{n, \boldsymbol{k}} w_{\boldsymbol{k}}
+        \dfrac{1}{\sqrt{2\pi}\sigma}
+        e^{-\dfrac{(\varepsilon - \omega_n(\boldsymbol{k}))^2}{2\sigma^2}}
+
+    Parameters
+    ----------
+    omegas : (M, N) |array_like|_
+        Energies of N bands at M k points.
+    energies : (E,) |array_like|_
+        Energies, at which the density of states is computed. Sorted.
+    sigma : float
+        Width of the Gaussian.
+    weights : (M,) |array_like|_, optional
+        Weights of the k points. By default each k point has the weight 1.
+    cutoff : float, default 5
+        Gaussians are truncated at the distance ``cutoff * sigma``.
+
+    Returns
+    -------
+    dos : (E,) :numpy:`ndarray`
+        Density of states, not normalized.
+    """
+
+    omegas = np.array(omegas, dtype=float)
+    energies = np.array(energies, dtype=float)
+    if weights is None:
+        weights = np.ones(omegas.shape[0], dtype=float)
+    weights = np.repeat(np.array(weights, dtype=float), omegas.shape[1])
+    omegas = omegas.flatten()
+
+    valid = np.isfinite(omegas)
+    omegas, weights = omegas[valid], weights[valid]
+
+    states, points = _expand(
+        np.searchsorted(energies, omegas - cutoff * sigma, side="left"),
+        np.searchsorted(energies, omegas + cutoff * sigma, side="right"),
+    )
+    contributions = (
+        weights[states]
+        * np.exp(-((energies[points] - omegas[states]) ** 2) / 2 / sigma**2)
+        / np.sqrt(2 * np.pi)
+        / sigma
+    )
+    return np.bincount(points, weights=contributions, minlength=len(energies))
+
+
+def tetrahedron_dos(corners, energies):
+    r"""
+    Density of states with the linear tetrahedron method.
+
+    Each tetrahedron contributes [1]_:
+
+    .. math::
+
+        g_T(\varepsilon) = \begin{cases}
+            \dfrac{3(\varepsilon - \varepsilon_1)^2}{\varepsilon_{21}\varepsilon_{31}\varepsilon_{41}},
+            & \varepsilon_1 < \varepsilon < \varepsilon_2 \\
+            \dfrac{1}{\varepsilon_{31}\varepsilon_{41}}\left(3\varepsilon_{21} + 6(\varepsilon - \varepsilon_2)
+            - 3\dfrac{(\varepsilon_{31} + \varepsilon_{42})(\varepsilon - \varepsilon_2)^2}{\varepsilon_{32}\varepsilon_{42}}\right),
+            & \varepsilon_2 < \varepsilon < \varepsilon_3 \\
+            \dfrac{3(\varepsilon_4 - \varepsilon)^2}{\varepsilon_{41}\varepsilon_{42}\varepsilon_{43}},
+            & \varepsilon_3 < \varepsilon < \varepsilon_4
+        \end{cases}
+
+    where :math:`\varepsilon_{ij} = \varepsilon_i - \varepsilon_j` and the corner energies are sorted.
+
+    Parameters
+    ----------
+    corners : (T, 4) |array_like|_
+        Energies at the four corners of T tetrahedra.
+    energies : (E,) |array_like|_
+        Energies, at which the density of states is computed. Sorted.
+
+    Returns
+    -------
+    dos : (E,) :numpy:`ndarray`
+        Sum of the contributions of all tetrahedra.
+        Each tetrahedron contributes with the weight 1.
+
+    References
+    ----------
+    .. [1] Blöchl, P.E., Jepsen, O. and Andersen, O.K., 1994.
+        Improved tetrahedron method for Brillouin-zone integrations.
+        Physical Review B, 49(23), p.16223.
+    """
+
+    corners = np.sort(np.array(corners, dtype=float), axis=1)
+    corners = corners[np.isfinite(corners).all(axis=1)]
+    energies = np.array(energies, dtype=float)
+
+    tetrahedra, points = _expand(
+        np.searchsorted(energies, corners[:, 0], side="right"),
+        np.searchsorted(energies, corners[:, 3], side="left"),
+    )
+    e1, e2, e3, e4 = corners[tetrahedra].T
+    e = energies[points]
+
+    contributions = np.zeros(e.shape, dtype=float)
+
+    first = e < e2
+    second = (e2 <= e) & (e < e3)
+    third = e3 <= e
+
+    contributions[first] = (
+        3
+        * (e[first] - e1[first]) ** 2
+        / (e2[first] - e1[first])
+        / (e3[first] - e1[first])
+        / (e4[first] - e1[first])
+    )
+    e1, e2, e3, e4, x = (
+        e1[second],
+        e2[second],
+        e3[second],
+        e4[second],
+        e[second] - e2[second],
+    )
+    contributions[second] = (
+        3 * (e2 - e1) + 6 * x - 3 * (e3 - e1 + e4 - e2) * x**2 / (e3 - e2) / (e4 - e2)
+    ) / ((e3 - e1) * (e4 - e1))
+    e1, e2, e3, e4 = corners[tetrahedra[third]].T
+    contributions[third] = 3 * (e4 - e[third]) ** 2 / (e4 - e1) / (e4 - e2) / (e4 - e3)
+
+    return np.bincount(points, weights=contributions, minlength=len(energies))
+
+
+def slab_tetrahedra(lower, upper):
+    r"""
+    Tetrahedra between two neighbouring planes of a periodic k grid.
+
+    Parameters
+    ----------
+    lower : (n2, n3, N) |array_like|_
+        Energies of N bands on the plane :math:`i_1` of the grid.
+    upper : (n2, n3, N) |array_like|_
+        Energies of N bands on the plane :math:`i_1 + 1` of the grid.
+
+    Returns
+    -------
+    corners : (6 * n2 * n3 * N, 4) :numpy:`ndarray`
+        Corner energies of all tetrahedra of the slab.
+        Each band is split into the tetrahedra independently.
+    """
+
+    lower = np.array(lower, dtype=float)
+    upper = np.array(upper, dtype=float)
+    cube = np.zeros(lower.shape[:2] + (8, lower.shape[2]), dtype=float)
+    for dx, plane in enumerate([lower, upper]):
+        for dy in range(2):
+            for dz in range(2):
+                cube[:, :, 4 * dx + 2 * dy + dz] = np.roll(
+                    plane, shift=(-dy, -dz), axis=(0, 1)
+                )
+    # (n2, n3, 6, 4, N) -> (n2 * n3 * 6 * N, 4)
+    corners = cube[:, :, CUBE_TETRAHEDRA]
+    return np.moveaxis(corners, 3, 4).reshape((-1, 4))
+
+
+def broaden(centers, weights, energies, width, kernel="lorentzian"):
+    r"""
+    Broadened spectra of the weighted lines.
+
+    .. math::
+
+        S_m(\varepsilon) = \sum_{n} w_{m,n} f(\varepsilon - \varepsilon_{m,n})
+
+    with the Lorentzian :math:`f(x) = \dfrac{\gamma}{\pi(x^2 + \gamma^2)}`
+    or the Gaussian :math:`f(x) = \dfrac{1}{\sqrt{2\pi}\sigma}e^{-x^2/2\sigma^2}`.
+
+    Parameters
+    ----------
+    centers : (M, K) |array_like|_
+        Energies of K lines for M spectra.
+    weights : (M, K) |array_like|_
+        Weights of the lines.
+    energies : (E,) |array_like|_
+        Energies, at which the spectra are computed.
+    width : float
+        Half width at half maximum :math:`\gamma` of the Lorentzian or
+        standard deviation :math:`\sigma` of the Gaussian.
+    kernel : str, default "lorentzian"
+        Either "lorentzian" or "gaussian".
+
+    Returns
+    -------
+    spectra : (M, E) :numpy:`ndarray`
+        Broadened spectra. Lines with the non-finite energies are skipped.
+    """
+
+    centers = np.array(centers, dtype=float)
+    weights = np.array(weights, dtype=float)
+    energies = np.array(energies, dtype=float)
+
+    valid = np.isfinite(centers) & np.isfinite(weights)
+    weights = np.where(valid, weights, 0)
+    centers = np.where(valid, centers, 0)
+
+    x = energies[None, None, :] - centers[:, :, None]
+    if kernel == "lorentzian":
+        profile = width / np.pi / (x**2 + width**2)
+    elif kernel == "gaussian":
+        profile = np.exp(-(x**2) / 2 / width**2) / np.sqrt(2 * np.pi) / width
+    else:
+        raise ValueError(
+            f'Kernel has to be "lorentzian" or "gaussian", got "{kernel}".'
+        )
+    return np.einsum("mk,mke->me", weights, profile)
@@ -0,0 +1,286 @@
+# RAD-tools - program for spin Hamiltonian and magnons.
+# Copyright (C) 2022-2023  Andrey Rybakov
+#
+# e-mail: anry@uv.es, web: adrybakov.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+r"""
+Powder-averaged magnon spectra.
+"""
+
+import warnings
+
+import numpy as np
+from scipy.spatial.transform import Rotation
+from scipy.stats import qmc
+
+__all__ = ["PowderAverage", "fibonacci_sphere"]
+
+
+def fibonacci_sphere(n):
+    r"""
+    Quasi-uniform points on the unit sphere (Fibonacci lattice).
+
+    .. math::
+
+        z_i = 1 - \dfrac{2i + 1}{n}, \quad \varphi_i = 2\pi i / \phi^2,
+        \quad i = 0, \dots, n - 1
+
+    where :math:`\phi` is the golden ratio.
+
+    Parameters
+    ----------
+    n : int
+        Amount of points.
+
+    Returns
+    -------
+    points : (n, 3) :numpy:`ndarray`
+        Unit vectors.
+    """
+
+    i = np.arange(n)
+    z = 1 - (2 * i + 1) / n
+    phi = 2 * np.pi * i * (2 - (1 + np.sqrt(5)) / 2)
+    rho = np.sqrt(1 - z**2)
+    return np.stack((rho * np.cos(phi), rho * np.sin(phi), z), axis=1)
+
+
+def _sphere_from_square(points):
+    r"""
+    Map the points of the unit square onto the unit sphere with uniform density.
+    """
+
+    z = 1 - 2 * points[:, 0]
+    phi = 2 * np.pi * points[:, 1]
+    rho = np.sqrt(1 - z**2)
+    return np.stack((rho * np.cos(phi), rho * np.sin(phi), z), axis=1)
+
+
+class PowderAverage:
+    r"""
+    Powder-averaged dynamical structure factor :math:`S(\vert\boldsymbol{Q}\vert, \omega)`.
+
+    For each shell :math:`\vert\boldsymbol{Q}\vert` the directions are sampled
+    quasi-randomly on the sphere. Intensities of the one-magnon excitations
+    (see :py:meth:`.MagnonDispersion.structure_factor`) are histogrammed into the
+    energy bins on the fly, so only the histogram is kept in memory.
+
+    Sampling is deterministic for the given ``seed``. Each call of :py:meth:`.accumulate`
+    adds new points to the histogram, therefore the run can be stopped, saved
+    (see :py:meth:`.save`) and resumed later.
+
+    Parameters
+    ----------
+    dispersion : :py:class:`.MagnonDispersion`
+        Magnon dispersion.
+    q_norms : (n_Q,) |array_like|_
+        Radii of the shells. In absolute units.
+    energy_bins : (n_E + 1,) |array_like|_
+        Edges of the energy bins. Sorted.
+    method : str, default "fibonacci"
+        Sampling of the sphere.
+
+        * "fibonacci": each call of :py:meth:`.accumulate` adds the Fibonacci
+          lattice, which is randomly rotated for each shell.
+        * "sobol": scrambled Sobol sequence, continued between the calls.
+    seed : int, default 0
+        Seed of the random rotations and of the scrambling.
+    polarization : bool, default True
+        Whether to apply the polarization factor of the neutron scattering.
+
+    Attributes
+    ----------
+    q_norms : (n_Q,) :numpy:`ndarray`
+        Radii of the shells.
+    energy_bins : (n_E + 1,) :numpy:`ndarray`
+        Edges of the energy bins.
+    intensities : (n_Q, n_E) :numpy:`ndarray`
+        Sum of the intensities in each bin over all sampled points.
+    counts : (n_Q,) :numpy:`ndarray`
+        Amount of sampled points in each shell.
+    rounds : int
+        Amount of calls of :py:meth:`.accumulate`.
+    """
+
+    def __init__(
+        self,
+        dispersion,
+        q_norms,
+        energy_bins,
+        method="fibonacci",
+        seed=0,
+        polarization=True,
+    ) -> None:
+        method = method.lower()
+        if method not in ["fibonacci", "sobol"]:
+            raise ValueError(
+                f'Method has to be "fibonacci" or "sobol", got "{method}".'
+            )
+        self.dispersion = dispersion
+        self.q_norms = np.array(q_norms, dtype=float).flatten()
+        self.energy_bins = np.array(energy_bins, dtype=float).flatten()
+        self.method = method
+        self.seed = int(seed)
+        self.polarization = polarization
+
+        self.intensities = np.zeros(
+            (len(self.q_norms), len(self.energy_bins) - 1), dtype=float
+        )
+        self.counts = np.zeros(len(self.q_norms), dtype=int)
+        self.rounds = 0
+
+    def _directions(self, n_points):
+        r"""
+        Directions of the next ``n_points`` points for each shell.
+
+        Returns
+        -------
+        directions : (n_Q, n_points, 3) :numpy:`ndarray`
+        """
+
+        directions = np.zeros((len(self.q_norms), n_points, 3), dtype=float)
+        if self.method == "fibonacci":
+            rotations = Rotation.random(
+                len(self.q_norms),
+                random_state=np.random.default_rng([self.seed, self.rounds]),
+            )
+            lattice = fibonacci_sphere(n_points)
+            for shell in range(len(self.q_norms)):
+                directions[shell] = rotations[shell].apply(lattice)
+        else:
+            for shell in range(len(self.q_norms)):
+                sampler = qmc.Sobol(
+                    d=2,
+                    scramble=True,
+                    seed=np.random.default_rng([self.seed, shell]),
+                )
+                if self.counts[shell] > 0:
+                    sampler.fast_forward(int(self.counts[shell]))
+                with warnings.catch_warnings():
+                    # Balance of the Sobol sequence is not required for the sampling
+                    warnings.simplefilter("ignore", UserWarning)
+                    directions[shell] = _sphere_from_square(sampler.random(n_points))
+        return directions
+
+    def accumulate(self, n_points, chunk_size=1000):
+        r"""
+        Sample ``n_points`` new directions for each shell and add them to the histogram.
+
+        Parameters
+        ----------
+        n_points : int
+            Amount of new points for each shell.
+        chunk_size : int, default 1000
+            Amount of q points, which are diagonalized at once.
+        """
+
+        n_E = len(self.energy_bins) - 1
+        qpoints = (self._directions(n_points) * self.q_norms[:, None, None]).reshape(
+            (-1, 3)
+        )
+        shells = np.repeat(np.arange(len(self.q_norms)), n_points)
+
+        for start in range(0, len(qpoints), chunk_size):
+            chunk = slice(start, start + chunk_size)
+            energies, intensities = self.dispersion.one_magnon(
+                qpoints[chunk], polarization=self.polarization
+            )
+            bins = np.searchsorted(self.energy_bins, energies, side="right") - 1
+            valid = (
+                np.isfinite(energies)
+                & np.isfinite(intensities)
+                & (bins >= 0)
+                & (bins < n_E)
+            )
+            index = (shells[chunk][:, None] * n_E + bins)[valid]
+            self.intensities += np.bincount(
+                index, weights=intensities[valid], minlength=self.intensities.size
+            ).reshape(self.intensities.shape)
+
+        self.counts += n_points
+        self.rounds += 1
+
+    @property
+    def spectrum(self):
+        r"""
+        Powder-averaged spectrum.
+
+        Average intensity over the sampled points of each shell,
+        divided by the width of the energy bins.
+
+        Returns
+        -------
+        spectrum : (n_Q, n_E) :numpy:`ndarray`
+            :math:`S(\vert\boldsymbol{Q}\vert, \omega)` per unit cell.
+            ``nan`` for the shells without sampled points.
+        """
+
+        widths = np.diff(self.energy_bins)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.intensities / self.counts[:, None] / widths[None, :]
+
+    def save(self, filename):
+        r"""
+        Save the state of the accumulation.
+
+        Parameters
+        ----------
+        filename : str
+            Name of the .npz file.
+        """
+
+        np.savez(
+            filename,
+            q_norms=self.q_norms,
+            energy_bins=self.energy_bins,
+            method=self.method,
+            seed=self.seed,
+            polarization=self.polarization,
+            intensities=self.intensities,
+            counts=self.counts,
+            rounds=self.rounds,
+        )
+
+    @classmethod
+    def load(cls, filename, dispersion):
+        r"""
+        Load the state of the accumulation, saved by :py:meth:`.save`.
+
+        Parameters
+        ----------
+        filename : str
+            Name of the .npz file.
+        dispersion : :py:class:`.MagnonDispersion`
+            Magnon dispersion, the same as the one of the saved accumulation.
+
+        Returns
+        -------
+        powder : :py:class:`.PowderAverage`
+        """
+
+        with np.load(filename) as data:
+            powder = cls(
+                dispersion,
+                data["q_norms"],
+                data["energy_bins"],
+                method=str(data["method"]),
+                seed=int(data["seed"]),
+                polarization=bool(data["polarization"]),
+            )
+            powder.intensities = data["intensities"]
+            powder.counts = data["counts"]
+            powder.rounds = int(data["rounds"])
+        return powder
@@ -0,0 +1,183 @@
+# RAD-tools - program for spin Hamiltonian and magnons.
+# Copyright (C) 2022-2023  Andrey Rybakov
+#
+# e-mail: anry@uv.es, web: adrybakov.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+r"""
+Magnon dispersions over the grids of exchange parameters.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from radtools.crystal.kpoints import Kpoints
+from radtools.magnons import dispersion as dispersion_module
+from radtools.magnons.dispersion import MagnonDispersion, _initialize_worker
+from radtools.spinham.hamiltonian import SpinHamiltonian
+from radtools.spinham.template import ExchangeTemplate
+
+__all__ = ["sweep_parameters"]
+
+PARTS = {"symmetric": 0, "dmi": 1}
+
+
+def sweep_parameters(
+    model: SpinHamiltonian,
+    template: ExchangeTemplate,
+    grid,
+    kpoints,
+    Q=None,
+    n=None,
+    relative=False,
+    workers=None,
+    chunk_size=1000,
+):
+    r"""
+    Magnon dispersions for each point of the grid of the family scales.
+
+    Fourier components of the families are computed once
+    (see :py:meth:`.MagnonDispersion.precompute`), for each point of the grid
+    h(k) is recombined and diagonalized (see :py:meth:`.MagnonDispersion.update_parameters`).
+
+    Parameters
+    ----------
+    model : :py:class:`.SpinHamiltonian`
+        Spin Hamiltonian. It is not modified.
+    template : :py:class:`.ExchangeTemplate`
+        Template, which defines the families of the bonds.
+    grid : dict
+        Scales of the families along each axis of the grid::
+
+            {key: (n_i,) array_like, ...}
+
+        where ``key`` is either the name of the family (whole exchange matrix is scaled)
+        or a tuple ``(family, "symmetric")`` or ``(family, "dmi")`` (only the symmetric
+        or the antisymmetric part is scaled). Scales are given with respect to the
+        parameters of the ``model``. Order of the keys defines the order of the axes.
+    kpoints : (M, 3) |array_like|_ or :py:class:`.Kpoints`
+        K points in absolute coordinates.
+    Q : (3,) |array_like|_, optional
+        Ordering wave vector of the spin-spiral.
+        In relative coordinates with respect to the model`s reciprocal cell.
+    n : (3,) |array_like|_, optional
+        Global rotational axis. See :py:class:`.MagnonDispersion`.
+    relative : bool, default False
+        Whether ``kpoints`` are given in relative coordinates.
+    workers : int, optional
+        Number of processes. If ``None`` or 1, then the grid is processed in the
+        current process. Otherwise the points of the grid are distributed between
+        ``workers`` processes of a :py:class:`concurrent.futures.ProcessPoolExecutor`.
+        Each process receives the cached Fourier components only once.
+    chunk_size : int, default 1000
+        Amount of k points, which are diagonalized at once.
+
+    Returns
+    -------
+    omegas : (n_1, ..., n_d, N, M) :numpy:`ndarray`
+        Magnon energies for each point of the grid and each k point.
+        ``nan`` if the diagonalization failed.
+    stable : (n_1, ..., n_d) :numpy:`ndarray` of bool
+        ``True`` if the Colpa diagonalization succeeded and no mode is softened
+        below zero at any k point.
+
+    Notes
+    -----
+    With ``workers`` the call has to be protected by ``if __name__ == "__main__":``
+    in the scripts, see :py:meth:`.MagnonDispersion.omegas`.
+    """
+
+    if isinstance(kpoints, Kpoints):
+        kpoints = kpoints.points(relative=relative)
+    kpoints = np.array(kpoints, dtype=float).reshape((-1, 3))
+    if relative:
+        kpoints = kpoints @ model.reciprocal_cell
+
+    dispersion = MagnonDispersion(model, Q=Q, n=n, template=template)
+    dispersion.precompute(kpoints)
+
+    keys = list(grid)
+    for key in keys:
+        family, part = (key, None) if isinstance(key, str) else key
+        if family not in dispersion.families or (
+            part is not None and part not in PARTS
+        ):
+            raise ValueError(
+                f"Key {key} is not valid, available families: {dispersion.families}, "
+                + f"parts: {list(PARTS)}."
+            )
+    axes = [np.array(grid[key], dtype=float).flatten() for key in keys]
+    shape = tuple(len(axis) for axis in axes)
+    values = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(
+        (-1, len(keys))
+    )
+    parameters = [_parameters(keys, point) for point in values]
+
+    if workers is None or workers == 1:
+        omegas = [
+            _sweep_point(dispersion, kpoints, point, chunk_size) for point in parameters
+        ]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_initialize_worker,
+            initargs=(dispersion._lightweight_state(precomputed=True),),
+        ) as executor:
+            omegas = list(
+                executor.map(
+                    _sweep_in_worker,
+                    parameters,
+                    [chunk_size] * len(parameters),
+                    chunksize=max(1, len(parameters) // (4 * workers)),
+                )
+            )
+
+    omegas = np.array(omegas, dtype=float).reshape(shape + (dispersion.N, len(kpoints)))
+    with np.errstate(invalid="ignore"):
+        stable = (np.isfinite(omegas) & (omegas >= 0)).all(axis=(-2, -1))
+    return omegas, stable
+
+
+def _parameters(keys, values):
+    r"""
+    Parameters of :py:meth:`.MagnonDispersion.update_parameters` for one point of the grid.
+    """
+
+    parameters = {}
+    for key, value in zip(keys, values):
+        if isinstance(key, str):
+            parameters[key] = (value, value)
+        else:
+            family, part = key
+            scales = list(parameters.get(family, (1.0, 1.0)))
+            scales[PARTS[part]] = value
+            parameters[family] = tuple(scales)
+    return parameters
+
+
+def _sweep_point(dispersion, kpoints, parameters, chunk_size):
+    r"""
+    Magnon energies for one point of the grid.
+    """
+
+    dispersion.update_parameters(parameters)
+    return dispersion.omegas(kpoints, zeros_to_none=True, chunk_size=chunk_size)
+
+
+def _sweep_in_worker(parameters, chunk_size):
+    # Dispersion of the worker process is set by _initialize_worker
+    dispersion = dispersion_module._worker_dispersion
+    return _sweep_point(dispersion, dispersion._grid, parameters, chunk_size)
@@ -0,0 +1,291 @@
+# RAD-tools - program for spin Hamiltonian and magnons.
+# Copyright (C) 2022-2023  Andrey Rybakov
+#
+# e-mail: anry@uv.es, web: adrybakov.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+r"""
+Thermodynamics of the non-interacting magnons.
+"""
+
+import numpy as np
+
+from radtools.constants import BOLTZMANN
+from radtools.crystal.kpoints import monkhorst_pack
+from radtools.magnons.diagonalization import paraunitary_inverse
+from radtools.numerical import bose_einstein
+
+__all__ = ["MagnonThermodynamics"]
+
+
+class MagnonThermodynamics:
+    r"""
+    Thermodynamic properties of the magnon gas.
+
+    Magnon energies and the weights of the modes on the magnetic atoms are computed
+    once on the :py:func:`.monkhorst_pack` grid. All properties are computed from them
+    as the vectorized Bose sums, therefore the scans over the temperature
+    do not require any diagonalization.
+
+    All extensive properties are given per unit cell.
+    Zero modes (:math:`\omega = 0`) do not contribute, use the grids, which do not
+    contain :math:`\Gamma` point (even amount of points along each direction)
+    for the Goldstone modes.
+
+    Parameters
+    ----------
+    dispersion : :py:class:`.MagnonDispersion`
+        Magnon dispersion. Reciprocal cell has to be defined.
+    grid : (3,) tuple of int
+        Amount of k points along each reciprocal lattice vector.
+    chunk_size : int, default 1000
+        Amount of k points, which are diagonalized at once.
+    boltzmann : float, default :py:data:`.BOLTZMANN`
+        Boltzmann constant in the units of energy of the dispersion per Kelvin.
+
+    Attributes
+    ----------
+    omegas : (M, N) :numpy:`ndarray`
+        Magnon energies at M k points of the grid.
+    spins : (N,) :numpy:`ndarray`
+        Spin values of the magnetic atoms.
+    """
+
+    def __init__(self, dispersion, grid, chunk_size=1000, boltzmann=BOLTZMANN):
+        if dispersion.reciprocal_cell is None:
+            raise ValueError(
+                "Reciprocal cell is not defined for the dispersion, "
+                + "pass it to the MagnonDispersion.from_arrays()."
+            )
+        self.boltzmann = boltzmann
+        self.spins = np.linalg.norm(dispersion.S, axis=1)
+
+        N = dispersion.N
+        kpoints = monkhorst_pack(grid) @ dispersion.reciprocal_cell
+        self.omegas = np.zeros((len(kpoints), N), dtype=float)
+        # Energies of all 2N modes and their weights |T_{i,n}|^2 on the atoms
+        self._all_omegas = np.zeros((len(kpoints), 2 * N), dtype=float)
+        self._weights = np.zeros((len(kpoints), N, 2 * N), dtype=float)
+        self._zero_point = np.zeros(N, dtype=float)
+        for start in range(0, len(kpoints), chunk_size):
+            chunk = slice(start, start + chunk_size)
+            omegas, G, failed = dispersion.diagonalize(
+                dispersion.h(kpoints[chunk]), zeros_to_none=True, return_G=True
+            )
+            if failed.any():
+                raise ValueError(
+                    "Diagonalization failed for some k points, "
+                    + "the ground state is not stable."
+                )
+            T = paraunitary_inverse(G)
+            self.omegas[chunk] = omegas[:, :N]
+            self._all_omegas[chunk] = omegas
+            self._weights[chunk] = np.abs(T[:, :N]) ** 2
+            self._zero_point += np.sum(np.abs(T[:, :N, N:]) ** 2, axis=(0, 2))
+        self._zero_point /= len(kpoints)
+
+    def _bose_sum(self, function, temperatures, omegas=None, weights=None):
+        r"""
+        Average over the grid of :math:`\sum_n w_n f(\omega_n / k_BT)`.
+
+        Zero modes do not contribute.
+
+        Parameters
+        ----------
+        function : callable
+            Function of the reduced energies :math:`x = \omega / k_BT`, vectorized.
+        temperatures : (T,) :numpy:`ndarray`
+            Temperatures in Kelvin, positive.
+        omegas : (M, K) :numpy:`ndarray`, optional
+            Energies of the modes. By default :py:attr:`.omegas`.
+        weights : (M, ..., K) :numpy:`ndarray`, optional
+            Weights of the modes. By default all weights are equal to 1.
+
+        Returns
+        -------
+        result : (T, ...) :numpy:`ndarray`
+        """
+
+        if omegas is None:
+            omegas = self.omegas
+        valid = omegas > 0
+        if weights is None:
+            weights = np.ones(omegas.shape, dtype=float)[valid]
+        else:
+            weights = np.moveaxis(weights, -1, 1)[valid]
+        omegas = omegas[valid]
+        result = np.zeros((len(temperatures),) + weights.shape[1:], dtype=float)
+        # Chunks of the states limit the memory of the (T, states) arrays
+        step = max(1, 10**6 // max(1, len(temperatures)))
+        for start in range(0, len(omegas), step):
+            x = (
+                omegas[None, start : start + step]
+                / self.boltzmann
+                / temperatures[:, None]
+            )
+            result += np.tensordot(function(x), weights[start : start + step], axes=1)
+        return result / len(self.omegas)
+
+    @staticmethod
+    def _temperatures(temperatures):
+        temperatures = np.array(temperatures, dtype=float)
+        if (temperatures <= 0).any():
+            raise ValueError("Temperatures have to be positive.")
+        return temperatures
+
+    def curie_temperature(self):
+        r"""
+        Curie temperature in the random phase approximation (Tyablikov).
+
+        .. math::
+
+            k_BT_C = \dfrac{S + 1}{3}\left(\dfrac{1}{N_{\boldsymbol{k}}N}
+            \sum_{\boldsymbol{k}, n}\dfrac{1}{\omega_n(\boldsymbol{k})}\right)^{-1}
+
+        where :math:`S` is the mean spin of the magnetic atoms. For one magnetic atom
+        it is the Tyablikov result, for several atoms the harmonic mean over all bands
+        is used. Meaningful only for the ferromagnetic ground state.
+
+        Returns
+        -------
+        T_C : float
+            Curie temperature in Kelvin.
+        """
+
+        mean = np.sum(1 / self.omegas[self.omegas > 0]) / self.omegas.size
+        return (np.mean(self.spins) + 1) / 3 / mean / self.boltzmann
+
+    def free_energy(self, temperatures):
+        r"""
+        Free energy of the magnon gas.
+
+        .. math::
+
+            F(T) = \dfrac{k_BT}{N_{\boldsymbol{k}}}\sum_{\boldsymbol{k}, n}
+            \ln\left(1 - e^{-\omega_n(\boldsymbol{k})/k_BT}\right)
+
+        Zero-point energy is not included.
+
+        Parameters
+        ----------
+        temperatures : (T,) |array_like|_
+            Temperatures in Kelvin.
+
+        Returns
+        -------
+        free_energy : (T,) :numpy:`ndarray`
+            In the units of energy of the dispersion per unit cell.
+        """
+
+        temperatures = self._temperatures(temperatures)
+        return (
+            self.boltzmann
+            * temperatures
+            * self._bose_sum(lambda x: np.log(-np.expm1(-x)), temperatures)
+        )
+
+    def internal_energy(self, temperatures):
+        r"""
+        Internal energy of the magnon gas.
+
+        .. math::
+
+            U(T) = \dfrac{1}{N_{\boldsymbol{k}}}\sum_{\boldsymbol{k}, n}
+            \omega_n(\boldsymbol{k})n_B(\omega_n(\boldsymbol{k}))
+
+        Zero-point energy is not included.
+
+        Parameters
+        ----------
+        temperatures : (T,) |array_like|_
+            Temperatures in Kelvin.
+
+        Returns
+        -------
+        internal_energy : (T,) :numpy:`ndarray`
+            In the units of energy of the dispersion per unit cell.
+        """
+
+        temperatures = self._temperatures(temperatures)
+        return (
+            self.boltzmann
+            * temperatures
+            * self._bose_sum(lambda x: x * bose_einstein(x), temperatures)
+        )
+
+    def heat_capacity(self, temperatures):
+        r"""
+        Heat capacity of the magnon gas.
+
+        .. math::
+
+            C(T) = \dfrac{k_B}{N_{\boldsymbol{k}}}\sum_{\boldsymbol{k}, n}
+            \dfrac{x^2e^x}{(e^x - 1)^2}, \quad x = \dfrac{\omega_n(\boldsymbol{k})}{k_BT}
+
+        Parameters
+        ----------
+        temperatures : (T,) |array_like|_
+            Temperatures in Kelvin.
+
+        Returns
+        -------
+        heat_capacity : (T,) :numpy:`ndarray`
+            In the units of :math:`k_B` per unit cell.
+        """
+
+        temperatures = self._temperatures(temperatures)
+
+        # x^2 e^x / (e^x - 1)^2 = x^2 n (n + 1)
+        def function(x):
+            n = bose_einstein(x)
+            return x**2 * n * (n + 1)
+
+        return self._bose_sum(function, temperatures)
+
+    def magnetization(self, temperatures):
+        r"""
+        Spin of each magnetic atom, reduced by the magnons.
+
+        .. math::
+
+            \langle S_i\rangle(T) = S_i - \dfrac{1}{N_{\boldsymbol{k}}}
+            \sum_{\boldsymbol{k}}\sum_{n=1}^{2N}\vert T_{i,n}(\boldsymbol{k})\vert^2
+            n_B(\omega_n(\boldsymbol{k}))
+            - \dfrac{1}{N_{\boldsymbol{k}}}\sum_{\boldsymbol{k}, n}\vert T_{i,N+n}\vert^2
+
+        where :math:`T = G^{-1}` is the paraunitary transformation of the Colpa
+        diagonalization and :math:`\omega_{N+n}(\boldsymbol{k})` are the energies of
+        the second half of the modes (see :py:func:`.solve_via_colpa`).
+        The last term is the zero-point reduction.
+
+        Parameters
+        ----------
+        temperatures : (T,) |array_like|_
+            Temperatures in Kelvin.
+
+        Returns
+        -------
+        magnetization : (T, N) :numpy:`ndarray`
+            Spin of each magnetic atom along its direction in the ground state.
+        """
+
+        temperatures = self._temperatures(temperatures)
+        reduction = self._bose_sum(
+            bose_einstein,
+            temperatures,
+            omegas=self._all_omegas,
+            weights=self._weights,
+        )
+        return self.spins[None, :] - self._zero_point[None, :] - reduction
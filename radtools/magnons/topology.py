@@ -0,0 +1,275 @@
+# RAD-tools - program for spin Hamiltonian and magnons.
+# Copyright (C) 2022-2023  Andrey Rybakov
+#
+# e-mail: anry@uv.es, web: adrybakov.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+r"""
+Berry curvature and topological invariants of the magnon bands.
+"""
+
+import numpy as np
+from scipy.special import spence
+
+from radtools.constants import BOLTZMANN
+from radtools.magnons.diagonalization import paraunitary_inverse
+from radtools.magnons.thermodynamics import MagnonThermodynamics
+from radtools.numerical import bose_einstein
+
+__all__ = ["MagnonTopology"]
+
+
+class MagnonTopology:
+    r"""
+    Berry curvature of the magnon bands on the discrete k mesh.
+
+    Berry flux through each plaquette of the mesh is computed with the
+    Fukui-Hatsugai-Suzuki method [1]_ from the link variables
+
+    .. math::
+
+        U_{\mu}(\boldsymbol{k}) = \dfrac{\langle n(\boldsymbol{k})\vert g\vert n(\boldsymbol{k} + \boldsymbol{\mu})\rangle}
+        {\vert\langle n(\boldsymbol{k})\vert g\vert n(\boldsymbol{k} + \boldsymbol{\mu})\rangle\vert}
+
+    where :math:`\vert n(\boldsymbol{k})\rangle` is the column of the paraunitary
+    transformation :math:`T = G^{-1}` of the Colpa diagonalization and
+    :math:`g = diag(1, \dots, 1, -1, \dots, -1)`:
+
+    .. math::
+
+        F_n(\boldsymbol{k}) = \arg\left(U_1(\boldsymbol{k})U_2(\boldsymbol{k} + \boldsymbol{1})
+        U_1^*(\boldsymbol{k} + \boldsymbol{2})U_2^*(\boldsymbol{k})\right)
+
+    The mesh is processed plane by plane along the first axis of ``plane``,
+    only the eigenvectors of two neighbouring planes are kept in memory.
+    Energies and fluxes are cached, all properties are computed from them.
+
+    Parameters
+    ----------
+    dispersion : :py:class:`.MagnonDispersion`
+        Magnon dispersion. Reciprocal cell has to be defined.
+    grid : (3,) tuple of int
+        Amount of k points along each reciprocal lattice vector.
+        For the two-dimensional models use 1 along the third direction.
+    plane : (2,) tuple of int, default (0, 1)
+        Indices of the reciprocal lattice vectors, which span the plaquettes.
+    chunk_size : int, default 1000
+        Amount of k points, which are diagonalized at once.
+
+    Attributes
+    ----------
+    omegas : (n_1, n_2, n_3, N) :numpy:`ndarray`
+        Magnon energies at the corners of the plaquettes. Axes are ordered as
+        ``plane`` followed by the remaining direction.
+    flux : (n_1, n_2, n_3, N) :numpy:`ndarray`
+        Berry flux of each band through each plaquette.
+    area : float
+        Area of one plaquette in the absolute units.
+
+    Notes
+    -----
+    Bands have to be separated from each other by a gap over the whole mesh.
+
+    References
+    ----------
+    .. [1] Fukui, T., Hatsugai, Y. and Suzuki, H., 2005.
+        Chern numbers in discretized Brillouin zone: efficient method of computing
+        (spin) Hall conductances. Journal of the Physical Society of Japan,
+        74(6), pp.1674-1677.
+    """
+
+    def __init__(self, dispersion, grid, plane=(0, 1), chunk_size=1000) -> None:
+        if dispersion.reciprocal_cell is None:
+            raise ValueError(
+                "Reciprocal cell is not defined for the dispersion, "
+                + "pass it to the MagnonDispersion.from_arrays()."
+            )
+        axes = list(plane) + [axis for axis in range(3) if axis not in plane]
+        if sorted(axes) != [0, 1, 2]:
+            raise ValueError(f"Plane has to contain two different axes, got {plane}.")
+        grid = [int(grid[axis]) for axis in axes]
+
+        self._dispersion = dispersion
+        self._chunk_size = chunk_size
+        self._axes = axes
+        self._grid = grid
+
+        b = dispersion.reciprocal_cell
+        self.area = np.linalg.norm(np.cross(b[axes[0]], b[axes[1]])) / grid[0] / grid[1]
+
+        N = dispersion.N
+        self.omegas = np.zeros(tuple(grid) + (N,), dtype=float)
+        self.flux = np.zeros(tuple(grid) + (N,), dtype=float)
+        self.omegas[0], first = self._plane(0)
+        lower = first
+        for i in range(grid[0]):
+            # Last plane of plaquettes is closed by the first plane (periodic mesh)
+            if i + 1 < grid[0]:
+                self.omegas[i + 1], upper = self._plane(i + 1)
+            else:
+                upper = first
+            self.flux[i] = self._plaquettes(lower, upper)
+            lower = upper
+
+    def _plane(self, i):
+        r"""
+        Energies and eigenvectors of the upper half on one plane of the mesh.
+
+        Returns
+        -------
+        omegas : (n_2, n_3, N) :numpy:`ndarray`
+        vectors : (n_2, n_3, 2N, N) :numpy:`ndarray`
+            Columns of :math:`T = G^{-1}`.
+        """
+
+        dispersion = self._dispersion
+        N = dispersion.N
+        n1, n2, n3 = self._grid
+        j, l = np.meshgrid(np.arange(n2) / n2, np.arange(n3) / n3, indexing="ij")
+        relative = np.zeros((n2 * n3, 3), dtype=float)
+        relative[:, self._axes[0]] = i / n1
+        relative[:, self._axes[1]] = j.flatten()
+        relative[:, self._axes[2]] = l.flatten()
+        kpoints = relative @ dispersion.reciprocal_cell
+
+        omegas = np.zeros((len(kpoints), N), dtype=float)
+        vectors = np.zeros((len(kpoints), 2 * N, N), dtype=complex)
+        for start in range(0, len(kpoints), self._chunk_size):
+            chunk = slice(start, start + self._chunk_size)
+            chunk_omegas, G, failed = dispersion.diagonalize(
+                dispersion.h(kpoints[chunk]), return_G=True
+            )
+            if failed.any():
+                raise ValueError(
+                    "Diagonalization failed for some k points, "
+                    + "the ground state is not stable."
+                )
+            T = paraunitary_inverse(G)
+            omegas[chunk] = chunk_omegas[:, :N]
+            vectors[chunk] = T[:, :, :N]
+        return omegas.reshape((n2, n3, N)), vectors.reshape((n2, n3, 2 * N, N))
+
+    def _links(self, left, right):
+        r"""
+        Normalized link variables :math:`\langle n\vert g\vert n'\rangle` of each band.
+        """
+
+        N = self._dispersion.N
+        g = np.concatenate((np.ones(N), -np.ones(N)))
+        overlaps = np.einsum("...in,i,...in->...n", np.conjugate(left), g, right)
+        return overlaps / np.abs(overlaps)
+
+    def _plaquettes(self, lower, upper):
+        r"""
+        Berry flux through the plaquettes between two neighbouring planes.
+
+        Parameters
+        ----------
+        lower : (n_2, n_3, 2N, N) :numpy:`ndarray`
+        upper : (n_2, n_3, 2N, N) :numpy:`ndarray`
+
+        Returns
+        -------
+        flux : (n_2, n_3, N) :numpy:`ndarray`
+        """
+
+        U_1 = self._links(lower, upper)
+        U_2_lower = self._links(lower, np.roll(lower, -1, axis=0))
+        U_2_upper = self._links(upper, np.roll(upper, -1, axis=0))
+        return np.angle(
+            U_1
+            * U_2_upper
+            * np.conjugate(np.roll(U_1, -1, axis=0))
+            * np.conjugate(U_2_lower)
+        )
+
+    def berry_curvature(self):
+        r"""
+        Berry curvature of each band.
+
+        .. math::
+
+            \Omega_n(\boldsymbol{k}) = \dfrac{F_n(\boldsymbol{k})}{A}
+
+        where :math:`A` is the area of the plaquette.
+
+        Returns
+        -------
+        curvature : (n_1, n_2, n_3, N) :numpy:`ndarray`
+            In the units of the length squared.
+        """
+
+        return self.flux / self.area
+
+    def chern_numbers(self):
+        r"""
+        Chern numbers of the bands.
+
+        .. math::
+
+            C_n = \dfrac{1}{2\pi}\sum_{\boldsymbol{k}}F_n(\boldsymbol{k})
+
+        Returns
+        -------
+        chern_numbers : (n_3, N) :numpy:`ndarray`
+            Chern numbers for each plane of the mesh along the third direction.
+            Integer, if the bands are gapped.
+        """
+
+        return np.sum(self.flux, axis=(0, 1)) / 2 / np.pi
+
+    def thermal_hall(self, temperatures, boltzmann=BOLTZMANN):
+        r"""
+        Thermal Hall conductance of the magnons [2]_.
+
+        .. math::
+
+            \kappa_{xy}(T) = -\dfrac{k_B^2T}{\hbar}\dfrac{1}{(2\pi)^2}
+            \sum_{n, \boldsymbol{k}} c_2(n_B(\omega_n(\boldsymbol{k})))F_n(\boldsymbol{k})
+
+        where
+        :math:`c_2(x) = (1 + x)\left(\ln\dfrac{1 + x}{x}\right)^2 - (\ln x)^2 - 2Li_2(-x)`.
+
+        Parameters
+        ----------
+        temperatures : (T,) |array_like|_
+            Temperatures in Kelvin.
+        boltzmann : float, default :py:data:`.BOLTZMANN`
+            Boltzmann constant in the units of energy of the dispersion per Kelvin.
+
+        Returns
+        -------
+        kappa : (T,) :numpy:`ndarray`
+            Conductance of one layer in the units of :math:`k_B^2T/\hbar`,
+            averaged over the planes of the mesh along the third direction.
+
+        References
+        ----------
+        .. [2] Matsumoto, R. and Murakami, S., 2011.
+            Theoretical prediction of a rotating magnon wave packet in ferromagnets.
+            Physical Review Letters, 106(19), p.197202.
+        """
+
+        temperatures = MagnonThermodynamics._temperatures(temperatures)
+
+        valid = self.omegas > 0
+        omegas = self.omegas[valid]
+        flux = self.flux[valid]
+        kappa = np.zeros(len(temperatures), dtype=float)
+        for index, temperature in enumerate(temperatures):
+            n = bose_einstein(omegas / boltzmann / temperature)
+            c_2 = (1 + n) * np.log1p(1 / n) ** 2 - np.log(n) ** 2 - 2 * spence(1 + n)
+            kappa[index] = -np.sum(c_2 * flux) / (2 * np.pi) ** 2
+        return kappa / self._grid[2]
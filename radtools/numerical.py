@@ -17,16 +17,21 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 r"""
-Collection of small routines and constants, 
+Collection of small routines and constants,
 which are used across the whole package.
 
 It's purpose is to serve as an "other" folder.
 """
 
+import numpy as np
+
 from radtools.crystal.constants import ABS_TOL, REL_TOL
 
 __all__ = [
     "compare_numerically",
+    "bose_einstein",
+    "group_bonds",
+    "bond_sum",
 ]
 
 
@@ -102,3 +107,97 @@ def compare_numerically(x, condition, y, eps=None, rtol=REL_TOL, atol=ABS_TOL):
         return x < y - eps or y < x - eps
 
     raise ValueError(f'Condition must be one of "<", ">", "<=", ">=", "==", "!=".')
+
+
+def bose_einstein(x):
+    r"""
+    Bose-Einstein distribution.
+
+    .. math::
+
+        n(x) = \frac{1}{e^x - 1}
+
+    Computed without overflow for the large x.
+
+    Parameters
+    ----------
+    x : |array_like|_
+        Energy in the units of temperature, :math:`x = \omega / k_B T`.
+        Expected to be positive.
+
+    Returns
+    -------
+    n : :numpy:`ndarray`
+        Occupation number.
+    """
+
+    x = np.asarray(x)
+    return np.exp(-x) / -np.expm1(-x)
+
+
+def group_bonds(indices_i, indices_j, N):
+    r"""
+    Group the bonds by the (i, j) pair of atoms.
+
+    Bonds are sorted by the pair with the stable sort,
+    so that the sum over the bonds of each pair
+    reduces to one :numpy:`add.reduceat` call (see :py:func:`.bond_sum`).
+
+    Parameters
+    ----------
+    indices_i : (n_bonds,) |array_like|_
+        Indices of the first atom of each bond.
+    indices_j : (n_bonds,) |array_like|_
+        Indices of the second atom of each bond.
+    N : int
+        Number of atoms.
+
+    Returns
+    -------
+    groups : tuple
+        ``(order, pairs, starts)``: sorting order of the bonds,
+        unique flat indices :math:`iN + j` of the pairs
+        and starting positions of the pairs in the sorted bonds.
+    """
+
+    pairs = np.asarray(indices_i, dtype=int) * N + np.asarray(indices_j, dtype=int)
+    order = np.argsort(pairs, kind="stable")
+    unique_pairs, starts = np.unique(pairs[order], return_index=True)
+    return order, unique_pairs, starts
+
+
+def bond_sum(phases, values, groups, N):
+    r"""
+    Sum bond-resolved values into the (i, j) blocks.
+
+    .. math::
+
+        result_{i,j} = \sum_{\boldsymbol{d}} values_{i,j}(\boldsymbol{d}) phases(\boldsymbol{d})
+
+    Parameters
+    ----------
+    phases : (M, n_bonds) |array_like|_
+        Phase factors of the bonds for M points.
+    values : (n_bonds, ...) |array_like|_
+        Bond-resolved values.
+    groups : tuple
+        Grouping of the bonds, as returned by :py:func:`.group_bonds`.
+    N : int
+        Number of atoms.
+
+    Returns
+    -------
+    result : (M, N, N, ...) :numpy:`ndarray`
+        Sums over the bonds of each pair of atoms.
+    """
+
+    phases = np.asarray(phases)
+    values = np.asarray(values)
+    order, pairs, starts = groups
+    M = phases.shape[0]
+    tail = values.shape[1:]
+    result = np.zeros((M, N * N) + tail, dtype=complex)
+    if len(pairs) != 0:
+        terms = phases[:, order].reshape((M, -1) + (1,) * len(tail)) * values[order]
+        result[:, pairs] = np.add.reduceat(terms, starts, axis=1)
+    return result.reshape((M, N, N) + tail)
@@ -52,6 +52,7 @@ def manager(
     join_output=False,
     nodmi=False,
     no_anisotropic=False,
+    adaptive=False,
 ):
     r"""
     :ref:`rad-plot-tb2j-magnons` script.
@@ -194,6 +195,16 @@ def manager(
         Whether to ignore anisotropic symmetric exchange in the spinham.
 
         Console argument: ``-noa`` / ``--no-anisotropic``
+    adaptive : bool, default False
+        Whether to sample the k path adaptively.
+
+        Intervals of the path, where the dispersion is curved or the bands are
+        close to each other, are recursively bisected. Sampling of the k path
+        (:py:attr:`.Kpoints.n`) is used as the initial one.
+
+        .. versionadded:: 0.8.13
+
+        Console argument: ``-ad`` / ``--adaptive``
     """
 
     head, _ = os.path.split(input_filename)
@@ -287,7 +298,15 @@ def manager(
 
     fig, ax = plt.subplots()
 
-    omegas = dispersion(kp)
+    if adaptive:
+        # Sampling of the path is the initial one, the refinement adds points
+        points, flatten_points, omegas = dispersion.adaptive_omegas(kp)
+        relative_points = points @ np.linalg.inv(np.array([kp.b1, kp.b2, kp.b3]))
+    else:
+        omegas = dispersion(kp)
+        points = kp.points(relative=False)
+        relative_points = kp.points(relative=True)
+        flatten_points = kp.flatten_points()
 
     ax.set_xticks(kp.coordinates(), kp.labels, fontsize=15)
     ax.set_ylabel("E, meV", fontsize=15)
@@ -304,10 +323,10 @@ def manager(
     colors = ["#174FD5", "#F8AB00", "#0CE1A2", "#FF003C", "#46EC00", "#9823C9"]
     i = 0
     for omega in omegas:
-        ax.plot(kp.flatten_points(), omega, color=colors[i % len(colors)])
+        ax.plot(flatten_points, omega, color=colors[i % len(colors)])
         i += 1
 
-    ax.set_xlim(kp.flatten_points()[0], kp.flatten_points()[-1])
+    ax.set_xlim(flatten_points[0], flatten_points[-1])
     plot_hlines(ax, [0])
 
     if save_txt:
@@ -436,10 +455,10 @@ def manager(
             filename,
             np.concatenate(
                 (
-                    [kp.flatten_points()],
+                    [flatten_points],
                     omegas,
-                    kp.points(relative=True).T,
-                    kp.points(relative=False).T,
+                    relative_points.T,
+                    points.T,
                 ),
                 axis=0,
             ).T,
@@ -629,5 +648,12 @@ def create_parser():
         action="store_true",
         help="Whether to ignore anisotropic symmetric exchange in the spinham.",
     )
+    parser.add_argument(
+        "-ad",
+        "--adaptive",
+        default=False,
+        action="store_true",
+        help="Whether to refine the default sampling of the k path adaptively.",
+    )
 
     return parser
@@ -0,0 +1,460 @@
+# RAD-tools - program for spin Hamiltonian and magnons.
+# Copyright (C) 2022-2023  Andrey Rybakov
+#
+# e-mail: anry@uv.es, web: adrybakov.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+r"""
+Storage of the bonds of the spin Hamiltonian.
+
+It is an internal part of the :py:class:`.SpinHamiltonian`,
+not a part of the public API.
+"""
+
+from copy import deepcopy
+from weakref import ref
+
+import numpy as np
+
+from radtools.spinham.parameter import ExchangeParameter
+
+__all__ = []
+
+
+class BondStorage:
+    r"""
+    Bonds of the spin Hamiltonian as the contiguous arrays.
+
+    Each bond (atom1, atom2, R) occupies one row of the arrays. Removed bonds
+    leave the holes, which are dropped by :py:meth:`.compact`, therefore
+    the order of the bonds is the order of the insertion.
+
+    Keys of the rows are created only when they are needed
+    (lookup, iteration, removal of one bond).
+
+    Attributes
+    ----------
+    atoms : list of :py:class:`.Atom`
+        Atoms, to which the indices of the bonds refer.
+    atom1 : (n,) :numpy:`ndarray` of int32
+        Index of the first atom of each row.
+    atom2 : (n,) :numpy:`ndarray` of int32
+        Index of the second atom of each row.
+    R : (n, 3) :numpy:`ndarray` of int32
+        Unit cell of the second atom of each row.
+    matrices : (n, 3, 3) :numpy:`ndarray` of float64
+        Exchange matrix of each row.
+    keys : list of tuple
+        (atom1, atom2, R) of each row, ``None`` for the removed bonds.
+    layout : int
+        Incremented each time the rows are renumbered.
+    """
+
+    def __init__(self) -> None:
+        self.atoms = []
+        self._atom_index = {}
+        # Buffers grow geometrically, first _n rows are used
+        self._atom1 = np.zeros(0, dtype=np.int32)
+        self._atom2 = np.zeros(0, dtype=np.int32)
+        self._R = np.zeros((0, 3), dtype=np.int32)
+        self._matrices = np.zeros((0, 3, 3), dtype=float)
+        self._n = 0
+        self._holes = 0
+        # Keys and rows of the present bonds, created on demand
+        self._keys = []
+        self._row_index = {}
+        # Weak references to the parameters, which refer to the rows
+        self._views = []
+        self.layout = 0
+
+    @property
+    def atom1(self):
+        return self._atom1[: self._n]
+
+    @property
+    def atom2(self):
+        return self._atom2[: self._n]
+
+    @property
+    def R(self):
+        return self._R[: self._n]
+
+    @property
+    def matrices(self):
+        return self._matrices[: self._n]
+
+    @property
+    def keys(self):
+        if self._keys is None:
+            atoms = self.atoms
+            self._keys = [
+                (atoms[i], atoms[j], tuple(R))
+                for i, j, R in zip(
+                    self.atom1.tolist(), self.atom2.tolist(), self.R.tolist()
+                )
+            ]
+        return self._keys
+
+    @property
+    def _rows(self):
+        # Row of each present bond
+        if self._row_index is None:
+            self._row_index = {
+                key: row for row, key in enumerate(self.keys) if key is not None
+            }
+        return self._row_index
+
+    def __len__(self):
+        return self._n - self._holes
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    def __iter__(self):
+        return iter(self.present_keys())
+
+    def __deepcopy__(self, memo):
+        new = BondStorage()
+        memo[id(self)] = new
+        new.atoms = deepcopy(self.atoms, memo)
+        new._atom_index = {atom: index for index, atom in enumerate(new.atoms)}
+        self.compact()
+        new._set_arrays(self.atom1, self.atom2, self.R, self.matrices)
+        return new
+
+    def __getstate__(self):
+        # Weak references can not be pickled,
+        # unpickled parameters are independent anyway (see BondParameter)
+        state = self.__dict__.copy()
+        state["_views"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._views = [None] * self._n
+
+    def subset(self, mask):
+        r"""
+        New storage with the copies of the selected rows.
+
+        Atoms are shared with this storage, keys are not created.
+
+        Parameters
+        ----------
+        mask : (n,) |array_like|_ of bool
+            Mask over the rows of :py:meth:`.arrays`.
+
+        Returns
+        -------
+        storage : :py:class:`.BondStorage`
+        """
+
+        self.compact()
+        mask = np.array(mask, dtype=bool)
+        new = BondStorage()
+        new.atoms = list(self.atoms)
+        new._atom_index = self._atom_index.copy()
+        new._set_arrays(
+            self.atom1[mask], self.atom2[mask], self.R[mask], self.matrices[mask]
+        )
+        return new
+
+    def _index_of(self, atom):
+        if atom not in self._atom_index:
+            self._atom_index[atom] = len(self.atoms)
+            self.atoms.append(atom)
+        return self._atom_index[atom]
+
+    def _set_arrays(self, atom1, atom2, R, matrices):
+        self._atom1 = np.array(atom1, dtype=np.int32).reshape(-1)
+        self._atom2 = np.array(atom2, dtype=np.int32).reshape(-1)
+        self._R = np.array(R, dtype=np.int32).reshape((-1, 3))
+        self._matrices = np.array(matrices, dtype=float).reshape((-1, 3, 3))
+        self._n = len(self._atom1)
+        self._holes = 0
+        self._keys = None
+        self._row_index = None
+        self._views = [None] * self._n
+        self.layout += 1
+
+    def present_keys(self):
+        r"""
+        Keys of the present bonds in the order of the rows.
+
+        Returns
+        -------
+        keys : list of tuple
+        """
+
+        if self._holes == 0:
+            return list(self.keys)
+        return [key for key in self.keys if key is not None]
+
+    def get(self, key) -> ExchangeParameter:
+        r"""
+        Exchange parameter of the bond, which refers to its row.
+
+        Raises
+        ------
+        KeyError
+            If the bond is not present.
+        """
+
+        return self.get_row(self._rows[key])
+
+    def get_row(self, row) -> ExchangeParameter:
+        r"""
+        Exchange parameter of the present bond in the row.
+        """
+
+        view = self._views[row]
+        if view is not None:
+            view = view()
+        if view is None:
+            view = BondParameter(self, row)
+            self._views[row] = ref(view)
+        return view
+
+    def _detach(self, row):
+        view = self._views[row]
+        if view is not None:
+            view = view()
+            if view is not None:
+                view._detach()
+            self._views[row] = None
+
+    def add(self, atom1, atom2, R, matrix):
+        r"""
+        Add the bond or replace the matrix of the present one.
+
+        Parameters previously returned for the replaced bond keep the old matrix.
+        """
+
+        key = (atom1, atom2, R)
+        row = self._rows.get(key)
+        if row is not None:
+            self._detach(row)
+            self._matrices[row] = matrix
+            return
+        row = self._n
+        if row == len(self._atom1):
+            capacity = max(16, 2 * row)
+            self._atom1 = np.resize(self._atom1, capacity)
+            self._atom2 = np.resize(self._atom2, capacity)
+            self._R = np.resize(self._R, (capacity, 3))
+            self._matrices = np.resize(self._matrices, (capacity, 3, 3))
+        self._atom1[row] = self._index_of(atom1)
+        self._atom2[row] = self._index_of(atom2)
+        self._R[row] = R
+        self._matrices[row] = matrix
+        self._rows[key] = row
+        self.keys.append(key)
+        self._views.append(None)
+        self._n += 1
+
+    def remove(self, key):
+        r"""
+        Remove the bond.
+
+        Raises
+        ------
+        KeyError
+            If the bond is not present.
+        """
+
+        row = self._rows.pop(key)
+        self._detach(row)
+        self.keys[row] = None
+        self._holes += 1
+        # Holes are dropped, when they take more than half of the rows
+        if 2 * self._holes > self._n:
+            self.compact()
+
+    def compact(self):
+        r"""
+        Drop the rows of the removed bonds.
+        """
+
+        if self._holes == 0:
+            return
+        self._select([key is not None for key in self.keys])
+
+    def _select(self, mask):
+        # Keep only the rows selected by the mask and renumber them
+        mask = np.array(mask, dtype=bool)
+        selected = mask.tolist()
+        self._atom1 = self.atom1[mask]
+        self._atom2 = self.atom2[mask]
+        self._R = self.R[mask]
+        self._matrices = self.matrices[mask]
+        self._n = len(self._atom1)
+        self._holes = 0
+        if self._keys is not None:
+            self._keys = [key for key, keep in zip(self._keys, selected) if keep]
+        self._row_index = None
+        self._views = [view for view, keep in zip(self._views, selected) if keep]
+        for row, view in enumerate(self._views):
+            if view is not None and view() is not None:
+                view()._row = row
+        self.layout += 1
+
+    def arrays(self):
+        r"""
+        Arrays of the present bonds.
+
+        Returns
+        -------
+        atom1 : (n,) :numpy:`ndarray` of int32
+        atom2 : (n,) :numpy:`ndarray` of int32
+        R : (n, 3) :numpy:`ndarray` of int32
+        matrices : (n, 3, 3) :numpy:`ndarray`
+            Views of the stored arrays. Changes of the ``matrices`` are
+            the changes of the bonds.
+        """
+
+        self.compact()
+        return self.atom1, self.atom2, self.R, self.matrices
+
+    def keep(self, mask):
+        r"""
+        Keep only the bonds, selected by the mask.
+
+        Parameters
+        ----------
+        mask : (n,) |array_like|_ of bool
+            Mask over the rows of :py:meth:`.arrays`.
+        """
+
+        self.compact()
+        mask = np.array(mask, dtype=bool)
+        if mask.all():
+            return
+        for row in np.flatnonzero(~mask).tolist():
+            self._detach(row)
+        self._select(mask)
+
+    def remove_atom(self, atom):
+        r"""
+        Remove the atom and all bonds, which start or end in it.
+
+        Indices of the other atoms are renumbered, so that :py:attr:`.atoms`
+        contains only the atoms, which are present in the crystal.
+
+        Parameters
+        ----------
+        atom : :py:class:`.Atom`
+        """
+
+        if atom not in self._atom_index:
+            return
+        index = self._atom_index[atom]
+        self.compact()
+        self.keep((self.atom1 != index) & (self.atom2 != index))
+        del self.atoms[index]
+        self._atom_index = {atom: index for index, atom in enumerate(self.atoms)}
+        self.atom1[self.atom1 > index] -= 1
+        self.atom2[self.atom2 > index] -= 1
+        self.layout += 1
+
+    def set_atoms(self, atoms):
+        r"""
+        Replace the atoms, to which the bonds refer.
+
+        Parameters
+        ----------
+        atoms : list of :py:class:`.Atom`
+            New atoms, one for each atom of :py:attr:`.atoms`.
+        """
+
+        self.atoms = list(atoms)
+        self._atom_index = {atom: index for index, atom in enumerate(self.atoms)}
+        self._keys = None
+        self._row_index = None
+        self.layout += 1
+
+    def replace(self, atom1, atom2, R, matrices):
+        r"""
+        Replace all bonds.
+
+        Parameters of the bonds, which are present before and after, refer to the
+        new rows. Parameters of the removed bonds keep their matrices.
+
+        Parameters
+        ----------
+        atom1 : (n,) |array_like|_
+            Indices of the first atom in :py:attr:`.atoms`.
+        atom2 : (n,) |array_like|_
+            Indices of the second atom in :py:attr:`.atoms`.
+        R : (n, 3) |array_like|_
+        matrices : (n, 3, 3) |array_like|_
+        """
+
+        views = {}
+        for row, view in enumerate(self._views):
+            if view is not None and view() is not None:
+                views[self.keys[row]] = view()
+                self._detach(row)
+        self._set_arrays(atom1, atom2, R, matrices)
+        for key, view in views.items():
+            if key in self._rows:
+                view._attach(self, self._rows[key])
+                self._views[view._row] = ref(view)
+
+
+class BondParameter(ExchangeParameter):
+    r"""
+    Exchange parameter, which refers to the row of the :py:class:`.BondStorage`.
+
+    All changes of the parameter are the changes of the stored matrix.
+    Once the bond is removed or replaced the parameter keeps its last matrix
+    and becomes independent.
+    """
+
+    def __init__(self, storage: BondStorage, row) -> None:
+        # Parent constructor is not called, the matrix is stored in the storage
+        self._storage = storage
+        self._row = row
+        self._own = None
+
+    @property
+    def _matrix(self):
+        if self._storage is None:
+            return self._own
+        return self._storage._matrices[self._row]
+
+    @_matrix.setter
+    def _matrix(self, new_matrix):
+        if self._storage is None:
+            self._own = new_matrix
+        else:
+            self._storage._matrices[self._row] = new_matrix
+
+    def _detach(self):
+        self._own = np.array(self._matrix, dtype=float)
+        self._storage = None
+
+    def _attach(self, storage: BondStorage, row):
+        self._storage = storage
+        self._row = row
+        self._own = None
+
+    def __copy__(self):
+        return ExchangeParameter(matrix=self.matrix)
+
+    def __deepcopy__(self, memo):
+        return ExchangeParameter(matrix=self.matrix)
+
+    def __reduce__(self):
+        return (ExchangeParameter, (np.array(self.matrix),))
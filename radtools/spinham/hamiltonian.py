@@ -24,15 +24,20 @@ Write a tutorial with docstring here.
 
 __all__ = ["SpinHamiltonian", "ExchangeHamiltonian"]
 
-from copy import deepcopy
+from copy import copy, deepcopy
 from typing import Iterable, Tuple
 
 import numpy as np
+from scipy.optimize import minimize
 
 from radtools.constants import TORADIANS
 from radtools.crystal.atom import Atom
 from radtools.crystal.crystal import Crystal
+from radtools.crystal.kpoints import monkhorst_pack
 from radtools.exceptions import NotationError
+from radtools.geometry import span_orthonormal_set
+from radtools.numerical import bond_sum, group_bonds
+from radtools.spinham.bonds import BondStorage
 from radtools.spinham.constants import PREDEFINED_NOTATIONS
 from radtools.spinham.parameter import ExchangeParameter
 from radtools.spinham.template import ExchangeTemplate
@@ -76,9 +81,14 @@ class SpinHamiltonian(Crystal):
             kwargs["atoms"] = crystal.atoms
             kwargs["cell"] = crystal.cell
 
+        # Counter of the modifications and the properties, computed from the bonds
+        self._mutations = 0
+        self._derived = {}
+
         super().__init__(**kwargs)
 
-        self._bonds = {}
+        # Bonds are stored as arrays, parameters are the views on them
+        self._bonds = BondStorage()
 
         # Notation settings
         self._double_counting = None
@@ -88,7 +98,40 @@ class SpinHamiltonian(Crystal):
             self.notation = notation
 
     def __len__(self):
-        return self._bonds.__len__()
+        return len(self._bonds)
+
+    def _modified(self):
+        r"""
+        Invalidate the cached properties, which are computed from the bonds.
+
+        Called by all methods, which add or remove bonds or atoms or change
+        the notation.
+        """
+
+        self._mutations += 1
+
+    def _memoized(self, name, compute):
+        r"""
+        Value of the derived property, computed once per modification.
+
+        Parameters
+        ----------
+        name : str
+            Name of the property.
+        compute : callable
+            Function without arguments, which computes the property.
+
+        Returns
+        -------
+        value
+            Cached value. Has to be copied, if it is mutable.
+        """
+
+        cached = self._derived.get(name)
+        if cached is None or cached[0] != self._mutations:
+            cached = (self._mutations, compute())
+            self._derived[name] = cached
+        return cached[1]
 
     # Notation attributes
     @property
@@ -121,29 +164,8 @@ class SpinHamiltonian(Crystal):
 
     @notation.setter
     def notation(self, new_notation):
-        # Set the notation from predefined notations
-        if isinstance(new_notation, str):
-            new_notation = new_notation.lower()
-            if new_notation not in PREDEFINED_NOTATIONS:
-                raise ValueError(
-                    f"Predefine notations are: "
-                    + f"{list(PREDEFINED_NOTATIONS)}, got: {new_notation}"
-                )
-            new_notation = PREDEFINED_NOTATIONS[new_notation]
-        # Set the notation from three values, converted to bool
-        elif isinstance(new_notation, Iterable) and len(new_notation) == 3:
-            new_notation = (
-                bool(new_notation[0]),
-                bool(new_notation[1]),
-                float(new_notation[2]),
-            )
-        else:
-            raise ValueError(
-                "New notation has to be either a string "
-                + "or an iterable with three elements, "
-                + f"got: {new_notation}"
-            )
-        (self.double_counting, self.spin_normalized, self.factor) = new_notation
+        new_notation = _parse_notation(new_notation)
+        self.double_counting, self.spin_normalized, self.factor = new_notation
 
     @property
     def notation_string(self):
@@ -222,6 +244,7 @@ class SpinHamiltonian(Crystal):
             self._spin_normalized = bool(spin_normalized)
         if factor is not None:
             self._factor = factor
+        self._modified()
 
     @property
     def double_counting(self) -> bool:
@@ -251,74 +274,24 @@ class SpinHamiltonian(Crystal):
             raise NotationError("double_counting")
         return self._double_counting
 
-    def _ensure_double_counting(self):
-        r"""
-        Ensure double counting.
-
-        Check and fix if needed, that for each (atom1, atom2, R)
-        (atom2, atom1, -R) is present in the Hamiltonian.
-        """
-
-        bonds = list(self)
-        for atom1, atom2, (i, j, k), J in bonds:
-            if (atom2, atom1, (-i, -j, -k)) not in self:
-                self.add_bond(atom2, atom1, (-i, -j, -k), J=J.T)
-
-    def _ensure_no_double_counting(self):
-        r"""
-        Ensure that there is no double counting in the model.
-
-        If the bond is (atom1, atom2, (i,j,k)), then the bond is kept in the model
-        if one of the conditions is true:
-
-        * i > 0
-        * i = 0 and j > 0
-        * i = 0, j = 0 and k > 0
-        * i = 0, j = 0, k = 0 and atom1.index <= atom2.index
-        """
-
-        bonds = list(self)
-
-        for atom1, atom2, (i, j, k), J in bonds:
-            if (i, j, k) != (0, 0, 0) or atom1 != atom2:
-                if (
-                    i > 0
-                    or (i == 0 and j > 0)
-                    or (i == 0 and j == 0 and k > 0)
-                    or (i == 0 and j == 0 and k == 0 and atom1.index <= atom2.index)
-                ):
-                    if (atom2, atom1, (-i, -j, -k)) in self:
-                        self.remove_bond(atom2, atom1, (-i, -j, -k))
-                else:
-                    if (atom2, atom1, (-i, -j, -k)) not in self:
-                        self.add_bond(atom2, atom1, (-i, -j, -k), J=J.T)
-                        self.remove_bond(atom1, atom2, (i, j, k))
-
     @double_counting.setter
     def double_counting(self, new_value: bool):
-        # Need to be at the beginning, otherwise _ensure methods do not work
-        old_value = self._double_counting
-        self._double_counting = bool(new_value)
-
-        if old_value is not None:
-            factor = 1
-            if old_value and not new_value:
-                factor = 2
-            elif not old_value and new_value:
-                factor = 0.5
-            if factor != 1:
-                if new_value:
-                    self._ensure_double_counting()
-                else:
-                    self._ensure_no_double_counting()
-                for atom1, atom2, R, J in self:
-                    if R != (0, 0, 0) or atom1 != atom2:
-                        self[atom1, atom2, R] = J * factor
-        else:
-            if new_value:
-                self._ensure_double_counting()
-            else:
-                self._ensure_no_double_counting()
+        new_value = bool(new_value)
+        if self._double_counting != new_value:
+            # One call for all bonds: add or remove the reversed bonds and
+            # rescale the parameters, if the old notation is known
+            i, j, R, matrices = self._bonds.arrays()
+            matrices, i, j, R = self._convert_bonds(
+                matrices,
+                i,
+                j,
+                R,
+                self._bonds.atoms,
+                (new_value, self._spin_normalized, self._factor),
+            )
+            self._bonds.replace(i, j, R, matrices)
+        self._double_counting = new_value
+        self._modified()
 
     @property
     def spin_normalized(self) -> bool:
@@ -350,14 +323,34 @@ class SpinHamiltonian(Crystal):
 
     @spin_normalized.setter
     def spin_normalized(self, new_value: bool):
-        if self._spin_normalized is not None:
-            if self._spin_normalized and not new_value:
-                for atom1, atom2, R, J in self:
-                    self[atom1, atom2, R] = J / atom1.spin / atom2.spin
-            elif not self._spin_normalized and new_value:
-                for atom1, atom2, R, J in self:
-                    self[atom1, atom2, R] = J * atom1.spin * atom2.spin
+        if self._spin_normalized is not None and self._spin_normalized != bool(
+            new_value
+        ):
+            matrices = self._bonds.arrays()[3]
+            if self._spin_normalized:
+                matrices /= self._spin_products()[:, None, None]
+            else:
+                matrices *= self._spin_products()[:, None, None]
         self._spin_normalized = bool(new_value)
+        self._modified()
+
+    def _spin_products(self):
+        r"""
+        Product of the spin values of two atoms of each bond.
+
+        Returns
+        -------
+        products : (n,) :numpy:`ndarray`
+            In the order of the rows of the bonds storage.
+        """
+
+        i, j, R, matrices = self._bonds.arrays()
+        atoms = self._bonds.atoms
+        spins = np.ones(len(atoms), dtype=float)
+        # Spins are required only for the atoms with bonds
+        for index in np.unique(np.concatenate((i, j))):
+            spins[index] = atoms[index].spin
+        return spins[i] * spins[j]
 
     @property
     def factor(self) -> float:
@@ -393,10 +386,11 @@ class SpinHamiltonian(Crystal):
             factor = self._factor / new_factor
 
             if factor != 1:
-                for atom1, atom2, R, J in self:
-                    self[atom1, atom2, R] = J * factor
+                matrices = self._bonds.arrays()[3]
+                matrices *= factor
 
         self._factor = float(new_factor)
+        self._modified()
 
     def __iter__(self):
         return SpinHamiltonianIterator(self)
@@ -409,7 +403,7 @@ class SpinHamiltonian(Crystal):
         if isinstance(atom2, str):
             atom2 = self.get_atom(atom2)
 
-        key = (atom1, atom2, R)
+        key = (atom1, atom2, tuple(R))
         return key in self._bonds
 
     def __getitem__(self, key) -> ExchangeParameter:
@@ -420,8 +414,8 @@ class SpinHamiltonian(Crystal):
         if isinstance(atom2, str):
             atom2 = self.get_atom(atom2)
 
-        key = (atom1, atom2, R)
-        return self._bonds[key]
+        key = (atom1, atom2, tuple(R))
+        return self._bonds.get(key)
 
     def __getattr__(self, name):
         # Fix copy/deepcopy RecursionError
@@ -463,10 +457,12 @@ class SpinHamiltonian(Crystal):
             Array of n unit cells.
         """
 
-        cells = set()
-        for atom1, atom2, R, J in self:
-            cells.add(R)
-        return np.array(list(cells))
+        def compute():
+            if len(self._bonds) == 0:
+                return np.array([])
+            return np.unique(self._bonds.arrays()[2], axis=0)
+
+        return self._memoized("cell_list", compute).copy()
 
     @property
     def magnetic_atoms(self):
@@ -482,12 +478,14 @@ class SpinHamiltonian(Crystal):
         magnetic_atoms : list of :py:class:`.Atom`
             List of magnetic atoms.
         """
-        result = set()
-        for atom1, atom2, R, J in self:
-            result.add(atom1)
-            result.add(atom2)
 
-        return sorted(list(result), key=lambda x: x.index)
+        def compute():
+            i, j, R, matrices = self._bonds.arrays()
+            atoms = self._bonds.atoms
+            result = [atoms[index] for index in np.unique(np.concatenate((i, j)))]
+            return sorted(result, key=lambda x: x.index)
+
+        return list(self._memoized("magnetic_atoms", compute))
 
     @property
     def number_spins_in_unit_cell(self):
@@ -526,20 +524,19 @@ class SpinHamiltonian(Crystal):
             Maximum z coordinate.
         """
 
-        x_max, y_max, z_max = None, None, None
-        x_min, y_min, z_min = None, None, None
-        for atom1, atom2, R in self._bonds:
-            x1, y1, z1 = self.get_atom_coordinates(atom1, relative=False)
-            x2, y2, z2 = self.get_atom_coordinates(atom2, R, relative=False)
-            if x_max is None:
-                x_min, y_min, z_min = x1, y1, z1
-                x_max, y_max, z_max = x1, y1, z1
-            x_max = max(x1, x2, x_max)
-            y_max = max(y1, y2, y_max)
-            z_max = max(z1, z2, z_max)
-            x_min = min(x1, x2, x_min)
-            y_min = min(y1, y2, y_min)
-            z_min = min(z1, z2, z_min)
+        if len(self._bonds) == 0:
+            return None, None, None, None, None, None
+
+        # Not cached, since positions of the atoms could be changed directly
+        positions = np.array(
+            [atom.position for atom in self._bonds.atoms], dtype=float
+        ).reshape((-1, 3))
+        i, j, R, matrices = self._bonds.arrays()
+        coordinates = np.concatenate((positions[i], R + positions[j])) @ np.array(
+            self.cell, dtype=float
+        )
+        x_min, y_min, z_min = np.min(coordinates, axis=0)
+        x_max, y_max, z_max = np.max(coordinates, axis=0)
         return x_min, y_min, z_min, x_max, y_max, z_max
 
     def __setitem__(self, key, value):
@@ -587,7 +584,8 @@ class SpinHamiltonian(Crystal):
             Vector of the unit cell for atom2.
             In the relative coordinates (i,j,k).
         J : :py:class:`.ExchangeParameter`, optional
-            An instance of :py:class:`ExchangeParameter`.
+            An instance of :py:class:`ExchangeParameter`. Its matrix is copied to
+            the Hamiltonian, use ``model[atom1, atom2, R]`` to get the stored parameter.
         ** kwargs
             Keyword arguments for the constructor of :py:class:`ExchangeParameter`.
             Ignored if J is given.
@@ -595,28 +593,24 @@ class SpinHamiltonian(Crystal):
 
         if isinstance(atom1, str):
             atom1 = self.get_atom(atom1)
-        elif atom1 not in self.atoms:
+        elif self._find_atom(atom1) is None:
             self.add_atom(atom1)
 
         if isinstance(atom2, str):
             atom2 = self.get_atom(atom2)
-        elif atom2 not in self.atoms:
+        elif self._find_atom(atom2) is None:
             self.add_atom(atom2)
 
         if J is None:
             J = ExchangeParameter(**kwargs)
 
-        self._bonds[(atom1, atom2, R)] = J
+        i, j, k = R = tuple(int(x) for x in R)
+        self._bonds.add(atom1, atom2, R, J.matrix)
+        self._modified()
 
         # Check for double counting
-        double_counting = False
-        try:
-            double_counting = self.double_counting
-        except NotationError:
-            pass
-        i, j, k = R
-        if double_counting and (atom2, atom1, (-i, -j, -k)) not in self:
-            self._bonds[(atom2, atom1, (-i, -j, -k))] = J.T
+        if self._double_counting and (atom2, atom1, (-i, -j, -k)) not in self._bonds:
+            self._bonds.add(atom2, atom1, (-i, -j, -k), J.matrix.T)
 
     def __delitem__(self, key):
         self.remove_bond(*key)
@@ -672,22 +666,18 @@ class SpinHamiltonian(Crystal):
         if isinstance(atom2, str):
             atom2 = self.get_atom(atom2)
 
+        i, j, k = R = tuple(R)
+        self._modified()
         try:
-            del self._bonds[(atom1, atom2, R)]
+            self._bonds.remove((atom1, atom2, R))
         except KeyError:
             raise KeyError(
                 f"Bond ({atom2.fullname}, {atom2.fullname}, {R}) is not present in the model."
             )
 
         # Check for double counting
-        double_counting = False
-        try:
-            double_counting = self.double_counting
-        except NotationError:
-            pass
-        i, j, k = R
-        if double_counting and (atom2, atom1, (-i, -j, -k)) in self:
-            del self._bonds[(atom2, atom1, (-i, -j, -k))]
+        if self._double_counting and (atom2, atom1, (-i, -j, -k)) in self._bonds:
+            self._bonds.remove((atom2, atom1, (-i, -j, -k)))
 
     def remove_atom(self, atom):
         r"""
@@ -706,13 +696,8 @@ class SpinHamiltonian(Crystal):
         if isinstance(atom, str):
             atom = self.get_atom(atom)
 
-        bonds_for_removal = []
-        for atom1, atom2, R, J in self:
-            if atom1 == atom or atom2 == atom:
-                bonds_for_removal.append((atom1, atom2, R))
-
-        for bond in bonds_for_removal:
-            del self[bond]
+        self._bonds.remove_atom(atom)
+        self._modified()
 
         super().remove_atom(atom)
 
@@ -750,53 +735,155 @@ class SpinHamiltonian(Crystal):
         This method modifies the instance at which it is called.
         """
 
+        self._modified()
+        self._bonds.keep(
+            self._filter_mask(
+                max_distance=max_distance,
+                min_distance=min_distance,
+                template=template,
+                R_vector=R_vector,
+            )
+        )
+
+    def _filter_mask(
+        self, max_distance=None, min_distance=None, template=None, R_vector=None
+    ):
+        r"""
+        Bonds, which pass the conditions of :py:meth:`.filter`.
+
+        Returns
+        -------
+        mask : (n,) :numpy:`ndarray` of bool
+            Mask over the rows of the bonds storage.
+        """
+
         if isinstance(template, ExchangeTemplate):
             template = template.get_list()
-        if template is not None:
-            template = set(template)
 
         if R_vector is not None:
             if type(R_vector) == tuple:
-                R_vector = {R_vector}
-            elif type(R_vector) == list:
-                R_vector = set(R_vector)
-            else:
+                R_vector = [R_vector]
+            elif type(R_vector) != list:
                 raise TypeError("Type is not supported, supported: list.")
-        bonds_for_removal = set()
-        for atom1, atom2, R, J in self:
-            i, j, k = R
-            dis = self.get_distance(atom1, atom2, R)
 
-            if max_distance is not None and dis > max_distance:
-                bonds_for_removal.add((atom1, atom2, R))
+        atom1, atom2, R, matrices = self._bonds.arrays()
+        remove = np.zeros(len(R), dtype=bool)
 
-            if min_distance is not None and dis < min_distance:
-                bonds_for_removal.add((atom1, atom2, R))
+        if max_distance is not None or min_distance is not None:
+            distances = self._bond_table()[1]
+            if max_distance is not None:
+                remove |= distances > max_distance
+            if min_distance is not None:
+                remove |= distances < min_distance
 
+        if R_vector is not None:
+            R_vector = np.unique(np.array(R_vector, dtype=int).reshape((-1, 3)), axis=0)
+            condition = _match_rows(R_vector, R) == -1
             # This behaviour should depend on the notation of the Hamiltonian
-            condition = R_vector is not None and R not in R_vector
-            try:
-                if self.double_counting:
-                    condition = condition and (-i, -j, -k) not in R_vector
-            except NotationError:
-                pass
-            if condition:
-                bonds_for_removal.add((atom1, atom2, R))
-
-            # Here names, not objects are compared, because in general
-            # template only has information about names (or fullnames) and R.
-            if (
-                template is not None
-                and (atom1.name, atom2.name, R) not in template
-                and (atom1.fullname, atom2.fullname, R) not in template
-            ):
-                bonds_for_removal.add((atom1, atom2, R))
-
-        for atom1, atom2, R in bonds_for_removal:
-            try:
-                del self[atom1, atom2, R]
-            except KeyError:
-                pass
+            if self._double_counting:
+                condition &= _match_rows(R_vector, -R) == -1
+            remove |= condition
+
+        # Here names, not objects are compared, because in general
+        # template only has information about names (or fullnames) and R.
+        if template is not None:
+            in_template = np.zeros(len(R), dtype=bool)
+            for attribute in ["name", "fullname"]:
+                codes = {}
+                atom_codes = np.array(
+                    [
+                        codes.setdefault(getattr(atom, attribute), len(codes))
+                        for atom in self._bonds.atoms
+                    ],
+                    dtype=int,
+                )
+                entries = [
+                    (codes[name1], codes[name2]) + tuple(R_entry)
+                    for name1, name2, R_entry in template
+                    if name1 in codes and name2 in codes
+                ]
+                if len(entries) != 0:
+                    rows = np.concatenate(
+                        (atom_codes[atom1, None], atom_codes[atom2, None], R), axis=1
+                    )
+                    entries = np.unique(np.array(entries, dtype=int), axis=0)
+                    in_template |= _match_rows(entries, rows) != -1
+            remove |= ~in_template
+
+        # Reversed bonds are removed together, as in remove_bond()
+        if self._double_counting and remove.any():
+            reverse = _match_rows(
+                np.concatenate((atom1[:, None], atom2[:, None], R), axis=1),
+                np.concatenate((atom2[:, None], atom1[:, None], -R), axis=1),
+            )
+            remove[reverse[remove & (reverse != -1)]] = True
+
+        return ~remove
+
+    def _bond_table(self):
+        r"""
+        Vectors and lengths of all bonds.
+
+        Computed in one pass over the arrays of the bonds.
+
+        Returns
+        -------
+        vectors : (n, 3) :numpy:`ndarray`
+            Vectors from atom1 to atom2 in absolute coordinates.
+            In the order of the rows of the bonds storage.
+        distances : (n,) :numpy:`ndarray`
+            Lengths of the vectors.
+        """
+
+        atom1, atom2, R, matrices = self._bonds.arrays()
+        positions = np.array(
+            [atom.position for atom in self._bonds.atoms], dtype=float
+        ).reshape((-1, 3))
+        vectors = (R + positions[atom2] - positions[atom1]) @ np.array(
+            self.cell, dtype=float
+        )
+        return vectors, np.linalg.norm(vectors, axis=1)
+
+    def _view(self, mask):
+        r"""
+        New Hamiltonian with the selected bonds.
+
+        Bonds of the new Hamiltonian are the copies of the selected rows,
+        atoms and cell are copied as well.
+
+        Parameters
+        ----------
+        mask : (n,) :numpy:`ndarray` of bool
+            Mask over the rows of the bonds storage.
+
+        Returns
+        -------
+        view : :py:class:`.SpinHamiltonian`
+        """
+
+        view = copy(self)
+        memo = {}
+        view.atoms = deepcopy(self.atoms, memo)
+        view._cell = np.array(self._cell)
+        view._kpoints = deepcopy(self._kpoints)
+        view._bonds = self._bonds.subset(mask)
+        view._bonds.set_atoms(deepcopy(self._bonds.atoms, memo))
+        view._derived = {}
+        return view
+
+    def _set_cell(self, new_cell, standardize=True):
+        super()._set_cell(new_cell, standardize=standardize)
+        self._modified()
+
+    def add_atom(self, new_atom: Atom = None, relative=True, **kwargs):
+        r"""
+        Add atom to the Hamiltonian.
+
+        See :py:meth:`.Crystal.add_atom` for the parameters.
+        """
+
+        super().add_atom(new_atom, relative=relative, **kwargs)
+        self._modified()
 
     def filtered(
         self, max_distance=None, min_distance=None, template=None, R_vector=None
@@ -808,8 +895,8 @@ class SpinHamiltonian(Crystal):
         Saying so the filtering will be performed for each given condition
         one by one.
         Note: this method is not modifying the instance at which it is called.
-        It will create a new instance with sorted :py:attr:`bonds` and all
-        the other attributes will be copied (through :py:func:`deepcopy`).
+        It will create a new instance with the copies of the selected bonds,
+        atoms and cell.
 
         Parameters
         ----------
@@ -838,17 +925,16 @@ class SpinHamiltonian(Crystal):
         Notes
         -----
         This method is not modifying the instance at which it is called.
-        It creates a new instance (through deepcopy).
         """
 
-        filtered_model = deepcopy(self)
-        filtered_model.filter(
-            max_distance=max_distance,
-            min_distance=min_distance,
-            template=template,
-            R_vector=R_vector,
+        return self._view(
+            self._filter_mask(
+                max_distance=max_distance,
+                min_distance=min_distance,
+                template=template,
+                R_vector=R_vector,
+            )
         )
-        return filtered_model
 
     # TODO rewrite with new template logic (J1 through getattr)
     def form_model(self, template):
@@ -924,7 +1010,7 @@ class SpinHamiltonian(Crystal):
         form_model: Modifies current object.
         """
 
-        new_model = deepcopy(self)
+        new_model = self.filtered(template=template)
         new_model.form_model(template=template)
         return new_model
 
@@ -966,24 +1052,155 @@ class SpinHamiltonian(Crystal):
         )
 
         energy = np.zeros((3, 3), dtype=float)
-        for atom1, atom2, R, J in self:
-            if self.spin_normalized:
-                energy += self.factor * J.matrix
-            else:
-                energy += self.factor * J.matrix * atom1.spin * atom2.spin
+        if len(self._bonds) != 0:
+            matrices = self._bonds.arrays()[3]
+            if not self.spin_normalized:
+                matrices = matrices * self._spin_products()[:, None, None]
+            energy = self.factor * np.sum(matrices, axis=0)
 
         energy = np.einsum("ni,ij,jn->n", spin_direction.T, energy, spin_direction)
         if len(energy) == 1:
             energy = energy[0]
         return energy
 
-    def input_for_magnons(self, nodmi=False, noaniso=False, custom_mask=None):
+    def find_spiral_ground_state(self, grid=(20, 20, 20), n=None, chunk_size=10000):
+        r"""
+        Search for the classical ground state among the planar spin spirals.
+
+        Luttinger-Tisza method for the spirals, which rotate in the plane
+        perpendicular to ``n`` (the spin configurations of :py:class:`.MagnonDispersion`).
+        Spin of the atom :math:`i` in the unit cell :math:`\boldsymbol{R}` is
+
+        .. math::
+
+            \boldsymbol{S}_i(\boldsymbol{R}) = S_i\left(
+            \cos(\boldsymbol{Q}\boldsymbol{R} + \varphi_i)\boldsymbol{e}_1 +
+            \sin(\boldsymbol{Q}\boldsymbol{R} + \varphi_i)\boldsymbol{e}_2\right)
+
+        where :math:`\boldsymbol{e}_1\times\boldsymbol{e}_2 = \boldsymbol{n}`.
+        Energy per unit cell is :math:`\boldsymbol{w}^{\dagger}\mathcal{J}(\boldsymbol{Q})\boldsymbol{w}`,
+        where :math:`w_i = e^{i\varphi_i}` and
+
+        .. math::
+
+            \mathcal{J}_{ij}(\boldsymbol{Q}) = S_iS_j\sum_{\boldsymbol{d}}
+            \boldsymbol{c}^{\dagger}\boldsymbol{J}_{ij}(\boldsymbol{d})\boldsymbol{c}\,
+            e^{i\boldsymbol{Q}\boldsymbol{d}},
+            \quad \boldsymbol{c} = \dfrac{\boldsymbol{e}_1 - i\boldsymbol{e}_2}{\sqrt{2}}
+
+        The lowest eigenvalue of :math:`\mathcal{J}(\boldsymbol{Q})` is computed on
+        the grid of :math:`\boldsymbol{Q}` over the whole Brillouin zone, then its minimum
+        is refined by the local optimizer with the analytic gradient.
+        Phases :math:`\varphi_i` are taken from the eigenvector.
+
+        Parameters
+        ----------
+        grid : (3,) tuple of int, default (20, 20, 20)
+            Amount of points along each reciprocal lattice vector
+            (Gamma-centered :py:func:`.monkhorst_pack` grid).
+        n : (3,) |array_like|_, optional
+            Normal to the plane of the spiral. By default it is the z axis.
+        chunk_size : int, default 10000
+            Amount of Q points, which are processed at once.
+
+        Returns
+        -------
+        Q : (3,) :numpy:`ndarray`
+            Ordering wave vector of the spiral.
+            In relative coordinates with respect to the reciprocal cell.
+        energy : float
+            Classical energy of the suggested spin configuration per unit cell.
+            Equal to the Luttinger-Tisza bound :math:`N\lambda_{min}`, if all
+            components of the eigenvector have the same absolute value.
+        spins : (N, 3) :numpy:`ndarray`
+            Spin vectors of the atoms from :py:attr:`.magnetic_atoms` in the
+            (0, 0, 0) unit cell. Ready to be used with :py:class:`.MagnonDispersion`
+            with the same ``Q`` and ``n``.
+
+        Notes
+        -----
+        Anisotropic exchange enters only through its projection on the plane of the spiral.
+        Energy does not include the terms, which average to zero for the incommensurate
+        spirals.
+        """
+
+        magnetic_atoms = self.magnetic_atoms
+        N = len(magnetic_atoms)
+        lengths = np.array([atom.spin for atom in magnetic_atoms], dtype=float)
+        J_matrices, indices_i, indices_j, dis_vectors = self.input_for_magnons(
+            notation="SpinW"
+        )
+
+        if n is None:
+            n = [0, 0, 1]
+        e1, e2, n = span_orthonormal_set(n)
+        c = (e1 - 1j * e2) / np.sqrt(2)
+        values = (
+            lengths[indices_i]
+            * lengths[indices_j]
+            * np.einsum("x,bxy,y->b", np.conjugate(c), J_matrices, c)
+        )
+        groups = group_bonds(indices_i, indices_j, N)
+
+        def fourier(Q, bond_values):
+            # Sum over the bonds for a stack of Q points in absolute coordinates
+            phases = np.exp(1j * (Q @ dis_vectors.T))
+            result = bond_sum(phases, bond_values, groups, N)
+            # Hermitian part defines the quadratic form
+            return (result + np.conjugate(np.swapaxes(result, 1, 2))) / 2
+
+        # Lowest eigenvalue over the grid
+        points = monkhorst_pack(grid, gamma_centered=True)
+        best = None
+        for start in range(0, len(points), chunk_size):
+            chunk = points[start : start + chunk_size]
+            lowest = np.linalg.eigvalsh(fourier(chunk @ self.reciprocal_cell, values))[
+                :, 0
+            ]
+            if best is None or lowest.min() < best[1]:
+                best = (chunk[np.argmin(lowest)], lowest.min())
+
+        # Refinement with the gradient from the Hellmann-Feynman theorem
+        gradient_values = 1j * values[:, None] * dis_vectors
+
+        def lowest(q):
+            Q = (q @ self.reciprocal_cell)[None, :]
+            eigenvalues, eigenvectors = np.linalg.eigh(fourier(Q, values))
+            u = eigenvectors[0, :, 0]
+            derivative = np.einsum(
+                "i,ijx,j->x",
+                np.conjugate(u),
+                fourier(Q, gradient_values)[0],
+                u,
+            ).real
+            return eigenvalues[0, 0], self.reciprocal_cell @ derivative
+
+        result = minimize(lowest, best[0], jac=True, method="L-BFGS-B")
+        q = result.x if result.fun <= best[1] else best[0]
+        q = q - np.round(q)
+
+        matrix = fourier((q @ self.reciprocal_cell)[None, :], values)[0]
+        u = np.linalg.eigh(matrix)[1][:, 0]
+        w = np.exp(1j * np.angle(u))
+        energy = np.einsum("i,ij,j->", np.conjugate(w), matrix, w).real
+        phi = np.angle(w)
+        spins = lengths[:, None] * (
+            np.cos(phi)[:, None] * e1[None, :] + np.sin(phi)[:, None] * e2[None, :]
+        )
+        return q, energy, spins
+
+    def input_for_magnons(
+        self, nodmi=False, noaniso=False, custom_mask=None, notation=None
+    ):
         r"""
         Input from the spin Hamiltonian.
 
-        This function prepare the list of exchange parameters to
+        This function prepare the arrays of exchange parameters to
         be used as an input for magnon dispersion calculation.
 
+        .. versionchanged:: 0.8.13 Returns :numpy:`ndarray` instead of lists.
+            Add ``notation`` parameter.
+
         Parameters
         ----------
         nodmi : bool, default=False
@@ -993,36 +1210,138 @@ class SpinHamiltonian(Crystal):
         custom_mask : func
             Custom mask for the exchange parameter. Function which take (3,3) numpy:`ndarray`
             as an input and returns (3,3) numpy:`ndarray` as an output.
+        notation : str or tuple of two bool and one float, optional
+            Notation, in which the exchange parameters are returned.
+            The Hamiltonian itself is not modified.
+            If ``None``, then current notation is used.
+            See :py:attr:`.notation` for details.
 
         Returns
         -------
-        Jij : list
-        i : list
-        j : list
-        dij : list
+        Jij : (M, 3, 3) :numpy:`ndarray`
+            Exchange matrices.
+        i : (M,) :numpy:`ndarray`
+            Indices of the first atom of the bond in :py:attr:`.magnetic_atoms`.
+        j : (M,) :numpy:`ndarray`
+            Indices of the second atom of the bond in :py:attr:`.magnetic_atoms`.
+        dij : (M, 3) :numpy:`ndarray`
+            Vectors of the unit cell of the second atom. In absolute coordinates.
         """
 
-        Jij = []
-        i = []
-        j = []
-        dij = []
         magnetic_atoms = self.magnetic_atoms
-        atom_index = dict([(atom, i) for i, atom in enumerate(magnetic_atoms)])
-        for atom1, atom2, R, J in self:
-            if custom_mask is not None:
-                result = custom_mask(J.matrix)
+
+        # Indices of the storage are mapped to the indices of the magnetic atoms
+        i, j, R, Jij = self._bonds.arrays()
+        lookup = np.zeros(len(self._bonds.atoms), dtype=int)
+        for index, atom in enumerate(magnetic_atoms):
+            lookup[self._bonds._atom_index[atom]] = index
+        Jij = np.array(Jij, dtype=float)
+        i = lookup[i]
+        j = lookup[j]
+        R = np.array(R, dtype=int)
+
+        if notation is not None:
+            Jij, i, j, R = self._convert_bonds(
+                Jij, i, j, R, magnetic_atoms, _parse_notation(notation)
+            )
+
+        if custom_mask is not None:
+            Jij = np.array([custom_mask(J) for J in Jij], dtype=float).reshape(
+                (-1, 3, 3)
+            )
+        else:
+            symm = (Jij + np.transpose(Jij, (0, 2, 1))) / 2
+            if nodmi:
+                Jij = symm
+            if noaniso:
+                iso = np.trace(symm, axis1=1, axis2=2) / 3
+                Jij = (
+                    Jij
+                    - symm
+                    + iso[:, None, None] * np.identity(3, dtype=float)[None, :, :]
+                )
+
+        return Jij, i, j, R @ self.cell
+
+    def _convert_bonds(self, Jij, i, j, R, atoms, notation):
+        r"""
+        Convert the arrays of the bonds to the new notation.
+
+        Follows the same logic as the setters of
+        :py:attr:`.double_counting`, :py:attr:`.spin_normalized` and :py:attr:`.factor`,
+        but does not modify the Hamiltonian.
+
+        Parameters
+        ----------
+        Jij : (M, 3, 3) :numpy:`ndarray`
+            Exchange matrices.
+        i : (M,) :numpy:`ndarray`
+            Indices of the first atom in ``atoms``.
+        j : (M,) :numpy:`ndarray`
+            Indices of the second atom in ``atoms``.
+        R : (M, 3) :numpy:`ndarray`
+            Unit cell of the second atom.
+        atoms : list of :py:class:`.Atom`
+            Atoms, to which ``i`` and ``j`` refer.
+        notation : tuple of two bool and one float
+            New notation.
+
+        Returns
+        -------
+        Jij : (K, 3, 3) :numpy:`ndarray`
+        i : (K,) :numpy:`ndarray`
+        j : (K,) :numpy:`ndarray`
+        R : (K, 3) :numpy:`ndarray`
+        """
+
+        double_counting, spin_normalized, factor = notation
+        onsite = (i == j) & (R == 0).all(axis=1)
+
+        # Position of the bond (j, i, -R) in the arrays, -1 if absent
+        rows = np.concatenate((i[:, None], j[:, None], R), axis=1)
+        reverse = _match_rows(
+            rows, np.concatenate((j[:, None], i[:, None], -R), axis=1)
+        )
+
+        if double_counting and self._double_counting is not True:
+            missing = ~onsite & (reverse == -1)
+            Jij = np.concatenate((Jij, np.transpose(Jij[missing], (0, 2, 1))))
+            i, j = np.concatenate((i, j[missing])), np.concatenate((j, i[missing]))
+            R = np.concatenate((R, -R[missing]))
+            onsite = np.concatenate((onsite, onsite[missing]))
+            if self._double_counting is not None:
+                Jij[~onsite] *= 0.5
+        elif not double_counting and self._double_counting is not False:
+            atom_indices = np.array([atom.index for atom in atoms], dtype=int)
+            forward = (
+                (R[:, 0] > 0)
+                | ((R[:, 0] == 0) & (R[:, 1] > 0))
+                | ((R[:, 0] == 0) & (R[:, 1] == 0) & (R[:, 2] > 0))
+                | ((R == 0).all(axis=1) & (atom_indices[i] <= atom_indices[j]))
+            )
+            # Backward bonds are kept (and flipped) only if the forward one is absent
+            flip = ~onsite & ~forward & (reverse == -1)
+            keep = onsite | forward | flip
+            Jij[flip] = np.transpose(Jij[flip], (0, 2, 1))
+            i, j = np.where(flip, j, i), np.where(flip, i, j)
+            R = np.where(flip[:, None], -R, R)
+            Jij, i, j, R, onsite = Jij[keep], i[keep], j[keep], R[keep], onsite[keep]
+            if self._double_counting is not None:
+                Jij[~onsite] *= 2
+
+        if self._spin_normalized is not None and self._spin_normalized != bool(
+            spin_normalized
+        ):
+            spins = np.array([atom.spin for atom in atoms], dtype=float)
+            if self._spin_normalized:
+                Jij = Jij / (spins[i] * spins[j])[:, None, None]
             else:
-                result = J.matrix
-                if nodmi:
-                    result -= J.dmi_matrix
-                if noaniso:
-                    result -= J.aniso
-            Jij.append(result)
-            i.append(atom_index[atom1])
-            j.append(atom_index[atom2])
-            dij.append(self.get_vector(atom1, atom1, R))
+                Jij = Jij * (spins[i] * spins[j])[:, None, None]
 
-        return Jij, i, j, dij
+        if self._factor is not None:
+            Jij = Jij * (self._factor / factor)
+
+        return Jij, i, j, R
 
 
 class ExchangeHamiltonian(SpinHamiltonian):
@@ -1031,20 +1350,109 @@ class ExchangeHamiltonian(SpinHamiltonian):
 
 class SpinHamiltonianIterator:
     def __init__(self, exchange_model: SpinHamiltonian) -> None:
-        self._bonds = list(
-            map(
-                lambda x: (x[0], x[1], x[2], exchange_model._bonds[x]),
-                exchange_model._bonds,
-            )
-        )
+        # Rows are fixed at the start, parameters are created on demand
+        self._storage = exchange_model._bonds
+        self._layout = self._storage.layout
+        self._keys = list(self._storage.keys)
         self._index = 0
 
     def __next__(self) -> Tuple[Atom, Atom, tuple, ExchangeParameter]:
-        if self._index < len(self._bonds):
-            result = self._bonds[self._index]
+        storage = self._storage
+        while self._index < len(self._keys):
+            key = self._keys[self._index]
             self._index += 1
-            return result
+            # Bonds, removed during the iteration, are skipped
+            if storage.layout == self._layout:
+                if key is None or storage.keys[self._index - 1] is None:
+                    continue
+                parameter = storage.get_row(self._index - 1)
+            elif key in storage:
+                parameter = storage.get(key)
+            else:
+                continue
+            return key[0], key[1], key[2], parameter
         raise StopIteration
 
     def __iter__(self):
         return self
+
+
+def _parse_notation(notation):
+    r"""
+    Interpret the notation.
+
+    Parameters
+    ----------
+    notation : str or tuple of two bool and one float
+        One of the predefined notations or tuple with custom notation.
+        See :py:attr:`.SpinHamiltonian.notation` for details.
+
+    Returns
+    -------
+    notation : tuple of two bool and one float
+        (double counting, spin normalized, factor).
+    """
+
+    # Set the notation from predefined notations
+    if isinstance(notation, str):
+        notation = notation.lower()
+        if notation not in PREDEFINED_NOTATIONS:
+            raise ValueError(
+                f"Predefine notations are: "
+                + f"{list(PREDEFINED_NOTATIONS)}, got: {notation}"
+            )
+        notation = PREDEFINED_NOTATIONS[notation]
+    # Set the notation from three values, converted to bool
+    elif isinstance(notation, Iterable) and len(notation) == 3:
+        notation = (
+            bool(notation[0]),
+            bool(notation[1]),
+            float(notation[2]),
+        )
+    else:
+        raise ValueError(
+            "New notation has to be either a string "
+            + "or an iterable with three elements, "
+            + f"got: {notation}"
+        )
+    return notation
+
+
+def _match_rows(rows, queries):
+    r"""
+    Find the positions of the queries among the rows.
+
+    Parameters
+    ----------
+    rows : (M, K) :numpy:`ndarray`
+        Integer rows. Expected to be unique.
+    queries : (L, K) :numpy:`ndarray`
+        Integer rows to look for.
+
+    Returns
+    -------
+    positions : (L,) :numpy:`ndarray`
+        Index of the matching row for each query, -1 if there is no match.
+    """
+
+    if len(rows) == 0 or len(queries) == 0:
+        return np.full(len(queries), -1, dtype=int)
+    combined = np.concatenate((rows, queries))
+    low = combined.min(axis=0)
+    span = combined.max(axis=0) - low + 1
+    # Each row is encoded by one integer, if possible, since sorting of
+    # the integers is much faster than sorting of the rows
+    if np.prod(span.astype(float)) < 2**62:
+        codes = np.ravel_multi_index(tuple((combined - low).T), tuple(span.tolist()))
+        row_codes, query_codes = codes[: len(rows)], codes[len(rows) :]
+        order = np.argsort(row_codes)
+        positions = np.minimum(
+            np.searchsorted(row_codes[order], query_codes), len(rows) - 1
+        )
+        found = row_codes[order][positions] == query_codes
+        return np.where(found, order[positions], -1)
+    _, inverse = np.unique(combined, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    lookup = np.full(inverse.max() + 1, -1, dtype=int)
+    lookup[inverse[: len(rows)]] = np.arange(len(rows))
+    return lookup[inverse[len(rows) :]]
@@ -92,6 +92,58 @@ def test_remove_atom():
         c.remove_atom("H", index=1)
 
 
+def test_atom_lookup():
+    c = Crystal()
+    atoms = [Atom(f"Fe{i % 10}", (i / 1000, 0, 0)) for i in range(1000)]
+    for atom in atoms:
+        c.add_atom(atom)
+    assert c.get_atom("Fe3", index=4) is atoms[3]
+    assert c.get_atom("Fe3__4") is atoms[3]
+    assert c.get_atom("Fe3", return_all=True) == atoms[3::10]
+    assert atoms[999] in c
+    assert Atom("Fe9", index=1000) in c
+    assert Atom("Fe9", index=1) not in c
+
+    c.remove_atom(atoms[3])
+    assert atoms[3] not in c
+    with pytest.raises(ValueError):
+        c.get_atom("Fe3", index=4)
+    assert len(c.get_atom("Fe3", return_all=True)) == 99
+
+    # Changes, which bypass add_atom and remove_atom
+    atoms[5].name = "Co"
+    assert c.get_atom("Co") is atoms[5]
+    c.atoms = atoms[:2]
+    assert atoms[2] not in c
+    c.atoms.append(atoms[2])
+    assert c.get_atom("Fe2") is atoms[2]
+
+
+def test_atom_lookup_rename():
+    c = Crystal()
+    atom = Atom("Fe", index=1)
+    c.add_atom(atom)
+    atom.name = "Co"
+    assert Atom("Co", index=1) in c
+    assert Atom("Fe", index=1) not in c
+    with pytest.raises(ValueError):
+        c.add_atom(Atom("Co", index=1))
+    atom.index = 2
+    assert Atom("Co", index=2) in c
+    assert Atom("Co", index=1) not in c
+
+    # Copies index their own atoms
+    from copy import deepcopy
+    import pickle
+
+    for copied in [deepcopy(c), pickle.loads(pickle.dumps(c))]:
+        copied_atom = copied.get_atom("Co")
+        copied_atom.name = "Ni"
+        assert Atom("Ni", index=2) in copied
+        assert Atom("Ni", index=2) not in c
+        assert Atom("Co", index=2) in c
+
+
 @given(
     st.text(min_size=1, max_size=10),
     st.lists(st.floats(min_value=0, max_value=1), min_size=3, max_size=3),
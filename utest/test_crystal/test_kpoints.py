@@ -1,8 +1,7 @@
 import pytest
-from radtools.crystal.kpoints import Kpoints
+from radtools.crystal.kpoints import Kpoints, monkhorst_pack
 import numpy as np
 
-
 points = {
     "G": [0, 0, 0],
     "K": [0.5, 0.5, 0],
@@ -215,3 +214,52 @@ def test_flatten_points(path, corr_flat_points):
         path=path,
     )
     assert (np.abs(kp.flatten_points(relative=True) - corr_flat_points) < 1e-5).all()
+
+
+@pytest.mark.parametrize("path, corr_flat_points", flat_point_input)
+def test_adaptive_points(path, corr_flat_points):
+    kp = Kpoints(
+        b1,
+        b2,
+        b3,
+        [points[i] for i in points],
+        names=[i for i in points],
+        n=4,
+        path=path,
+    )
+
+    # Linear parallel bands are not refined
+    def linear(kpoints):
+        band = kpoints[:, 0] + 2 * kpoints[:, 1]
+        return np.array([band, band + 1e-3])
+
+    adaptive, flatten_points, values = kp.adaptive_points(linear, relative=True)
+    assert (np.abs(adaptive - kp.points(relative=True)) < 1e-8).all()
+    assert (np.abs(flatten_points - corr_flat_points) < 1e-8).all()
+    assert (np.abs(values - linear(kp.points())) < 1e-8).all()
+
+    # Sharp peak is refined only around the peak
+    center = kp.points()[2]
+
+    def peak(kpoints):
+        return np.array([np.exp(-np.linalg.norm(kpoints - center, axis=1) ** 2 / 1e-3)])
+
+    adaptive, flatten_points, values = kp.adaptive_points(peak, max_depth=4)
+    assert len(adaptive) > len(kp.points())
+    assert (np.abs(values - peak(adaptive)) < 1e-8).all()
+    assert np.isclose(flatten_points[-1], kp.flatten_points()[-1])
+    assert (np.diff(flatten_points) >= 0).all()
+    refined = np.linalg.norm(adaptive - center, axis=1) < 0.3
+    assert refined.sum() > len(adaptive) - len(kp.points())
+
+
+def test_monkhorst_pack():
+    kpoints = monkhorst_pack((2, 3, 4))
+    assert kpoints.shape == (24, 3)
+    assert np.allclose(kpoints[:4, 2], [-0.375, -0.125, 0.125, 0.375])
+    assert np.allclose(kpoints.reshape((2, 3, 4, 3))[:, 0, 0, 0], [-0.25, 0.25])
+    assert np.allclose(kpoints.sum(axis=0), 0)
+    gamma = monkhorst_pack((2, 3, 4), gamma_centered=True)
+    assert np.allclose(gamma[0], 0)
+    with pytest.raises(ValueError):
+        monkhorst_pack((0, 1, 1))
@@ -4,6 +4,7 @@ import numpy as np
 import pytest
 
 from radtools.crystal.lattice import Lattice
+from radtools.crystal.kpoints import monkhorst_pack
 from radtools.geometry import parallelepiped_check
 import radtools.crystal.cell as Cell
 from radtools.crystal.constants import ABS_TOL, REL_TOL
@@ -13,6 +14,7 @@ from radtools.crystal.bravais_lattice.examples import lattice_example
 from radtools.crystal.constants import (
     BRAVAIS_LATTICE_VARIATIONS,
     BRAVAIS_LATTICE_NAMES,
+    HOLOHEDRY_ORDERS,
     PEARSON_SYMBOLS,
     MIN_LENGTH,
     MAX_LENGTH,
@@ -23,7 +25,6 @@ from radtools.crystal.constants import (
     ABS_TOL_ANGLE,
 )
 
-
 n_order = 5
 
 
@@ -193,6 +194,40 @@ def test_Lattice_classifications(variation: str):
     assert lattice.centring_type == lattice.pearson_symbol[1]
 
 
+@pytest.mark.parametrize(
+    "variation", BRAVAIS_LATTICE_VARIATIONS, ids=BRAVAIS_LATTICE_VARIATIONS
+)
+def test_irreducible_kpoints(variation: str):
+    lattice = lattice_example(variation)
+    operations = lattice.point_group()
+    assert len(operations) == HOLOHEDRY_ORDERS[lattice.type()]
+    assert (operations[0] == np.eye(3)).all()
+    metric = lattice.reciprocal_cell @ lattice.reciprocal_cell.T
+    for operation in operations:
+        assert np.allclose(operation @ metric @ operation.T, metric, rtol=1e-3)
+
+    kpoints, weights, mapping = lattice.irreducible_kpoints(
+        (4, 4, 4), relative=True, return_mapping=True
+    )
+    assert np.allclose(weights.sum(), 1)
+    assert len(kpoints) < 64
+    assert np.allclose(np.bincount(mapping) / 64, weights)
+    # Each point is equivalent to its irreducible point
+    full = monkhorst_pack((4, 4, 4))
+    for point, image in zip(full, kpoints[mapping]):
+        shifts = point @ operations - image
+        assert any(np.allclose(shift, np.round(shift)) for shift in shifts)
+
+
+def test_irreducible_kpoints_cubic():
+    lattice = lattice_example("CUB")
+    kpoints, weights = lattice.irreducible_kpoints((4, 4, 4), relative=True)
+    assert len(kpoints) == 4
+    assert np.allclose(sorted(weights * 64), [8, 8, 24, 24])
+    kpoints, weights = lattice.irreducible_kpoints((4, 4, 4), gamma_centered=True)
+    assert len(kpoints) == 10
+
+
 # legacy tests
 
 l = Lattice([1, 0, 0], [0, 2, 0], [0, 0, 3])
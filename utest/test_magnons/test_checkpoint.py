@@ -0,0 +1,62 @@
+import os
+
+import numpy as np
+import pytest
+
+from radtools.crystal.atom import Atom
+from radtools.crystal.bravais_lattice import lattice_example
+from radtools.magnons.checkpoint import resumable_omegas
+from radtools.magnons.dispersion import MagnonDispersion
+from radtools.spinham.hamiltonian import SpinHamiltonian
+
+
+def _dispersion(J=1):
+    model = SpinHamiltonian(lattice=lattice_example("CUB"))
+    model.add_atom(Atom("Fe", (0, 0, 0), spin=[0, 0, 1]))
+    for R in [(1, 0, 0), (0, 1, 0), (0, 0, 1)]:
+        model.add_bond("Fe", "Fe", R, iso=J)
+    model.notation = "standard"
+    return MagnonDispersion(model)
+
+
+def test_resumable_omegas(tmp_path):
+    dispersion = _dispersion()
+    kpoints = np.random.default_rng(0).random((23, 3)) * 3
+    directory = str(tmp_path / "run")
+    omegas = resumable_omegas(dispersion, kpoints, directory, chunk_size=5)
+    assert np.allclose(omegas, dispersion.omegas(kpoints))
+    assert sorted(os.listdir(directory)) == [
+        "chunk_0.npy",
+        "chunk_1.npy",
+        "chunk_2.npy",
+        "chunk_3.npy",
+        "chunk_4.npy",
+        "manifest.json",
+    ]
+
+    # Interrupted run: only the missing chunk is computed again
+    os.remove(os.path.join(directory, "chunk_3.npy"))
+    # Finished chunks are marked by an old modification time
+    for name in os.listdir(directory):
+        os.utime(os.path.join(directory, name), ns=(0, 0))
+    assert np.allclose(
+        resumable_omegas(dispersion, kpoints, directory, chunk_size=5), omegas
+    )
+    rewritten = [
+        name
+        for name in sorted(os.listdir(directory))
+        if os.stat(os.path.join(directory, name)).st_mtime_ns != 0
+    ]
+    assert rewritten == ["chunk_3.npy"]
+
+
+def test_resumable_omegas_other_calculation(tmp_path):
+    kpoints = np.random.default_rng(1).random((10, 3))
+    directory = str(tmp_path / "run")
+    resumable_omegas(_dispersion(), kpoints, directory, chunk_size=4)
+    with pytest.raises(ValueError):
+        resumable_omegas(_dispersion(J=2), kpoints, directory, chunk_size=4)
+    with pytest.raises(ValueError):
+        resumable_omegas(_dispersion(), kpoints, directory, chunk_size=3)
+    with pytest.raises(ValueError):
+        resumable_omegas(_dispersion(), kpoints[:-1], directory, chunk_size=4)
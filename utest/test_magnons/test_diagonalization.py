@@ -1,7 +1,14 @@
 import pytest
 import numpy as np
 
-from radtools.magnons.diagonalization import solve_via_colpa, ColpaFailed
+from radtools.magnons.diagonalization import (
+    ColpaFailed,
+    _cholesky_bisection,
+    paraunitary_inverse,
+    solve_via_colpa,
+    solve_via_colpa_batched,
+    solve_via_colpa_sparse,
+)
 
 from hypothesis import given, strategies as st
 from hypothesis.extra.numpy import arrays as harrays
@@ -41,3 +48,67 @@ def test_solve_via_colpa(D):
 def test_fail_via_colpa(D):
     with pytest.raises(ColpaFailed):
         solve_via_colpa(D)
+
+
+def test_solve_via_colpa_batched():
+    D = np.array(
+        [
+            [[2, 0.1, 1, 0], [0.1, 2, 0, 1], [1, 0, 2, 0.1], [0, 1, 0.1, 2]],
+            np.diag([1, 2, 2, 1]),
+            [[1, 0, 0, 0], [0, 0, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]],
+            [[3, 1j, 0.5, 0], [-1j, 3, 0, 0.5], [0.5, 0, 3, -1j], [0, 0.5, 1j, 3]],
+        ]
+    )
+    E, G, failed = solve_via_colpa_batched(D, return_G=True)
+    assert E.shape == (4, 4)
+    assert G.shape == (4, 4, 4)
+    assert (failed == [False, False, True, False]).all()
+    assert np.isnan(E[2]).all()
+    for i in [0, 1, 3]:
+        E_single, G_single = solve_via_colpa(D[i])
+        assert np.allclose(E[i], E_single)
+        assert np.allclose(
+            np.diag(E[i]),
+            np.linalg.inv(np.conjugate(G[i]).T) @ D[i] @ np.linalg.inv(G[i]),
+        )
+    E_only, failed_only = solve_via_colpa_batched(D)
+    assert np.allclose(E_only[~failed_only], E[~failed])
+    T = paraunitary_inverse(G[~failed])
+    assert np.allclose(T @ G[~failed], np.eye(4))
+
+
+def test_solve_via_colpa_batched_failures():
+    generator = np.random.default_rng(3)
+    A = generator.normal(size=(50, 6, 6)) + 1j * generator.normal(size=(50, 6, 6))
+    D = A @ np.conjugate(np.transpose(A, (0, 2, 1))) + 0.1 * np.eye(6)
+    # Indefinite and semi-definite matrices
+    D[[3, 17, 18, 40]] -= 100 * np.eye(6)
+    D[25] = np.diag([1, 0, 1, 1, 1, 1])
+    E, failed = solve_via_colpa_batched(D)
+    assert (np.flatnonzero(failed) == [3, 17, 18, 25, 40]).all()
+    assert np.isnan(E[failed]).all()
+    for i in np.flatnonzero(~failed):
+        assert np.allclose(E[i], solve_via_colpa(D[i])[0])
+
+    K, failed = _cholesky_bisection(D)
+    assert (np.flatnonzero(failed) == [3, 17, 18, 25, 40]).all()
+    assert np.allclose(
+        K[~failed] @ np.conjugate(np.transpose(K[~failed], (0, 2, 1))), D[~failed]
+    )
+
+
+def test_solve_via_colpa_sparse():
+    rng = np.random.default_rng(7)
+    N = 40
+    X = rng.normal(size=(2 * N, 2 * N)) + 1j * rng.normal(size=(2 * N, 2 * N))
+    D = X @ np.conjugate(X).T / N + np.eye(2 * N)
+    E, T = solve_via_colpa_sparse(D, n_modes=4, return_G=True)
+    E_dense = solve_via_colpa_batched([D])[0][0]
+    assert np.allclose(E, np.sort(E_dense[:N])[:4])
+    g = np.diag(np.concatenate((np.ones(N), -np.ones(N))))
+    # T_n are the eigenvectors of gD
+    assert np.allclose(g @ D @ T, T * E[None, :])
+    assert np.allclose(np.einsum("in,ij,jn->n", np.conjugate(T), g, T), 1)
+
+    with pytest.raises(ColpaFailed):
+        solve_via_colpa_sparse(-D, n_modes=4)
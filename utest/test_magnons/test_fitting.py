@@ -0,0 +1,128 @@
+import numpy as np
+
+from radtools.crystal.atom import Atom
+from radtools.crystal.bravais_lattice import lattice_example
+from radtools.magnons.dispersion import MagnonDispersion
+from radtools.magnons.fitting import fit_exchange
+from radtools.spinham.hamiltonian import SpinHamiltonian
+from radtools.spinham.template import ExchangeTemplate
+
+
+def _model():
+    model = SpinHamiltonian(lattice=lattice_example("ORC"))
+    model.add_atom(Atom("Fe1", (0, 0, 0), spin=[0, 0, 2]))
+    model.add_atom(Atom("Fe2", (0.5, 0.5, 0.5), spin=[0, 0, 2]))
+    model.notation = "standard"
+    template = ExchangeTemplate()
+    for index, (atom1, atom2, R, iso, dmi) in enumerate(
+        [
+            ("Fe1", "Fe1", (1, 0, 0), -1, 0.1),
+            ("Fe2", "Fe2", (1, 0, 0), -0.9, 0.05),
+            ("Fe1", "Fe2", (0, 0, 0), -0.5, 0),
+            ("Fe1", "Fe1", (0, 1, 0), -0.2, 0),
+        ]
+    ):
+        model.add_bond(atom1, atom2, R, iso=iso, dmi=(0, 0, dmi))
+        template.names[f"J{index + 1}"] = [
+            (atom1, atom2, R),
+            (atom2, atom1, tuple(-x for x in R)),
+        ]
+    # Family with two bonds
+    model.add_bond("Fe2", "Fe2", (0, 1, 0), iso=-0.3)
+    template.names["J4"].extend([("Fe2", "Fe2", (0, 1, 0)), ("Fe2", "Fe2", (0, -1, 0))])
+    return model, template
+
+
+def test_parameter_gradients():
+    model, template = _model()
+    dispersion = MagnonDispersion(model, template=template)
+    assert [dispersion.has_dmi(family) for family in dispersion.families] == [
+        True,
+        True,
+        False,
+        False,
+    ]
+    kpoints = np.random.default_rng(0).random((7, 3)) * 3
+    omegas, gradients = dispersion.parameter_gradients(kpoints)
+    assert gradients.shape == (2, 7, 4, 2)
+    assert np.allclose(omegas, dispersion.omegas(kpoints))
+    dispersion.precompute(kpoints)
+    assert np.allclose(dispersion.parameter_gradients(kpoints)[1], gradients)
+    step = 1e-6
+    for index, family in enumerate(dispersion.families):
+        for part in range(2):
+            scale = [1.0, 1.0]
+            scale[part] += step
+            dispersion.update_parameters({family: tuple(scale)})
+            difference = (dispersion.omegas(kpoints) - omegas) / step
+            dispersion.update_parameters({family: 1.0})
+            assert np.allclose(difference, gradients[:, :, index, part], atol=1e-4)
+
+
+def test_fit_exchange():
+    model, template = _model()
+    reference = MagnonDispersion(model.formed_model(template), template=template)
+    scales = {"J1": (1.2, 0.6), "J2": (0.9, 1.5), "J3": (1.1, 1), "J4": (0.7, 1)}
+    reference.update_parameters(scales)
+    kpoints = np.random.default_rng(1).random((100, 3)) * 3
+    omegas = reference.omegas(kpoints)
+
+    data_kpoints = np.concatenate((kpoints, kpoints))
+    data_energies = omegas.flatten()
+    for bands in [None, np.repeat([0, 1], 100)]:
+        fitted_model, result = fit_exchange(
+            model, template, data_kpoints, data_energies, bands=bands
+        )
+        assert result.success
+        for family in scales:
+            assert np.allclose(result.parameters[family], scales[family])
+        assert np.allclose(MagnonDispersion(fitted_model).omegas(kpoints), omegas)
+
+    # Initial model is not modified
+    assert np.allclose(model["Fe1", "Fe1", (1, 0, 0)].iso, -1)
+
+
+def _spiral_model(scales):
+    model = SpinHamiltonian(lattice=lattice_example("TET"))
+    model.add_atom(Atom("Fe1", (0, 0, 0), spin=[0, 0, 1.5]))
+    model.add_atom(Atom("Fe2", (0.5, 0, 0), spin=[0, 0, 1.5]))
+    model.notation = "standard"
+    for (atom1, atom2, R), (iso, dmi) in zip(
+        [("Fe1", "Fe2", (0, 0, 0)), ("Fe2", "Fe1", (1, 0, 0))], scales
+    ):
+        model.add_bond(atom1, atom2, R, iso=iso, dmi=(0, 0, 0.3 * dmi))
+    model.add_bond("Fe1", "Fe1", (1, 0, 0), iso=0.2)
+    return model
+
+
+def test_fit_exchange_spiral():
+    template = ExchangeTemplate()
+    template.names = {
+        "J1": [("Fe1", "Fe2", (0, 0, 0)), ("Fe2", "Fe1", (0, 0, 0))],
+        "J2": [("Fe2", "Fe1", (1, 0, 0)), ("Fe1", "Fe2", (-1, 0, 0))],
+        "J3": [("Fe1", "Fe1", (1, 0, 0)), ("Fe1", "Fe1", (-1, 0, 0))],
+    }
+    # Reference is computed from the spin Hamiltonian with the scaled parameters
+    reference = _spiral_model([(1.1, 1.3), (0.9, 0.7)])
+    Q, energy, spins = reference.find_spiral_ground_state(n=[0, 0, 1])
+    model = _spiral_model([(1, 1), (1, 1)])
+    for atom, reference_atom, spin in zip(
+        model.magnetic_atoms, reference.magnetic_atoms, spins
+    ):
+        atom.spin_vector = spin
+        reference_atom.spin_vector = spin
+    kpoints = np.random.default_rng(2).random((60, 3)) * 2
+    omegas = MagnonDispersion(reference, Q=Q, n=[0, 0, 1]).omegas(kpoints)
+
+    fitted_model, result = fit_exchange(
+        model,
+        template,
+        np.concatenate((kpoints, kpoints)),
+        omegas.flatten(),
+        Q=Q,
+        n=[0, 0, 1],
+    )
+    assert result.success
+    assert np.allclose(
+        MagnonDispersion(fitted_model, Q=Q, n=[0, 0, 1]).omegas(kpoints), omegas
+    )
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from radtools.magnons.integration import broaden, gaussian_dos, tetrahedron_dos
+
+
+@pytest.mark.parametrize("kernel", ["lorentzian", "gaussian"])
+def test_broaden(kernel):
+    energies = np.linspace(-50, 50, 100001)
+    spectra = broaden([[0, 1], [2, np.nan]], [[1, 2], [3, 4]], energies, 0.1, kernel)
+    assert spectra.shape == (2, len(energies))
+    assert np.allclose(spectra.sum(axis=1) * 1e-3, [3, 3], rtol=1e-2)
+    assert energies[np.argmax(spectra[1])] == pytest.approx(2)
+    with pytest.raises(ValueError):
+        broaden([[0]], [[1]], energies, 0.1, "voigt")
+
+
+def test_gaussian_dos():
+    energies = np.linspace(-5, 5, 1001)
+    dos = gaussian_dos([[0, 1], [np.nan, 1]], energies, 0.1, weights=[1, 2])
+    assert np.sum(dos) * 0.01 == pytest.approx(4)
+
+
+def test_tetrahedron_dos():
+    energies = np.linspace(-1, 5, 6001)
+    dos = tetrahedron_dos([[0, 1, 2, 4], [0, 0.5, 3, 3.5]], energies)
+    # Each tetrahedron contributes with the weight 1
+    assert np.sum(dos) * 1e-3 == pytest.approx(2, rel=1e-3)
+    assert (dos[energies < 0] == 0).all()
+    assert (dos[energies > 4] == 0).all()
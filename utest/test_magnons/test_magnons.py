@@ -5,7 +5,9 @@ import numpy as np
 from radtools.magnons.dispersion import MagnonDispersion
 from radtools.spinham.hamiltonian import SpinHamiltonian
 from radtools.spinham.parameter import ExchangeParameter
+from radtools.spinham.template import ExchangeTemplate
 from radtools.crystal.bravais_lattice import lattice_example
+from radtools.crystal.kpoints import monkhorst_pack
 from radtools.crystal.atom import Atom
 from math import cos
 
@@ -40,3 +42,404 @@ def test_ferromagnetic():
         )
 
     assert np.allclose(computed_omegas, analytical_omegas)
+
+
+def _two_sublattice_model():
+    model = SpinHamiltonian(lattice=lattice_example("TET"))
+    Cr1 = Atom("Cr1", (0, 0, 0), spin=[0, 0, 1.5])
+    Cr2 = Atom("Cr2", (0.5, 0.5, 0.5), spin=[0, 0, 1.5])
+    model.add_atom(Cr1)
+    model.add_atom(Cr2)
+    model.notation = "standard"
+    model.add_bond(Cr1, Cr1, (1, 0, 0), iso=1, dmi=(0, 0, 0.1))
+    model.add_bond(
+        Cr2, Cr2, (0, 1, 0), iso=1.2, aniso=[[0, 0, 0], [0, 0, 0], [0, 0, 0.05]]
+    )
+    model.add_bond(Cr1, Cr2, (0, 0, 0), iso=0.5, dmi=(0.02, 0, 0))
+    model.add_bond(Cr1, Cr2, (-1, 0, 0), iso=0.3)
+    model.add_bond(Cr2, Cr1, (0, 0, 1), iso=0.4)
+    return model
+
+
+def test_batched_matrices():
+    dispersion = MagnonDispersion(_two_sublattice_model())
+    kpoints = np.random.default_rng(0).random((7, 3)) * 4
+    J = dispersion.J(kpoints)
+    A = dispersion.A(kpoints)
+    B = dispersion.B(kpoints)
+    h = dispersion.h(kpoints)
+    assert J.shape == (7, 2, 2, 3, 3)
+    assert h.shape == (7, 4, 4)
+    for i, k in enumerate(kpoints):
+        reference = np.zeros((2, 2, 3, 3), dtype=complex)
+        for index in range(len(dispersion.J_matrices)):
+            reference[
+                dispersion.indices_i[index], dispersion.indices_j[index]
+            ] += dispersion.J_matrices[index] * np.exp(
+                -1j * (k @ dispersion.dis_vectors[index])
+            )
+        assert np.allclose(J[i], reference)
+        assert np.allclose(J[i], dispersion.J(k))
+        assert np.allclose(A[i], dispersion.A(k))
+        assert np.allclose(B[i], dispersion.B(k))
+        assert np.allclose(h[i], dispersion.h(k))
+        assert np.allclose(h[i], np.conjugate(h[i]).T)
+
+
+def test_batched_omegas():
+    dispersion = MagnonDispersion(_two_sublattice_model())
+    kpoints = np.random.default_rng(1).random((11, 3)) * 4
+    omegas = dispersion.omegas(kpoints, chunk_size=3)
+    assert omegas.shape == (2, 11)
+    for i, k in enumerate(kpoints):
+        assert np.allclose(omegas[:, i], dispersion.omega(k))
+    all_omegas, G, failed = dispersion.diagonalize(dispersion.h(kpoints), return_G=True)
+    assert not failed.any()
+    assert np.allclose(all_omegas[:, :2].T, omegas)
+    for i in range(len(kpoints)):
+        assert np.allclose(
+            np.diag(all_omegas[i]),
+            np.linalg.inv(np.conjugate(G[i]).T)
+            @ dispersion.h(kpoints[i])
+            @ np.linalg.inv(G[i]),
+        )
+
+
+def test_omegas_workers():
+    dispersion = MagnonDispersion(_two_sublattice_model())
+    kpoints = np.random.default_rng(2).random((25, 3)) * 4
+    assert np.allclose(
+        dispersion.omegas(kpoints, chunk_size=4, workers=2),
+        dispersion.omegas(kpoints),
+    )
+
+
+def test_from_arrays():
+    model = _two_sublattice_model()
+    dispersion = MagnonDispersion(model, Q=[0.1, 0, 0])
+    J_matrices, indices_i, indices_j, dis_vectors = model.input_for_magnons(
+        notation="SpinW"
+    )
+    # Model is not modified
+    assert model.notation == (True, False, -1)
+    from_arrays = MagnonDispersion.from_arrays(
+        J_matrices,
+        indices_i,
+        indices_j,
+        dis_vectors,
+        spins=[atom.spin_vector for atom in model.magnetic_atoms],
+        Q=np.array([0.1, 0, 0]) @ model.reciprocal_cell,
+    )
+    kpoints = np.random.default_rng(3).random((9, 3))
+    assert np.allclose(from_arrays.omegas(kpoints), dispersion.omegas(kpoints))
+
+
+def _random_chain(length, anisotropy, seed=0):
+    # Ferromagnetic supercell of the chain with random exchange, SpinW notation
+    rng = np.random.default_rng(seed)
+    J_matrices, indices_i, indices_j, dis_vectors = [], [], [], []
+    for i in range(length):
+        j = (i + 1) % length
+        R = [1, 0, 0] if j == 0 else [0, 0, 0]
+        J = -rng.uniform(0.5, 1.5) * np.eye(3)
+        J_matrices.extend([J, J])
+        indices_i.extend([i, j])
+        indices_j.extend([j, i])
+        dis_vectors.extend([R, [-x for x in R]])
+        J_matrices.append(np.diag([0, 0, -anisotropy]))
+        indices_i.append(i)
+        indices_j.append(i)
+        dis_vectors.append([0, 0, 0])
+    return MagnonDispersion.from_arrays(
+        J_matrices,
+        indices_i,
+        indices_j,
+        dis_vectors,
+        spins=np.tile([0, 0, 1.5], (length, 1)),
+    )
+
+
+def test_sparse_h():
+    dispersion = MagnonDispersion(_two_sublattice_model(), Q=[0.1, 0, 0])
+    for k in np.random.default_rng(4).random((5, 3)) * 4:
+        assert np.allclose(dispersion.sparse_h(k).toarray(), dispersion.h(k))
+
+
+@pytest.mark.parametrize("anisotropy", [0.1, 0])
+def test_lowest_omegas(anisotropy):
+    dispersion = _random_chain(60, anisotropy)
+    kpoints = [[0, 0, 0], [0.7, 0, 0], [3, 0, 0]]
+    lowest = dispersion.lowest_omegas(kpoints, n_modes=4)
+    assert lowest.shape == (3, 4)
+    assert np.allclose(
+        lowest, np.sort(dispersion.omegas(kpoints), axis=0)[:4].T, atol=1e-6
+    )
+
+
+def _decoupled_chains():
+    # Two chains without coupling, bands cross each other
+    return MagnonDispersion.from_arrays(
+        [-np.eye(3), -np.eye(3), -0.3 * np.eye(3), -0.3 * np.eye(3)]
+        + [np.diag([0, 0, -0.5])],
+        [0, 0, 1, 1, 1],
+        [0, 0, 1, 1, 1],
+        [[1, 0, 0], [-1, 0, 0], [1, 0, 0], [-1, 0, 0], [0, 0, 0]],
+        spins=[[0, 0, 1], [0, 0, 1]],
+    )
+
+
+def test_connected_omegas():
+    dispersion = _decoupled_chains()
+    kpoints = np.linspace([0, 0, 0], [np.pi, 0, 0], 41)
+    omegas, permutations, G = dispersion.connected_omegas(
+        kpoints, chunk_size=7, return_G=True
+    )
+    assert omegas.shape == (2, 41)
+    assert permutations.shape == (41, 4)
+    assert G.shape == (41, 4, 4)
+    first = 4 * (1 - np.cos(kpoints[:, 0]))
+    second = 1.2 * (1 - np.cos(kpoints[:, 0])) + 1
+    # Sorted energies swap the branches at the crossing
+    assert not np.allclose(dispersion.omegas(kpoints), [first, second])
+    assert np.allclose(omegas, [first, second]) or np.allclose(omegas, [second, first])
+    for i, k in enumerate(kpoints):
+        sorted_omegas, sorted_G = dispersion.omega(k, return_G=True)
+        assert np.allclose(sorted_omegas[permutations[i]][:2], omegas[:, i])
+        assert np.allclose(sorted_G[permutations[i]], G[i])
+
+    reference = dispersion.connected_omegas(kpoints)
+    assert np.allclose(reference[0], omegas)
+    assert (reference[1] == permutations).all()
+
+
+@pytest.mark.parametrize("gamma_centered", [False, True])
+def test_grid_omegas(tmp_path, gamma_centered):
+    model = _two_sublattice_model()
+    dispersion = MagnonDispersion(model)
+    kpoints = monkhorst_pack((4, 3, 5), gamma_centered) @ model.reciprocal_cell
+    reference = dispersion.omegas(kpoints).T.reshape((4, 3, 5, 2))
+
+    omegas = dispersion.grid_omegas((4, 3, 5), gamma_centered, chunk_size=7)
+    assert omegas.dtype == np.float32
+    assert np.allclose(omegas, reference, rtol=1e-5)
+    assert dispersion.omegas(kpoints, dtype=np.float32).dtype == np.float32
+
+    filename = str(tmp_path / "omegas.npy")
+    omegas, G = dispersion.grid_omegas(
+        (4, 3, 5),
+        gamma_centered,
+        filename=filename,
+        dtype=np.float64,
+        return_G=True,
+        chunk_size=7,
+    )
+    assert G.dtype == np.complex128
+    assert np.allclose(np.load(filename), reference)
+    stored_G = np.load(str(tmp_path / "omegas_G.npy"), mmap_mode="r")
+    assert stored_G.shape == (4, 3, 5, 4, 4)
+    assert np.allclose(
+        stored_G[1, 2, 3], dispersion.omega(kpoints[28], return_G=True)[1]
+    )
+
+
+def _two_sublattice_template():
+    template = ExchangeTemplate()
+    template.names = {
+        "J1": [
+            ("Cr1", "Cr1", (1, 0, 0)),
+            ("Cr1", "Cr1", (-1, 0, 0)),
+            ("Cr2", "Cr2", (0, 1, 0)),
+            ("Cr2", "Cr2", (0, -1, 0)),
+        ],
+        "J2": [("Cr1", "Cr2", (0, 0, 0)), ("Cr2", "Cr1", (0, 0, 0))],
+    }
+    return template
+
+
+@pytest.mark.parametrize("Q", [None, [0.1, 0.05, 0]])
+def test_update_parameters(Q):
+    dispersion = MagnonDispersion(
+        _two_sublattice_model(), Q=Q, template=_two_sublattice_template()
+    )
+    assert dispersion.families == ["J1", "J2"]
+    kpoints = np.random.default_rng(4).random((13, 3)) * 4
+    initial = dispersion.omegas(kpoints)
+    dispersion.precompute(kpoints)
+    assert np.allclose(dispersion.omegas(kpoints, chunk_size=5), initial)
+
+    dispersion.update_parameters({"J1": 1.3, "J2": (0.7, 2.0)})
+    assert dispersion.parameters == {"J1": (1.3, 1.3), "J2": (0.7, 2.0)}
+    cached = dispersion.omegas(kpoints)
+    dispersion.precompute(None)
+    assert np.allclose(dispersion.omegas(kpoints), cached)
+
+    model = _two_sublattice_model()
+    for atom1, atom2, R, J in model:
+        if atom1 == atom2:
+            J.matrix = J.matrix * 1.3
+        elif R == (0, 0, 0):
+            J.matrix = J.symm_matrix * 0.7 + J.asymm_matrix * 2.0
+    assert np.allclose(MagnonDispersion(model, Q=Q).omegas(kpoints), cached)
+
+    with pytest.raises(ValueError):
+        dispersion.update_parameters({"J3": 1})
+
+
+def test_update_parameters_spiral():
+    # J1 connects the atoms from different unit cells,
+    # hence its exchange matrices are rotated by the spiral
+    Q = [0.1, 0.05, 0]
+    dispersion = MagnonDispersion(
+        _two_sublattice_model(), Q=Q, template=_two_sublattice_template()
+    )
+    dispersion.update_parameters({"J1": (0.6, 1.8)})
+
+    model = _two_sublattice_model()
+    for atom1, atom2, R, J in model:
+        if atom1 == atom2:
+            J.matrix = J.symm_matrix * 0.6 + J.asymm_matrix * 1.8
+    reference = MagnonDispersion(model, Q=Q)
+    kpoints = np.random.default_rng(5).random((13, 3)) * 4
+    assert np.allclose(dispersion.J_matrices, reference.J_matrices)
+    assert np.allclose(dispersion.omegas(kpoints), reference.omegas(kpoints))
+
+
+@pytest.mark.parametrize("Q", [None, [0.1, 0.05, 0]])
+def test_velocities(Q):
+    dispersion = MagnonDispersion(_two_sublattice_model(), Q=Q)
+    kpoints = np.random.default_rng(4).random((6, 3)) * 2
+    omegas, velocities = dispersion.velocities(kpoints, chunk_size=4)
+    assert velocities.shape == (2, 6, 3)
+    assert np.allclose(omegas, dispersion.omegas(kpoints))
+    step = 1e-6
+    for alpha in range(3):
+        shift = step * np.eye(3)[alpha]
+        finite = (
+            dispersion.omegas(kpoints + shift) - dispersion.omegas(kpoints - shift)
+        ) / (2 * step)
+        assert np.allclose(velocities[:, :, alpha], finite, atol=1e-6)
+
+
+def test_adaptive_omegas():
+    model = _two_sublattice_model()
+    dispersion = MagnonDispersion(model)
+    kp = model.kpoints
+    kp.n = 5
+    points, flatten_points, omegas = dispersion.adaptive_omegas(kp)
+    assert len(points) > len(kp.points())
+    assert len(flatten_points) == len(points)
+    assert np.allclose(omegas, dispersion.omegas(points))
+
+
+def test_dos():
+    dispersion = MagnonDispersion(_two_sublattice_model())
+    energies = np.linspace(0, 20, 1001)
+    _, tetrahedron = dispersion.dos((8, 8, 8), energies=energies)
+    _, gaussian = dispersion.dos((8, 8, 8), energies=energies, method="gaussian")
+    # Normalized to the amount of bands
+    assert abs(np.sum(tetrahedron) * 0.02 - 2) < 1e-2
+    assert abs(np.sum(gaussian) * 0.02 - 2) < 1e-2
+    # Mean energies agree
+    assert (
+        abs(np.sum(tetrahedron * energies) - np.sum(gaussian * energies)) * 0.02 < 5e-2
+    )
+    # Amount of energies as a numpy integer
+    energies, dos = dispersion.dos((4, 4, 4), energies=np.int64(50))
+    assert energies.shape == dos.shape == (50,)
+    with pytest.raises(ValueError):
+        dispersion.dos((2, 2, 2), method="histogram")
+
+
+def test_dos_irreducible():
+    model = SpinHamiltonian(lattice=lattice_example("CUB"))
+    Fe = Atom("Fe", (0, 0, 0), spin=[0, 0, 2])
+    model.add_atom(Fe)
+    model.notation = "standard"
+    for R in [(1, 0, 0), (0, 1, 0), (0, 0, 1)]:
+        model.add_bond(Fe, Fe, R, iso=1)
+    dispersion = MagnonDispersion(model)
+    energies = np.linspace(0, 60, 301)
+    for method in ["tetrahedron", "gaussian"]:
+        _, full = dispersion.dos((6, 6, 6), energies=energies, method=method)
+        _, reduced = dispersion.dos(
+            (6, 6, 6), energies=energies, method=method, lattice=model
+        )
+        assert np.allclose(full, reduced)
+
+
+def _chain(cells):
+    # Ferromagnetic chain with DMI along the spins (non-reciprocal),
+    # in the cell with one or two atoms
+    J = -np.eye(3) + np.array([[0, 0.3, 0], [-0.3, 0, 0], [0, 0, -0.1]])
+    x = np.array([1.0, 0, 0])
+    if cells == 1:
+        return MagnonDispersion.from_arrays(
+            [J, J.T], [0, 0], [0, 0], [x, -x], [[0, 0, 1.5]]
+        )
+    return MagnonDispersion.from_arrays(
+        [J, J.T, J, J.T],
+        [0, 0, 1, 1],
+        [1, 1, 0, 0],
+        [0 * x, -2 * x, 2 * x, 0 * x],
+        [[0, 0, 1.5], [0, 0, 1.5]],
+        positions=[[0, 0, 0], [1, 0, 0]],
+    )
+
+
+def test_structure_factor():
+    single = _chain(1)
+    double = _chain(2)
+    qpoints = np.array([[0.37, 0.2, 0.1], [2.1, 0.3, -0.4], [-1.3, 0, 0.5]])
+    energies = np.linspace(-1, 12, 1301)
+    result = single.structure_factor(qpoints, energies, broadening=0.02, chunk_size=2)
+    assert result.shape == (3, 1301)
+    # Same spectra in the doubled cell
+    assert np.allclose(
+        result, double.structure_factor(qpoints, energies, broadening=0.02) / 2
+    )
+    # Peaks at omega(q), not omega(-q)
+    assert np.allclose(
+        energies[np.argmax(result, axis=1)], single.omegas(qpoints)[0], atol=0.01
+    )
+    # Poles and weights before the broadening
+    centers, weights = single.one_magnon(qpoints)
+    assert np.allclose(centers[:, 0], single.omegas(qpoints)[0])
+    assert np.allclose(
+        weights[:, 0], 0.75 * (1 + qpoints[:, 2] ** 2 / np.sum(qpoints**2, axis=1))
+    )
+    # Sum rule of the ferromagnet: S / 2 * (1 + q_z^2 / q^2)
+    for kernel in ["lorentzian", "gaussian"]:
+        total = single.structure_factor(
+            qpoints, np.linspace(-300, 300, 60001), broadening=0.1, kernel=kernel
+        ).sum(axis=1)
+        assert np.allclose(
+            total * 0.01,
+            0.75 * (1 + qpoints[:, 2] ** 2 / np.sum(qpoints**2, axis=1)),
+            rtol=1e-3,
+        )
+
+
+def test_spiral_ground_state_is_stable():
+    model = SpinHamiltonian(lattice=lattice_example("TET"))
+    model.add_atom(Atom("Fe1", (0, 0, 0), spin=[0, 0, 1.5]))
+    model.add_atom(Atom("Fe2", (0.5, 0, 0), spin=[0, 0, 1.5]))
+    model.notation = "standard"
+    model.add_bond("Fe1", "Fe2", (0, 0, 0), iso=1, dmi=(0, 0, 0.3))
+    model.add_bond("Fe2", "Fe1", (1, 0, 0), iso=1, dmi=(0, 0, 0.3))
+
+    Q, energy, spins = model.find_spiral_ground_state(n=[0, 0, 1])
+    # Uniform spiral with tan(theta) = D / J between the neighbours
+    assert np.isclose(Q[0], np.arctan(0.3) / np.pi)
+    for atom, spin in zip(model.magnetic_atoms, spins):
+        atom.spin_vector = spin
+
+    kpoints = np.linspace(-1, 1, 201)[:, None] * model.reciprocal_cell[0]
+    omegas = MagnonDispersion(model, Q=Q, n=[0, 0, 1]).omegas(
+        kpoints, zeros_to_none=True
+    )
+    assert np.isfinite(omegas).all() and (omegas >= -1e-6).all()
+    # Opposite chirality is not the ground state
+    omegas = MagnonDispersion(model, Q=-Q, n=[0, 0, 1]).omegas(
+        kpoints, zeros_to_none=True
+    )
+    assert not np.isfinite(omegas).all()
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from radtools.magnons.dispersion import MagnonDispersion
+from radtools.magnons.powder import PowderAverage, fibonacci_sphere
+
+
+def _ferromagnetic_chain():
+    x = np.array([1.0, 0, 0])
+    J = -np.eye(3)
+    return MagnonDispersion.from_arrays([J, J], [0, 0], [0, 0], [x, -x], [[0, 0, 1.5]])
+
+
+def test_fibonacci_sphere():
+    points = fibonacci_sphere(1000)
+    assert np.allclose(np.linalg.norm(points, axis=1), 1)
+    assert np.allclose(points.mean(axis=0), 0, atol=1e-2)
+
+
+@pytest.mark.parametrize("method", ["fibonacci", "sobol"])
+def test_powder_sum_rule(method):
+    powder = PowderAverage(
+        _ferromagnetic_chain(), [0.5, 1, 2], np.linspace(0, 15, 151), method=method
+    )
+    powder.accumulate(256, chunk_size=100)
+    assert (powder.counts == 256).all()
+    # S / 2 * (1 + <q_z^2 / q^2>) = 2S / 3
+    assert np.allclose(powder.spectrum.sum(axis=1) * 0.1, 1, rtol=1e-3)
+
+
+@pytest.mark.parametrize("method", ["fibonacci", "sobol"])
+def test_powder_resume(method, tmp_path):
+    dispersion = _ferromagnetic_chain()
+    bins = np.linspace(0, 7, 71)
+    powder = PowderAverage(dispersion, [0.5, 1], bins, method=method, seed=3)
+    powder.accumulate(64)
+    powder.save(tmp_path / "powder.npz")
+    resumed = PowderAverage.load(tmp_path / "powder.npz", dispersion)
+    resumed.accumulate(64)
+
+    reference = PowderAverage(dispersion, [0.5, 1], bins, method=method, seed=3)
+    reference.accumulate(64)
+    reference.accumulate(64)
+    assert np.allclose(resumed.spectrum, reference.spectrum)
+    assert resumed.rounds == 2
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from radtools.crystal.atom import Atom
+from radtools.crystal.bravais_lattice import lattice_example
+from radtools.magnons.dispersion import MagnonDispersion
+from radtools.magnons.sweep import sweep_parameters
+from radtools.spinham.hamiltonian import SpinHamiltonian
+from radtools.spinham.template import ExchangeTemplate
+
+
+def _model():
+    model = SpinHamiltonian(lattice=lattice_example("TET"))
+    model.add_atom(Atom("Fe", (0, 0, 0), spin=[0, 0, 1]))
+    model.notation = "standard"
+    template = ExchangeTemplate()
+    for name, R, iso, dmi in [
+        ("J1", (1, 0, 0), 1, (0, 0, 0.1)),
+        ("J2", (0, 0, 1), 0.5, (0, 0, 0)),
+    ]:
+        model.add_bond("Fe", "Fe", R, iso=iso, dmi=dmi)
+        template.names[name] = [
+            ("Fe", "Fe", R),
+            ("Fe", "Fe", tuple(-x for x in R)),
+        ]
+    return model, template
+
+
+def _scaled_model(j2, d1):
+    model, template = _model()
+    for atom1, atom2, R in template.names["J1"]:
+        J = model[atom1, atom2, R]
+        J.matrix = J.symm_matrix + J.asymm_matrix * d1
+    for atom1, atom2, R in template.names["J2"]:
+        model[atom1, atom2, R].matrix *= j2
+    return model
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_sweep_parameters(workers):
+    model, template = _model()
+    kpoints = np.random.default_rng(0).random((10, 3)) * 3
+    J2 = [-1, 0.5, 1]
+    D1 = [0, 2]
+    omegas, stable = sweep_parameters(
+        model,
+        template,
+        {"J2": J2, ("J1", "dmi"): D1},
+        kpoints,
+        workers=workers,
+    )
+    assert omegas.shape == (3, 2, 1, 10)
+    # Antiferromagnetic J2 destroys the ferromagnetic ground state
+    assert not stable[0].any()
+    assert stable[1:, 0].all()
+    assert (stable == (omegas >= 0).all(axis=(-2, -1))).all()
+
+    for i, j2 in enumerate(J2):
+        for j, d1 in enumerate(D1):
+            reference = MagnonDispersion(_scaled_model(j2, d1))
+            assert np.allclose(
+                omegas[i, j],
+                reference.omegas(kpoints, zeros_to_none=True),
+                equal_nan=True,
+            )
+
+    with pytest.raises(ValueError):
+        sweep_parameters(model, template, {("J1", "iso"): [1]}, kpoints)
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_sweep_parameters_spiral(workers):
+    model, template = _model()
+    Q = [0.1, 0, 0.05]
+    kpoints = np.random.default_rng(1).random((10, 3)) * 3
+    J2 = [0.5, 1]
+    D1 = [0.5, 2]
+    omegas, stable = sweep_parameters(
+        model,
+        template,
+        {"J2": J2, ("J1", "dmi"): D1},
+        kpoints,
+        Q=Q,
+        workers=workers,
+    )
+    for i, j2 in enumerate(J2):
+        for j, d1 in enumerate(D1):
+            reference = MagnonDispersion(_scaled_model(j2, d1), Q=Q)
+            reference = reference.omegas(kpoints, zeros_to_none=True)
+            assert np.isfinite(reference).any()
+            assert np.allclose(omegas[i, j], reference, equal_nan=True)
@@ -0,0 +1,72 @@
+from itertools import product
+
+import numpy as np
+import pytest
+
+from radtools.constants import BOLTZMANN
+from radtools.crystal.atom import Atom
+from radtools.crystal.bravais_lattice import lattice_example
+from radtools.magnons.dispersion import MagnonDispersion
+from radtools.magnons.thermodynamics import MagnonThermodynamics
+from radtools.spinham.hamiltonian import SpinHamiltonian
+
+
+def _ferromagnet():
+    model = SpinHamiltonian(lattice=lattice_example("CUB"))
+    model.add_atom(Atom("Fe", (0, 0, 0), spin=[0, 0, 1]))
+    for R in [(1, 0, 0), (0, 1, 0), (0, 0, 1)]:
+        model.add_bond("Fe", "Fe", R, iso=1)
+    model.notation = "standard"
+    return model
+
+
+def test_curie_temperature():
+    thermodynamics = MagnonThermodynamics(
+        MagnonDispersion(_ferromagnet()), (20, 20, 20)
+    )
+    # Tyablikov: k_B T_C = (S + 1) / 3 * 12 J / W, W - Watson integral
+    assert np.isclose(
+        thermodynamics.curie_temperature(),
+        2 / 3 * 12 / 1.516386 / BOLTZMANN,
+        rtol=0.05,
+    )
+
+
+def test_thermodynamic_relations():
+    thermodynamics = MagnonThermodynamics(MagnonDispersion(_ferromagnet()), (8, 8, 8))
+    temperatures = np.linspace(10, 1000, 500)
+    free_energy = thermodynamics.free_energy(temperatures)
+    internal_energy = thermodynamics.internal_energy(temperatures)
+    heat_capacity = thermodynamics.heat_capacity(temperatures)
+    entropy = -np.gradient(free_energy, temperatures)
+    assert np.allclose(
+        (free_energy + temperatures * entropy)[1:-1],
+        internal_energy[1:-1],
+        atol=1e-2,
+    )
+    assert np.allclose(
+        np.gradient(internal_energy, temperatures)[1:-1] / BOLTZMANN,
+        heat_capacity[1:-1],
+        atol=1e-2,
+    )
+    # Classical limit: k_B per mode
+    assert np.isclose(thermodynamics.heat_capacity([1e6])[0], 1, atol=1e-3)
+
+    magnetization = thermodynamics.magnetization(temperatures)
+    assert magnetization.shape == (500, 1)
+    assert (np.diff(magnetization[:, 0]) < 0).all()
+    with pytest.raises(ValueError):
+        thermodynamics.free_energy([0])
+
+
+def test_zero_point_reduction():
+    model = SpinHamiltonian(lattice=lattice_example("CUB"))
+    model.add_atom(Atom("Fe1", (0, 0, 0), spin=[0, 0, 1]))
+    model.add_atom(Atom("Fe2", (0.5, 0.5, 0.5), spin=[0, 0, -1]))
+    model.notation = "standard"
+    for R in product([0, -1], repeat=3):
+        model.add_bond("Fe1", "Fe2", R, iso=-1)
+    thermodynamics = MagnonThermodynamics(MagnonDispersion(model), (10, 10, 10))
+    magnetization = thermodynamics.magnetization([1e-3])[0]
+    # Zero-point reduction of the body-centered antiferromagnet
+    assert np.allclose(magnetization, 1 - 0.0593, atol=2e-3)
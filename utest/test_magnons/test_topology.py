@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from radtools.crystal.atom import Atom
+from radtools.crystal.bravais_lattice import lattice_example
+from radtools.magnons.dispersion import MagnonDispersion
+from radtools.magnons.topology import MagnonTopology
+from radtools.spinham.hamiltonian import SpinHamiltonian
+
+
+def _honeycomb(D):
+    model = SpinHamiltonian(lattice=lattice_example("HEX"))
+    model.add_atom(Atom("A", (1 / 3, 2 / 3, 0), spin=[0, 0, 1]))
+    model.add_atom(Atom("B", (2 / 3, 1 / 3, 0), spin=[0, 0, 1]))
+    model.notation = "standard"
+    for R in [(0, 0, 0), (-1, 0, 0), (0, 1, 0)]:
+        model.add_bond("A", "B", R, iso=1)
+    for R in [(1, 0, 0), (0, 1, 0), (-1, -1, 0)]:
+        model.add_bond("A", "A", R, iso=0, dmi=[0, 0, D])
+        model.add_bond("B", "B", R, iso=0, dmi=[0, 0, -D])
+    return model
+
+
+@pytest.mark.parametrize("D", [0.2, -0.2])
+def test_chern_numbers(D):
+    topology = MagnonTopology(MagnonDispersion(_honeycomb(D)), (24, 24, 1))
+    chern_numbers = topology.chern_numbers()
+    assert chern_numbers.shape == (1, 2)
+    assert np.allclose(chern_numbers, np.round(chern_numbers), atol=1e-8)
+    assert np.allclose(np.abs(chern_numbers), 1)
+    assert np.isclose(np.sum(chern_numbers), 0)
+
+    other = MagnonTopology(MagnonDispersion(_honeycomb(-D)), (24, 24, 1))
+    assert np.allclose(other.chern_numbers(), -chern_numbers)
+    assert np.allclose(other.thermal_hall([10, 100]), -topology.thermal_hall([10, 100]))
+    assert (np.abs(topology.thermal_hall([10, 100])) > 0).all()
+
+
+def test_plane_and_chunks():
+    dispersion = MagnonDispersion(_honeycomb(0.2))
+    reference = MagnonTopology(dispersion, (12, 12, 1))
+    chunked = MagnonTopology(dispersion, (12, 12, 1), chunk_size=7)
+    assert np.allclose(chunked.flux, reference.flux)
+    assert np.allclose(chunked.omegas, reference.omegas)
+
+    swapped = MagnonTopology(dispersion, (12, 12, 1), plane=(1, 0))
+    assert np.allclose(swapped.chern_numbers(), -reference.chern_numbers())
+    assert np.isclose(
+        np.sum(reference.berry_curvature()[..., 0]) * reference.area,
+        2 * np.pi * reference.chern_numbers()[0, 0],
+    )
+
+
+def test_trivial():
+    topology = MagnonTopology(MagnonDispersion(_honeycomb(0)), (12, 12, 1))
+    # Bands touch at the K points, away from them the curvature vanishes
+    assert np.allclose(topology.thermal_hall([10, 100]), 0, atol=1e-10)
+    with pytest.raises(ValueError):
+        topology.thermal_hall([0])
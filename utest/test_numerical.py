@@ -1,6 +1,12 @@
+import numpy as np
 import pytest
 
-from radtools.numerical import compare_numerically
+from radtools.numerical import (
+    bond_sum,
+    bose_einstein,
+    compare_numerically,
+    group_bonds,
+)
 
 
 @pytest.mark.parametrize(
@@ -14,3 +20,31 @@ from radtools.numerical import compare_numerically
 )
 def test_compare_numerically(x, sign, y, result):
     assert compare_numerically(x, sign, y) == result
+
+
+def test_bose_einstein():
+    x = np.array([1e-3, 0.5, 1, 10])
+    assert np.allclose(bose_einstein(x), 1 / (np.exp(x) - 1))
+    # No overflow
+    with np.errstate(over="raise"):
+        assert bose_einstein(1000) == 0
+
+
+def test_bond_sum():
+    rng = np.random.default_rng(0)
+    N = 3
+    indices_i = rng.integers(N, size=20)
+    indices_j = rng.integers(N, size=20)
+    phases = np.exp(1j * rng.random((4, 20)))
+    values = rng.random((20, 2))
+    result = bond_sum(phases, values, group_bonds(indices_i, indices_j, N), N)
+    expected = np.zeros((4, N, N, 2), dtype=complex)
+    for b, (i, j) in enumerate(zip(indices_i, indices_j)):
+        expected[:, i, j] += phases[:, b, None] * values[b]
+    assert np.allclose(result, expected)
+    # No bonds
+    empty = np.array([], dtype=int)
+    result = bond_sum(
+        np.zeros((4, 0)), np.zeros((0, 2)), group_bonds(empty, empty, N), N
+    )
+    assert np.allclose(result, 0) and result.shape == (4, N, N, 2)
@@ -1,13 +1,16 @@
+from copy import deepcopy
 from math import sqrt
 
 import numpy as np
 import pytest
 
 from radtools.crystal.atom import Atom
+from radtools.crystal.bravais_lattice import lattice_example
 from radtools.spinham.hamiltonian import SpinHamiltonian, NotationError
 from radtools.spinham.parameter import ExchangeParameter
 from radtools.spinham.template import ExchangeTemplate
 from radtools.crystal.constants import REL_TOL, ABS_TOL
+from radtools.io.internal import dump_pickle, load_pickle
 from radtools.numerical import compare_numerically
 
 
@@ -437,6 +440,117 @@ def test_filter():
     assert len(filtered_model) == 1
 
 
+def test_filter_double_counting_and_cell():
+    model = SpinHamiltonian(notation="standard")
+    Cr1 = Atom("Cr1", (0.25, 0.25, 0))
+    Cr2 = Atom("Cr2", (0.75, 0.75, 0))
+    model.add_bond(Cr1, Cr2, (0, 0, 0), iso=1)
+    model.add_bond(Cr1, Cr1, (1, 0, 0), iso=2)
+    model.add_bond(Cr1, Cr1, (0, 2, 0), iso=3)
+    assert len(model) == 6
+    # Reversed R vectors are kept in the double counting notation
+    assert len(model.filtered(R_vector=(-1, 0, 0))) == 2
+    # Reversed bonds are removed together
+    assert len(model.filtered(template=[("Cr1", "Cr1", (1, 0, 0))])) == 0
+    template = [("Cr1", "Cr1", (1, 0, 0)), ("Cr1", "Cr1", (-1, 0, 0))]
+    assert len(model.filtered(template=template)) == 2
+
+    # Distances follow the changes of the cell and of the positions
+    assert len(model.filtered(max_distance=1.5)) == 4
+    model.cell = [[2, 0, 0], [0, 2, 0], [0, 0, 2]]
+    assert len(model.filtered(max_distance=1.5)) == 2
+    assert len(model.filtered(max_distance=0.5)) == 0
+    Cr2.position = (0.25, 0.4, 0)
+    assert len(model.filtered(max_distance=0.5)) == 2
+
+
+def test_filtered_is_independent():
+    model = SpinHamiltonian(notation="standard")
+    Cr1 = Atom("Cr1", (0.25, 0.25, 0))
+    Cr2 = Atom("Cr2", (0.75, 0.75, 0))
+    model.add_bond(Cr1, Cr2, (0, 0, 0), iso=1)
+    model.add_bond(Cr1, Cr1, (1, 0, 0), iso=2)
+    model.add_bond(Cr1, Cr1, (0, 2, 0), iso=3)
+
+    filtered_model = model.filtered(max_distance=1.5)
+    assert filtered_model.get_atom("Cr1") is not Cr1
+    assert len(filtered_model) == 4
+
+    # Atoms are independent
+    Cr1.spin = 1
+    filtered_model.get_atom("Cr1").spin = 3
+    assert Cr1.spin == 1
+    Cr2.position = (0.5, 0.5, 0)
+    assert np.allclose(filtered_model.get_atom("Cr2").position, (0.75, 0.75, 0))
+    Cr2.position = (0.75, 0.75, 0)
+    for atom1, atom2, R, J in filtered_model:
+        assert atom1 is filtered_model.get_atom(atom1.name)
+        assert atom2 is filtered_model.get_atom(atom2.name)
+
+    # Bonds are independent
+    filtered_model[Cr1, Cr1, (1, 0, 0)].iso = 5
+    assert model[Cr1, Cr1, (1, 0, 0)].iso == 2
+    del model[Cr1, Cr2, (0, 0, 0)]
+    assert (Cr1, Cr2, (0, 0, 0)) in filtered_model
+    model.factor = -1
+    assert filtered_model[Cr1, Cr1, (1, 0, 0)].iso == 5
+
+    # Crystal is independent
+    filtered_model.add_atom(Atom("Cr3", (0.5, 0.5, 0.5)))
+    assert len(filtered_model.atoms) == 3
+    assert len(model.atoms) == 2
+    assert filtered_model[Cr1, Cr1, (1, 0, 0)].iso == 5
+    filtered_model.cell = [[2, 0, 0], [0, 2, 0], [0, 0, 2]]
+    assert np.allclose(model.cell, np.eye(3))
+    filtered_model.remove_atom("Cr2")
+    assert len(filtered_model) == 2
+    assert len(model.atoms) == 2
+
+
+def test_derived_properties_cache():
+    model = SpinHamiltonian(notation="standard")
+    Cr1 = Atom("Cr1", (0.25, 0.25, 0))
+    Cr2 = Atom("Cr2", (0.75, 0.75, 0))
+    model.add_bond(Cr1, Cr1, (1, 0, 0), iso=1)
+    assert model.magnetic_atoms == [Cr1]
+    assert model.number_spins_in_unit_cell == 1
+    assert len(model.cell_list) == 2
+    # Returned values are independent of the cache
+    model.magnetic_atoms.append(Cr2)
+    model.cell_list[0] = 5
+    assert model.magnetic_atoms == [Cr1]
+    assert np.allclose(np.abs(model.cell_list), [[1, 0, 0], [1, 0, 0]])
+
+    # Cached values are reused, until the model is modified
+    calls = []
+    arrays = model._bonds.arrays
+
+    def counted_arrays():
+        calls.append(None)
+        return arrays()
+
+    model._bonds.arrays = counted_arrays
+    assert model.magnetic_atoms == [Cr1]
+    assert model.number_spins_in_unit_cell == 1
+    assert len(model.cell_list) == 2
+    assert len(calls) == 0
+
+    model.add_bond(Cr1, Cr2, (0, 0, 0), iso=1)
+    assert model.magnetic_atoms == [Cr1, Cr2]
+    assert len(model.cell_list) == 3
+    assert len(calls) == 2
+    del model._bonds.arrays
+    assert np.allclose(model.space_dimensions, (-0.75, 0.25, 0, 1.25, 0.75, 0))
+    Cr2.position = (0.25, 0.5, 0)
+    assert np.allclose(model.space_dimensions, (-0.75, 0.25, 0, 1.25, 0.5, 0))
+
+    model.remove_bond(Cr1, Cr2, (0, 0, 0))
+    assert model.number_spins_in_unit_cell == 1
+    model.remove_atom(Cr1)
+    assert model.magnetic_atoms == []
+    assert model.cell_list.size == 0
+
+
 def test_form_model():
     template1 = ExchangeTemplate()
     template2 = ExchangeTemplate()
@@ -703,3 +817,166 @@ def test_add_remove_bond_with_notation():
     model.remove_bond(Cr2, Cr1, (0, 0, 0))
     assert (Cr1, Cr2, (0, 0, 0)) not in model
     assert (Cr2, Cr1, (0, 0, 0)) not in model
+
+
+@pytest.mark.parametrize(
+    "notation", ["standard", "TB2J", "SpinW", "vampire", (False, False, 2)]
+)
+def test_input_for_magnons_notation(notation):
+    model = SpinHamiltonian()
+    Cr1 = Atom("Cr1", (0.25, 0.25, 0), spin=1.5)
+    Cr2 = Atom("Cr2", (0.75, 0.75, 0), spin=2)
+    model.notation = (False, False, -1)
+    model.add_bond(Cr1, Cr2, (0, 0, 0), iso=1, dmi=(0, 0, 0.5))
+    model.add_bond(Cr2, Cr1, (1, 0, 0), iso=2, dmi=(0.1, 0, 0))
+    model.add_bond(Cr1, Cr1, (0, -1, 0), iso=3)
+    model.add_bond(Cr2, Cr2, (0, 0, 0), aniso=[[1, 0, 0], [0, 0, 0], [0, 0, -1]])
+
+    def as_dict(Jij, i, j, dij):
+        return dict(
+            [((i[b], j[b], tuple(np.round(dij[b], 8))), Jij[b]) for b in range(len(i))]
+        )
+
+    computed = as_dict(*model.input_for_magnons(notation=notation))
+    assert model.notation == (False, False, -1)
+    model.notation = notation
+    expected = as_dict(*model.input_for_magnons())
+    assert set(computed) == set(expected)
+    for key in computed:
+        assert np.allclose(computed[key], expected[key])
+
+
+@pytest.mark.parametrize(
+    "J1, J2, Q", [(1, -0.5, 1 / 6), (1, 0.1, 0), (-1, 0, 0.5), (1, -1, 0.2097847)]
+)
+def test_find_spiral_ground_state(J1, J2, Q):
+    model = SpinHamiltonian(lattice=lattice_example("TET"))
+    model.add_atom(Atom("Fe", (0, 0, 0), spin=[0, 0, 2]))
+    model.notation = "standard"
+    model.add_bond("Fe", "Fe", (1, 0, 0), iso=J1)
+    model.add_bond("Fe", "Fe", (2, 0, 0), iso=J2)
+
+    computed_Q, energy, spins = model.find_spiral_ground_state(grid=(10, 10, 10))
+    # Q and -Q are degenerate
+    assert np.allclose(np.abs(computed_Q), [Q, 0, 0], atol=1e-5)
+    angle = 2 * np.pi * Q
+    assert np.isclose(energy, -8 * (J1 * np.cos(angle) + J2 * np.cos(2 * angle)))
+    assert np.allclose(np.linalg.norm(spins, axis=1), 2)
+    assert np.allclose(spins[:, 2], 0)
+
+
+def test_bond_parameters_are_views():
+    model = SpinHamiltonian()
+    Cr = Atom("Cr", (0, 0, 0))
+    model.add_atom(Cr)
+    J = ExchangeParameter(iso=1)
+    model[Cr, Cr, (1, 0, 0)] = J
+    # Parameter is copied
+    J.iso = 2
+    assert model[Cr, Cr, (1, 0, 0)].iso == 1
+
+    stored = model[Cr, Cr, (1, 0, 0)]
+    stored.iso = 3
+    assert model[Cr, Cr, (1, 0, 0)].iso == 3
+    model.set_interpretation(double_counting=False, spin_normalized=True, factor=1)
+    model.factor = 0.5
+    assert stored.iso == 6
+
+    # Removed bond keeps the last values, but does not affect the model
+    model.add_bond(Cr, Cr, (0, 1, 0), iso=4)
+    del model[Cr, Cr, (1, 0, 0)]
+    assert stored.iso == 6
+    stored.iso = 7
+    assert (Cr, Cr, (1, 0, 0)) not in model
+    assert model[Cr, Cr, (0, 1, 0)].iso == 4
+
+    copied = deepcopy(model)
+    copied[copied.get_atom("Cr"), copied.get_atom("Cr"), (0, 1, 0)].iso = 5
+    assert model[Cr, Cr, (0, 1, 0)].iso == 4
+    assert isinstance(deepcopy(model[Cr, Cr, (0, 1, 0)]), ExchangeParameter)
+
+
+def test_notation_many_bonds():
+    model = SpinHamiltonian(lattice=lattice_example("CUB"))
+    atoms = [Atom(f"Fe{i}", (i / 10, 0, 0), spin=i + 1) for i in range(10)]
+    for atom in atoms:
+        model.add_atom(atom)
+    model.notation = "standard"
+    generator = np.random.default_rng(0)
+    for _ in range(2000):
+        a, b = generator.integers(0, 10, size=2)
+        R = tuple(int(x) for x in generator.integers(-3, 4, size=3))
+        model[atoms[a], atoms[b], R] = ExchangeParameter(
+            matrix=generator.normal(size=(3, 3))
+        )
+    before = dict(((a1, a2, R), J.matrix) for a1, a2, R, J in model)
+    model.notation = "TB2J"
+    model.notation = "SpinW"
+    model.notation = "standard"
+    after = dict(((a1, a2, R), J.matrix) for a1, a2, R, J in model)
+    assert set(before) == set(after)
+    for key in before:
+        assert np.allclose(before[key], after[key])
+    assert len(model.magnetic_atoms) == 10
+    assert len(model.cell_list) == len(set(key[2] for key in before))
+
+
+def test_remove_and_add_equal_atom():
+    def bonds(model):
+        return sorted(
+            (atom1.name, atom2.name, R, J.matrix.tolist())
+            for atom1, atom2, R, J in model
+        )
+
+    model = SpinHamiltonian(lattice=lattice_example("CUB"))
+    Fe = Atom("Fe", (0, 0, 0), spin=1, index=1)
+    Cr = Atom("Cr", (0.5, 0.5, 0.5), spin=1, index=2)
+    model.add_atom(Fe)
+    model.add_atom(Cr)
+    model.notation = "standard"
+    model.add_bond(Fe, Cr, (0, 0, 0), iso=1)
+    model.add_bond(Fe, Fe, (1, 0, 0), iso=2)
+    model.remove_atom(Fe)
+    # Equal atom with other position and spin
+    new_Fe = Atom("Fe", (0.5, 0, 0), spin=2, index=1)
+    model.add_atom(new_Fe)
+    model.add_bond(new_Fe, Cr, (0, 0, 0), iso=1)
+    model.notation = "SpinW"
+
+    reference = SpinHamiltonian(lattice=lattice_example("CUB"))
+    reference.add_atom(Atom("Cr", (0.5, 0.5, 0.5), spin=1, index=2))
+    reference.add_atom(Atom("Fe", (0.5, 0, 0), spin=2, index=1))
+    reference.notation = "standard"
+    reference.add_bond("Fe", "Cr", (0, 0, 0), iso=1)
+    reference.notation = "SpinW"
+
+    assert bonds(model) == bonds(reference)
+    for atom1, atom2, R, J in model:
+        assert new_Fe in (atom1, atom2)
+        assert Fe is not atom1 and Fe is not atom2
+    assert model.space_dimensions == reference.space_dimensions
+    for array, reference_array in zip(
+        model.input_for_magnons(), reference.input_for_magnons()
+    ):
+        assert np.allclose(array, reference_array)
+    # Distance of the removed atom to Cr is larger than 2.5
+    model.filter(max_distance=2.5)
+    assert len(model) == len(reference)
+
+
+def test_pickle(tmp_path):
+    model = SpinHamiltonian(lattice=lattice_example("CUB"))
+    Fe = Atom("Fe", (0, 0, 0), spin=1)
+    model.add_atom(Fe)
+    model.add_bond(Fe, Fe, (1, 0, 0), iso=1)
+    # Parameter refers to the row of the storage
+    stored = model[Fe, Fe, (1, 0, 0)]
+    dump_pickle(model, str(tmp_path / "model"))
+    loaded = load_pickle(str(tmp_path / "model.pickle"))
+    assert loaded is not model
+    assert len(loaded) == len(model)
+    Fe = loaded.get_atom("Fe")
+    assert loaded[Fe, Fe, (1, 0, 0)].iso == stored.iso
+    loaded[Fe, Fe, (1, 0, 0)].iso = 2
+    assert stored.iso == 1
+    assert loaded[Fe, Fe, (1, 0, 0)].iso == 2